@@ -3,10 +3,13 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from google.adk.agents import Agent
-from tools.calendar_tools import write_to_calendar, get_upcoming_events, delete_event
-from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
-# from google.adk.models.lite_llm import LiteLlm 
+from agents.callbacks import (before_agent, after_agent, before_model, after_model, on_model_error,
+                              before_tool, after_tool, on_tool_error)
+from tools.calendar_tools import (
+    write_to_calendar, get_upcoming_events, delete_event, find_free_slots,
+    create_recurring_event, update_recurring_event, delete_recurring_event,
+)
+from tools.context_tools import recall_tool_output
 
 AGENT_MODEL = "gemini-2.0-flash-exp"
 
@@ -16,6 +19,24 @@ calendar_agent = Agent(
     description="Reads and writes to user's calendar and suggests time slots.",
     instruction="You are a calendar and scheduling agent. "
                 "Your ONLY core tasks are read/write/delete from user's calendar via the write_to_calendar and delete_event tools, "
-                "suggest time slots for tasks, and break down large tasks into substasks.",
-    tools=[write_to_calendar, get_upcoming_events, delete_event], 
+                "suggest time slots for tasks, and break down large tasks into substasks. "
+                "When suggesting time slots, always use the find_free_slots tool instead of reasoning over raw events. "
+                "For routines that repeat (e.g. 'Gym 3x a week', 'Wake up at 7:00'), create ONE series with "
+                "create_recurring_event and an RRULE instead of writing separate events, and use "
+                "update_recurring_event / delete_recurring_event to change one occurrence or the whole series. "
+                "write_to_calendar is idempotent: writing the same event again reports it as 'unchanged' instead "
+                "of duplicating it, so it is safe to retry.",
+    tools=[
+        write_to_calendar, get_upcoming_events, delete_event, find_free_slots,
+        create_recurring_event, update_recurring_event, delete_recurring_event,
+        recall_tool_output,
+    ],
+    before_agent_callback=before_agent,
+    after_agent_callback=after_agent,
+    before_model_callback=before_model,
+    after_model_callback=after_model,
+    on_model_error_callback=on_model_error,
+    before_tool_callback=before_tool,
+    after_tool_callback=after_tool,
+    on_tool_error_callback=on_tool_error,
 )
\ No newline at end of file
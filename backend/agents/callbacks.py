@@ -0,0 +1,125 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contextvars import Token
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+from utils.gemini import model_limiter, ModelBusyError, model_priority
+from utils.context import compact_contents, content_tokens
+from utils.tracing import tracer, payload_size
+from utils.deadlines import Deadline, DeadlineExceeded, current_deadline, TOOL_TIMEOUT
+
+BUSY_MESSAGE = "I'm handling a lot of requests right now, please try again in a moment."
+OUT_OF_TIME_MESSAGE = "I ran out of time for this request."
+
+# Per-call tool deadlines and the tokens that restore the turn's deadline, keyed by function call id
+_tool_deadlines: dict[str, tuple[Deadline, Token]] = {}
+MAX_OPEN_TOOL_DEADLINES = 1000
+
+def _model_key(callback_context: CallbackContext):
+    return ("model", callback_context.invocation_id, callback_context.agent_name)
+
+def _slot_owner(callback_context: CallbackContext):
+    # Slots are held by the turn's deadline, so whoever runs the turn can release
+    # one whose after_model never ran (turn timed out or client disconnected)
+    deadline = current_deadline.get()
+    return deadline.root if deadline is not None else ("invocation", callback_context.invocation_id)
+
+async def before_agent(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Runs when an agent (root or sub-agent after a transfer) starts handling a turn."""
+    tracer.start_span(f"agent.{callback_context.agent_name}",
+                      key=("agent", callback_context.invocation_id, callback_context.agent_name),
+                      invocation_id=callback_context.invocation_id)
+    return None
+
+async def after_agent(callback_context: CallbackContext) -> Optional[types.Content]:
+    tracer.end_span(("agent", callback_context.invocation_id, callback_context.agent_name))
+    return None
+
+async def before_model(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """Runs before every agent model call: compacts old history, then waits for a model slot."""
+    before = sum(content_tokens(c) for c in llm_request.contents)
+    llm_request.contents = compact_contents(llm_request.contents)
+    after = sum(content_tokens(c) for c in llm_request.contents)
+    if after < before:
+        print(f"[CONTEXT]: {callback_context.agent_name} prompt compacted ~{before} -> ~{after} tokens")
+
+    tracer.start_span("model.call", key=_model_key(callback_context), agent=callback_context.agent_name,
+                      model=llm_request.model or "", prompt_tokens_est=after, prompt_messages=len(llm_request.contents))
+    try:
+        with tracer.span("model.queue_wait"):
+            await model_limiter.acquire(model_priority.get(), _slot_owner(callback_context))
+    except (ModelBusyError, DeadlineExceeded) as e:
+        print(f"Model call skipped for {callback_context.agent_name}: {e}")
+        tracer.end_span(_model_key(callback_context), error=str(e))
+        message = OUT_OF_TIME_MESSAGE if isinstance(e, DeadlineExceeded) else BUSY_MESSAGE
+        return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=message)]))
+    return None
+
+async def after_model(callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+    """Runs after every agent model call: gives the model slot back."""
+    if not llm_response.partial:
+        model_limiter.release(_slot_owner(callback_context))
+        parts = llm_response.content.parts if llm_response.content and llm_response.content.parts else []
+        usage = llm_response.usage_metadata
+        tracer.end_span(
+            _model_key(callback_context),
+            error=llm_response.error_message,
+            response_chars=sum(len(p.text or "") for p in parts),
+            function_calls=sum(1 for p in parts if p.function_call),
+            prompt_tokens=(usage.prompt_token_count or 0) if usage else 0,
+            output_tokens=(usage.candidates_token_count or 0) if usage else 0,
+        )
+    return None
+
+async def on_model_error(callback_context: CallbackContext, llm_request: LlmRequest,
+                         error: Exception) -> Optional[LlmResponse]:
+    """Runs when a model call raises, in place of after_model: gives the slot back, then lets the error propagate."""
+    model_limiter.release(_slot_owner(callback_context))
+    tracer.end_span(_model_key(callback_context), error=f"{type(error).__name__}: {error}")
+    return None
+
+async def before_tool(tool, args: dict, tool_context) -> Optional[dict]:
+    """Runs before every tool call: skips it if the turn is out of time, else gives it its own deadline."""
+    turn_deadline = current_deadline.get()
+    if turn_deadline is not None and turn_deadline.remaining() == 0:
+        return {"status": "error", "message": f"Skipped {tool.name}: the request ran out of time."}
+
+    tracer.start_span(f"tool.{tool.name}", key=("tool", tool_context.function_call_id),
+                      agent=tool_context.agent_name, args_chars=payload_size(args))
+    # Calendar/Gemini helpers called by the tool stop once this passes
+    deadline = Deadline(TOOL_TIMEOUT, parent=turn_deadline)
+    _tool_deadlines[tool_context.function_call_id] = (deadline, current_deadline.set(deadline))
+    if len(_tool_deadlines) > MAX_OPEN_TOOL_DEADLINES:
+        # Tools cancelled mid-call reach neither after_tool nor on_tool_error; drop the oldest entry
+        _tool_deadlines.pop(next(iter(_tool_deadlines)))
+    return None
+
+def _end_tool_deadline(tool_context):
+    """Puts the turn's deadline back once the tool is done, whether it returned or raised."""
+    deadline, token = _tool_deadlines.pop(tool_context.function_call_id, (None, None))
+    if deadline is None or current_deadline.get() is not deadline:
+        return
+    try:
+        current_deadline.reset(token)
+    except ValueError:
+        # The token belongs to another context (callbacks ran in different tasks)
+        current_deadline.set(deadline.parent)
+
+async def after_tool(tool, args: dict, tool_context, tool_response) -> Optional[dict]:
+    _end_tool_deadline(tool_context)
+    status = tool_response.get("status", "") if isinstance(tool_response, dict) else ""
+    tracer.end_span(("tool", tool_context.function_call_id),
+                    error=f"tool returned {status}" if status == "error" else None,
+                    response_chars=payload_size(tool_response), status=status)
+    return None
+
+async def on_tool_error(tool, args: dict, tool_context, error: Exception) -> Optional[dict]:
+    """Runs when a tool raises, in place of after_tool: restores the turn's deadline, then lets the error propagate."""
+    _end_tool_deadline(tool_context)
+    tracer.end_span(("tool", tool_context.function_call_id), error=f"{type(error).__name__}: {error}")
+    return None
@@ -3,7 +3,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
+from agents.callbacks import (before_agent, after_agent, before_model, after_model, on_model_error,
+                              before_tool, after_tool, on_tool_error)
 from agents.calendar_agent import calendar_agent
 from agents.syllabus_agent import syllabus_agent
 
@@ -22,5 +23,13 @@ root_agent = Agent(
                 "Analyze the user's query, delegate all calendar writing/reading tasks to the calendar_agent, " \
                 "and all syllabus parsing tasks to the syllabus_agent. For anything else, respond appropiately or state you cannot handle the request.",
     tools=[], 
-    sub_agents=[calendar_agent, syllabus_agent]
+    sub_agents=[calendar_agent, syllabus_agent],
+    before_agent_callback=before_agent,
+    after_agent_callback=after_agent,
+    before_model_callback=before_model,
+    after_model_callback=after_model,
+    on_model_error_callback=on_model_error,
+    before_tool_callback=before_tool,
+    after_tool_callback=after_tool,
+    on_tool_error_callback=on_tool_error,
 )
\ No newline at end of file
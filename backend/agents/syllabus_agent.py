@@ -3,8 +3,10 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from google.adk.agents import Agent
+from agents.callbacks import (before_agent, after_agent, before_model, after_model, on_model_error,
+                              before_tool, after_tool, on_tool_error)
 from tools.syllabus_tools import extract_pdf_text, extract_assignments
-from google.adk.models.lite_llm import LiteLlm
+from tools.context_tools import recall_tool_output
 
 AGENT_MODEL = "gemini-2.0-flash-exp"
 
@@ -24,5 +26,13 @@ syllabus_agent = Agent(
                 2. Another project
                 - Due Date: Oct 5, 2025
                 """,  
-    tools=[extract_pdf_text, extract_assignments]
+    tools=[extract_pdf_text, extract_assignments, recall_tool_output],
+    before_agent_callback=before_agent,
+    after_agent_callback=after_agent,
+    before_model_callback=before_model,
+    after_model_callback=after_model,
+    on_model_error_callback=on_model_error,
+    before_tool_callback=before_tool,
+    after_tool_callback=after_tool,
+    on_tool_error_callback=on_tool_error,
 )
\ No newline at end of file
@@ -1,11 +1,18 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
 import json
+import asyncio
 import base64
 import warnings
 import shutil
 import tempfile
+import uuid
 
 from pathlib import Path
+from typing import Optional
+from contextlib import asynccontextmanager
 from routes import api, auth, tasks, user
 from dotenv import load_dotenv
 
@@ -20,13 +27,21 @@ from google.adk.agents import LiveRequestQueue
 from google.adk.agents.run_config import RunConfig
 from google.genai import types
 
-from fastapi import FastAPI, Request, UploadFile, File, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import FastAPI, Request, UploadFile, File, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from agents.root_agent import root_agent
-from tools.calendar_tools import get_upcoming_events, delete_event
+from tools.calendar_tools import get_upcoming_events, delete_event, authenticate, calendar_version
+from utils.calendar_scheduler import calendar_scheduler
+from utils.static_assets import StaticAssets
+from utils.credentials import current_calendar_user
+from utils.oauth import close_http_client, authenticated_user, user_from_id_token
+from utils.events import event_bus, sse_message
+from utils.tracing import tracer
+from utils.deadlines import Deadline, current_deadline
+from utils.gemini import model_limiter
+from utils.fast_json import FastJSONResponse, EncodedCache
 
 warnings.filterwarnings("ignore", category=UserWarning, module="pydantic")
 
@@ -34,15 +49,32 @@ load_dotenv()
 
 APP_NAME = "Shellhacks 2025 Project"
 
+# Time spent importing this module and its dependencies, checked against a budget at startup
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "3"))
+# Encoded event lists are reused until this process writes to the calendar, or
+# for at most this long (to pick up changes made in Google Calendar itself)
+EVENTS_CACHE_SECONDS = float(os.getenv("EVENTS_CACHE_SECONDS", "15"))
+
+# One runner shared by all live sessions; created during startup
+agent_runner = None
+
+
+def get_runner():
+    """Returns the shared agent runner, creating it if startup didn't"""
+    global agent_runner
+    if agent_runner is None:
+        agent_runner = InMemoryRunner(
+            app_name=APP_NAME,
+            agent=root_agent,
+        )
+    return agent_runner
+
 
 async def start_agent_session(user_id, is_audio=False):
     """Starts an agent session"""
 
-    # Create a Runner
-    runner = InMemoryRunner(
-        app_name=APP_NAME,
-        agent=root_agent,
-    )
+    runner = get_runner()
 
     # Create a Session
     session = await runner.session_service.create_session(
@@ -66,14 +98,29 @@ async def start_agent_session(user_id, is_audio=False):
         live_request_queue=live_request_queue,
         run_config=run_config,
     )
-    return live_events, live_request_queue
+    return live_events, live_request_queue, session.id
+
 
+# Open trace span per live session turn, from the client's message to turn_complete
+live_turns = {}
 
-async def agent_to_client_sse(live_events):
+
+def start_live_turn(user_id, kind):
+    if user_id not in live_turns:
+        live_turns[user_id] = tracer.start_span("live.turn", activate=False, user_id=user_id, input=kind)
+
+
+async def agent_to_client_sse(live_events, user_id=None):
     """Agent to client communication via SSE"""
+    events = 0
     async for event in live_events:
+        events += 1
         # If the turn complete or interrupted, send it
         if event.turn_complete or event.interrupted:
+            turn = live_turns.pop(user_id, None)
+            if turn is not None:
+                tracer.end_span(turn, events=events, interrupted=bool(event.interrupted))
+            events = 0
             message = {
                 "turn_complete": event.turn_complete,
                 "interrupted": event.interrupted,
@@ -116,7 +163,61 @@ async def agent_to_client_sse(live_events):
 # FastAPI web app
 #
 
-app = FastAPI()
+async def _timed(name, fn, timings):
+    """Runs a blocking warm-up step in a thread and records how long it took"""
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(fn)
+    except Exception as e:
+        print(f"[STARTUP]: {name} warm-up failed, will retry lazily: {e}")
+    timings[name] = time.perf_counter() - started
+
+
+async def streak_maintenance_loop():
+    """Daily streak reset. Every worker runs this; only the one holding the day's lease does the pass"""
+    from utils.streak_maintenance import seconds_until_next_run  # only the scheduler needs it
+    while True:
+        try:
+            await user.run_streak_maintenance()
+        except Exception as e:
+            print(f"[STREAKS]: maintenance failed, retrying at the next run: {e}")
+        await asyncio.sleep(seconds_until_next_run())
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Creates clients and the runner before the worker reports ready"""
+    started = time.perf_counter()
+    timings = {}
+
+    async def database():
+        await _timed("supabase", get_supabase, timings)
+        await _timed("leaderboard", user.load_leaderboard, timings)
+        await _timed("storefront", user.load_storefront, timings)
+
+    steps = [
+        database(),
+        _timed("agent_runner", get_runner, timings),
+        _timed("static_assets", static_assets.build, timings),
+    ]
+    # Never trigger the interactive consent flow from startup
+    if os.path.exists("token.json"):
+        steps.append(_timed("calendar_service", authenticate, timings))
+    await asyncio.gather(*steps)
+
+    breakdown = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in timings.items())
+    print(f"[STARTUP]: imports={IMPORT_SECONDS * 1000:.0f}ms, {breakdown}, "
+          f"warm-up total={(time.perf_counter() - started) * 1000:.0f}ms")
+    if IMPORT_SECONDS > IMPORT_BUDGET_SECONDS:
+        print(f"[STARTUP]: import time {IMPORT_SECONDS:.2f}s is over the {IMPORT_BUDGET_SECONDS:.2f}s budget")
+    streak_task = asyncio.create_task(streak_maintenance_loop())
+    yield
+    streak_task.cancel()
+    await close_http_client()
+    tracer.flush()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -127,49 +228,127 @@ app.add_middleware(
 )
 
 STATIC_DIR = Path("static")
-app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+static_assets = StaticAssets(STATIC_DIR)
 
 # Store active sessions
 active_sessions = {}
 
+# Syllabus imports running in the background
+syllabus_imports = set()
+
+encoded_events = EncodedCache(ttl=EVENTS_CACHE_SECONDS)
+
 app.include_router(api.router, prefix="/api")
 app.include_router(auth.router, prefix="/auth")
 app.include_router(tasks.router, prefix="/api/tasks", tags=["tasks"])
 app.include_router(user.router) 
 
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Serves the index.html"""
-    return FileResponse(os.path.join(STATIC_DIR, "index.html"))
+    return static_assets.response("index.html", request)
+
+
+@app.get("/static/{path:path}")
+async def static_file(path: str, request: Request):
+    """Serves precompressed static assets; fingerprinted names are cached as immutable"""
+    response = static_assets.response(path, request)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return response
 
 
 @app.get("/events/{user_id}")
-async def sse_endpoint(user_id: int, is_audio: str = "false"):
-    """SSE endpoint for agent to client communication"""
+async def sse_endpoint(user_id: str, is_audio: str = "false", last_seq: Optional[int] = None,
+                       last_session_seq: Optional[int] = None, id_token: Optional[str] = None,
+                       profile_id: Optional[str] = None):
+    """SSE endpoint for agent to client communication and profile updates
+
+    `user_id` names the chat session. EventSource can't send headers, so the
+    Google ID token whose calendar the agent acts on comes as the `id_token`
+    query parameter. Profile updates (rewards, purchases, level-ups) are only
+    streamed for that token's account; `profile_id`, if given, must match it.
+
+    Profile updates and this session's own updates (syllabus imports) are
+    numbered separately, and each message says which `stream` it belongs to.
+    Pass `last_seq` (profile) and `last_session_seq` when reconnecting to
+    replay the updates missed since then.
+    """
+    calendar_user = await user_from_id_token(id_token)
+    if id_token:
+        if profile_id is not None and profile_id != calendar_user:
+            raise HTTPException(status_code=403, detail="profile_id doesn't match the ID token")
+        profile_id = calendar_user
+    elif profile_id is not None:
+        raise HTTPException(status_code=401, detail="Profile updates need an id_token")
 
     # Start agent session
     user_id_str = str(user_id)
-    live_events, live_request_queue = await start_agent_session(user_id_str, is_audio == "true")
+    live_events, live_request_queue, session_id = await start_agent_session(user_id_str, is_audio == "true")
 
     # Store the request queue for this user
     active_sessions[user_id_str] = live_request_queue
+    sources = {"session": (user_id_str, event_bus.subscribe(user_id_str, last_session_seq))}
+    if profile_id:
+        sources["profile"] = (profile_id, event_bus.subscribe(profile_id, last_seq))
 
     print(f"Client #{user_id} connected via SSE, audio mode: {is_audio}")
 
     def cleanup():
         live_request_queue.close()
+        for key, queue in sources.values():
+            event_bus.unsubscribe(key, queue)
+        live_turns.pop(user_id_str, None)
         if user_id_str in active_sessions:
             del active_sessions[user_id_str]
         print(f"Client #{user_id} disconnected from SSE")
 
     async def event_generator():
+        # Tool helpers started by this connection stop once it is cancelled
+        connection = Deadline()
+        current_deadline.set(connection)
+        # Set before the agent stream starts so its tool calls inherit it
+        current_calendar_user.set(calendar_user)
+        # Interleave agent output with profile and session updates on the one stream
+        agent_stream = agent_to_client_sse(live_events, user_id_str)
+        next_agent = asyncio.ensure_future(agent_stream.__anext__())
+        next_updates = {asyncio.ensure_future(queue.get()): stream for stream, (_, queue) in sources.items()}
         try:
-            async for data in agent_to_client_sse(live_events):
-                yield data
+            yield sse_message({"type": "subscribed", "profile_id": profile_id,
+                               "last_seq": event_bus.last_seq(profile_id) if profile_id else None,
+                               "last_session_seq": event_bus.last_seq(user_id_str)})
+            while True:
+                done, _ = await asyncio.wait({next_agent, *next_updates}, return_when=asyncio.FIRST_COMPLETED)
+                for update in [update for update in next_updates if update in done]:
+                    stream = next_updates.pop(update)
+                    yield sse_message({**update.result(), "stream": stream})
+                    next_updates[asyncio.ensure_future(sources[stream][1].get())] = stream
+                if next_agent in done:
+                    try:
+                        data = next_agent.result()
+                    except StopAsyncIteration:
+                        break
+                    yield data
+                    next_agent = asyncio.ensure_future(agent_stream.__anext__())
         except Exception as e:
             print(f"Error in SSE stream: {e}")
         finally:
+            # Client disconnect: cancel the in-flight model/tool work, not just the stream
+            connection.cancel("client disconnected")
+            model_limiter.release(connection)
+            for pending in (next_agent, *next_updates):
+                pending.cancel()
+            await asyncio.gather(next_agent, *next_updates, return_exceptions=True)
+            for stream in (agent_stream, live_events):
+                try:
+                    await stream.aclose()
+                except Exception as e:
+                    print(f"Error closing agent stream: {e}")
             cleanup()
+            # The runner is shared, so drop this connection's session from it
+            await get_runner().session_service.delete_session(
+                app_name=APP_NAME, user_id=user_id_str, session_id=session_id
+            )
 
     return StreamingResponse(
         event_generator(),
@@ -184,7 +363,7 @@ async def sse_endpoint(user_id: int, is_audio: str = "false"):
 
 
 @app.post("/send/{user_id}")
-async def send_message_endpoint(user_id: int, request: Request):
+async def send_message_endpoint(user_id: str, request: Request):
     """HTTP endpoint for client to agent communication"""
 
     user_id_str = str(user_id)
@@ -202,10 +381,12 @@ async def send_message_endpoint(user_id: int, request: Request):
     # Send the message to the agent
     if mime_type == "text/plain":
         content = Content(role="user", parts=[Part.from_text(text=data)])
+        start_live_turn(user_id_str, "text")
         live_request_queue.send_content(content=content)
         print(f"[CLIENT TO AGENT]: {data}")
     elif mime_type == "audio/pcm":
         decoded_data = base64.b64decode(data)
+        start_live_turn(user_id_str, "audio")
         live_request_queue.send_realtime(Blob(data=decoded_data, mime_type=mime_type))
         print(f"[CLIENT TO AGENT]: audio/pcm: {len(decoded_data)} bytes")
     else:
@@ -251,6 +432,7 @@ async def upload_pdf(user_id: str, file: UploadFile = File(...)):
             role="user", 
             parts=[Part.from_text(text=f"Please extract assignment dates from the uploaded PDF: {saved_file_path}")]
         )
+        start_live_turn(user_id_str, "pdf")
         live_request_queue.send_content(content=content)
         
         return {"status": "success", "filename": file.filename, "message": "PDF uploaded and processing started"}
@@ -264,23 +446,78 @@ async def upload_pdf(user_id: str, file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Failed to process PDF: {str(e)}")
 
 
+@app.post("/import-syllabus/{user_id}")
+async def import_syllabus(user_id: str, file: UploadFile = File(...),
+                          calendar_user: str = Depends(authenticated_user)):
+    """Upload a syllabus PDF and stream its deadlines into the calendar
+
+    Progress is pushed to `/events/{user_id}` as "syllabus_import" messages.
+    """
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+
+    uploads_dir = Path("uploads")
+    uploads_dir.mkdir(exist_ok=True)
+    saved_file_path = uploads_dir / f"{user_id}_{Path(file.filename).name}"
+    with open(saved_file_path, "wb") as saved_file:
+        shutil.copyfileobj(file.file, saved_file)
+
+    print(f"[PDF UPLOAD]: User {user_id} started a syllabus import of {file.filename}")
+
+    # The pipeline pulls in the relevance filter and extraction tools; most workers never import a syllabus
+    from tools.syllabus_pipeline import run_syllabus_import
+
+    import_id = uuid.uuid4().hex[:8]
+    task = asyncio.create_task(run_syllabus_import(
+        user_id, str(saved_file_path), calendar_user, import_id
+    ))
+    # Keep a reference so the import isn't garbage collected mid-run
+    syllabus_imports.add(task)
+    task.add_done_callback(syllabus_imports.discard)
+
+    return {"status": "started", "import_id": import_id, "filename": file.filename}
+
+
 @app.get("/api/calendar/events")
-async def get_calendar_events(max_results: int = 10):
-    """Get upcoming calendar events"""
+async def get_calendar_events(max_results: int = 10, calendar_user: str = Depends(authenticated_user)):
+    """Get upcoming calendar events of the authenticated user"""
     try:
-        events = get_upcoming_events(max_results)
-        return events
+        current_calendar_user.set(calendar_user)
+        key = (calendar_user, max_results)
+        version = calendar_version()
+        body = encoded_events.get(key, version)
+        if body is not None:
+            return FastJSONResponse(body, cache_hit=True)
+        events = await asyncio.to_thread(get_upcoming_events, max_results)
+        response = FastJSONResponse(events, cache_hit=False)
+        # Errors come back as a one-item list; don't cache those
+        if not (events and "error" in events[0]):
+            encoded_events.put(key, response.body, version)
+        return response
     except Exception as e:
         return {"error": str(e)}
 
 
+@app.get("/api/traces/summary")
+async def traces_summary(limit: int = 10):
+    """Slowest stages and turns among recently traced spans"""
+    return tracer.summary(limit)
+
+
+@app.get("/api/calendar/metrics")
+async def get_calendar_metrics():
+    """Calendar API scheduler queue depth, wait time and retry counters"""
+    return calendar_scheduler.metrics()
+
+
 @app.delete("/api/calendar/events/{event_id}")
-async def delete_calendar_event(event_id: str):
-    """Delete a calendar event by ID"""
+async def delete_calendar_event(event_id: str, calendar_user: str = Depends(authenticated_user)):
+    """Delete a calendar event by ID from the authenticated user's calendar"""
     try:
+        current_calendar_user.set(calendar_user)
         # Remove the 'cal_' prefix if it exists (from frontend formatting)
         actual_event_id = event_id.replace('cal_', '')
-        result = delete_event(actual_event_id)
+        result = await asyncio.to_thread(delete_event, actual_event_id)
         return result
     except Exception as e:
         return {"error": str(e)}
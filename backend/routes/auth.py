@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import RedirectResponse
-from ..utils.oauth import google_oauth_flow, exchange_code_for_tokens, get_userinfo
+import asyncio
+from ..utils.oauth import google_oauth_flow, exchange_code_for_tokens, verify_id_token, get_userinfo
 from ..utils.config import settings
+from ..utils.credentials import credential_store
 
 router = APIRouter()
 
@@ -15,7 +17,17 @@ async def google_login():
 async def google_callback(code: str, state: str):
     try:
         tokens = await exchange_code_for_tokens(code)
-        userinfo = await get_userinfo(tokens["access_token"])
+        if "id_token" in tokens:
+            # Verified locally against cached signing keys; no userinfo round trip
+            claims = await verify_id_token(tokens["id_token"])
+            userinfo = {k: claims.get(k) for k in ("sub", "email", "email_verified", "name", "picture")}
+        else:
+            userinfo = await get_userinfo(tokens["access_token"])
+        # Keep the calendar grant so tools can act for this user
+        await asyncio.to_thread(
+            credential_store.put_token_response, userinfo["sub"], tokens,
+            settings.GOOGLE_CLIENT_ID, settings.GOOGLE_CLIENT_SECRET
+        )
         # TODO: upsert user in DB
         return {"ok": True, "user": userinfo}
     except Exception as e:
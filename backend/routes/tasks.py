@@ -1,6 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from sortedcontainers import SortedList
+from ..utils.fast_json import FastJSONResponse
 
 router = APIRouter()
 
@@ -9,23 +13,113 @@ class Task(BaseModel):
     title: str
     due: Optional[str] = None
     completed: bool = False
+    user_id: Optional[str] = None
 
 # In-memory store for hackathon speed; swap for DB as needed
 TASKS: dict[str, Task] = {}
 
+# Ordered index of open tasks per user: (due, task_id) kept sorted so range
+# queries are a bisect plus a walk over the page instead of a full scan + sort.
+DUE_INDEX: dict[Optional[str], SortedList] = {}
+INDEX_KEYS: dict[str, tuple[datetime, str]] = {}
+
+MAX_PAGE_SIZE = 100
+
+def _due_key(due: str) -> datetime:
+    """Normalize an ISO date/datetime string to a naive UTC datetime for ordering."""
+    parsed = datetime.fromisoformat(due.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _index_add(task: Task):
+    if task.completed or not task.due:
+        return
+    key = (_due_key(task.due), task.id)
+    DUE_INDEX.setdefault(task.user_id, SortedList()).add(key)
+    INDEX_KEYS[task.id] = key
+
+def _index_remove(task: Task):
+    key = INDEX_KEYS.pop(task.id, None)
+    if key is None:
+        return
+    index = DUE_INDEX.get(task.user_id)
+    if index is not None:
+        index.discard(key)
+        if not index:
+            del DUE_INDEX[task.user_id]
+
+def _encode_cursor(key: tuple[datetime, str]) -> str:
+    return f"{key[0].isoformat()}|{key[1]}"
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        due, task_id = cursor.split("|", 1)
+        # Same normalization as the index keys: an aware timestamp can't be compared with them
+        return _due_key(due), task_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _range_page(user_id: Optional[str], start: Optional[datetime], end: datetime,
+                limit: int, cursor: Optional[str]) -> dict:
+    """Return up to `limit` open tasks with start <= due < end, in due order."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    index = DUE_INDEX.get(user_id)
+    if not index:
+        return {"tasks": [], "next_cursor": None}
+
+    if cursor:
+        minimum, inclusive = _decode_cursor(cursor), (False, False)
+    elif start is not None:
+        minimum, inclusive = (start, ""), (True, False)
+    else:
+        minimum, inclusive = None, (True, False)
+
+    keys = list(islice(index.irange(minimum, (end, ""), inclusive=inclusive), limit + 1))
+    page, more = keys[:limit], len(keys) > limit
+    return {
+        "tasks": [TASKS[task_id] for _, task_id in page],
+        "next_cursor": _encode_cursor(page[-1]) if more else None,
+    }
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# Tasks are validated when created, so reads encode them as-is instead of
+# going through response_model validation and jsonable_encoder again
 @router.get("/", response_model=List[Task])
 async def list_tasks():
-    return list(TASKS.values())
+    return FastJSONResponse(list(TASKS.values()))
+
+@router.get("/due")
+async def tasks_due(user_id: Optional[str] = None, days: int = 7, limit: int = 20, cursor: Optional[str] = None):
+    """Open tasks due between now and `days` from now, soonest first"""
+    now = _utcnow()
+    return FastJSONResponse(_range_page(user_id, now, now + timedelta(days=days), limit, cursor))
+
+@router.get("/overdue")
+async def tasks_overdue(user_id: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None):
+    """Open tasks whose due date has already passed, oldest first"""
+    return FastJSONResponse(_range_page(user_id, None, _utcnow(), limit, cursor))
 
 @router.post("/", response_model=Task)
 async def create_task(task: Task):
+    if task.due:
+        try:
+            _due_key(task.due)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="due must be an ISO 8601 date or datetime")
+    if task.id in TASKS:
+        _index_remove(TASKS[task.id])
     TASKS[task.id] = task
+    _index_add(task)
     return task
 
 @router.post("/complete/{task_id}")
 async def complete_task(task_id: str):
     if task_id in TASKS:
         t = TASKS[task_id]
-        TASKS[task_id] = Task(**{**t.model_dump(), "completed": True})
+        t.completed = True
+        _index_remove(t)
         return {"ok": True}
     return {"ok": False}
@@ -1,9 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header
 from pydantic import BaseModel
 from typing import List, Optional
 from uuid import UUID
 import json
+import asyncio
+import secrets
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
 from ..utils.supabase import get_supabase
+from ..utils.streaks import ActivityBitmap, HEATMAP_DAYS
+from ..utils.leaderboard import leaderboard
+from ..utils.storefront import storefront
+from ..utils.events import event_bus
+from ..utils.fast_json import FastJSONResponse, EncodedCache
+from ..utils.config import settings
 
 router = APIRouter(prefix="/api", tags=["user"])
 
@@ -26,6 +36,125 @@ class ShopItem(BaseModel):
     description: str
     coin_price: int
 
+class TaskCompletion(BaseModel):
+    task_type: str = "custom"
+    difficulty: str = "medium"
+    completed_on: Optional[date] = None  # defaults to today; offline clients send the real day
+
+class TaskCompletionBatch(BaseModel):
+    completions: List[TaskCompletion]
+
+# HARDCODED XP/COIN VALUES - TODO: Make these configurable
+TASK_REWARDS = {
+    "daily_habit": {"easy": 8, "medium": 10, "hard": 15},
+    "exercise": {"easy": 12, "medium": 15, "hard": 20},
+    "assignment": {"easy": 15, "medium": 20, "hard": 30},
+    "custom": {"easy": 8, "medium": 10, "hard": 15}
+}
+LEVEL_UP_BONUS = 25
+MAX_BATCH_COMPLETIONS = 500
+
+def _task_reward(task_type: str, difficulty: str) -> tuple[int, int]:
+    """Return (xp, coins) for a completed task"""
+    xp = TASK_REWARDS.get(task_type, TASK_REWARDS["custom"]).get(difficulty, 10)
+    return xp, xp // 2  # Coins are half of XP
+
+def _level_for_xp(xp: int) -> int:
+    return max(1, xp // 100 + 1)
+
+# Per-user daily activity bitmaps, loaded lazily from `user_activity`
+ACTIVITY: dict[str, ActivityBitmap] = {}
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+def _get_activity(supabase, user_id: str) -> ActivityBitmap:
+    """Return the user's activity bitmap, loading it from the database on first use"""
+    activity = ACTIVITY.get(user_id)
+    if activity is None:
+        try:
+            result = supabase.table("user_activity").select("*").eq("user_id", user_id).execute()
+            activity = ActivityBitmap.from_record(result.data[0]) if result.data else ActivityBitmap()
+        except Exception as e:
+            print(f"❌ [DEBUG] Could not load activity for {user_id}, starting empty: {str(e)}")
+            activity = ActivityBitmap()
+        ACTIVITY[user_id] = activity
+    return activity
+
+def load_leaderboard(supabase=None, page_size: int = 1000):
+    """Rebuild the in-process leaderboard from user_profiles"""
+    supabase = supabase or get_supabase()
+    rows, start = [], 0
+    while True:
+        result = supabase.table("user_profiles").select("user_id, xp, level").range(start, start + page_size - 1).execute()
+        rows.extend(result.data)
+        if len(result.data) < page_size:
+            break
+        start += page_size
+    leaderboard.load(rows)
+    print(f"✅ [DEBUG] Leaderboard loaded with {len(rows)} users")
+
+def _ensure_leaderboard(supabase):
+    if not leaderboard.loaded:
+        load_leaderboard(supabase)
+
+# Pre-encoded bodies of catalog responses, versioned by the catalog's loaded_at so a reload rebuilds them
+ENCODED_BODIES = EncodedCache()
+
+# Users this process has seen a profile for (LRU). Only existence is cached: balances can
+# change through any worker, so coins/XP are always read from the database.
+KNOWN_USERS: "OrderedDict[str, None]" = OrderedDict()
+MAX_KNOWN_USERS = 10000
+DEFAULT_PROFILE = {"xp": 0, "coins": 100, "level": 1, "streak": 0}  # 100 starting coins
+
+def _remember_user(user_id: str):
+    KNOWN_USERS[user_id] = None
+    KNOWN_USERS.move_to_end(user_id)
+    while len(KNOWN_USERS) > MAX_KNOWN_USERS:
+        KNOWN_USERS.popitem(last=False)
+
+def _get_profile(supabase, user_id: str) -> Optional[dict]:
+    """Return the user's current profile from the database"""
+    result = supabase.table("user_profiles").select("*").eq("user_id", user_id).execute()
+    if not result.data:
+        KNOWN_USERS.pop(user_id, None)
+        return None
+    _remember_user(user_id)
+    return result.data[0]
+
+def load_storefront(supabase=None):
+    """Reload the in-process shop catalog from shop_items"""
+    supabase = supabase or get_supabase()
+    result = supabase.table("shop_items").select("*").order("coin_price").execute()
+    storefront.load(result.data)
+    print(f"✅ [DEBUG] Storefront loaded with {len(storefront.items)} items")
+
+def _ensure_ownership(supabase, user_id: str):
+    """Load (or refresh a stale) catalog and the user's ownership bitset on first use"""
+    if storefront.is_stale():
+        load_storefront(supabase)
+    if not storefront.has_ownership(user_id):
+        result = supabase.table("user_purchases").select("shop_item_id").eq("user_id", user_id).execute()
+        storefront.load_ownership(user_id, (row["shop_item_id"] for row in result.data))
+
+def _publish_rewards(user_id: str, xp_earned: int, coins_earned: int, old_level: int, profile: dict):
+    """Push reward (and level-up) deltas to the user's open event streams"""
+    event_bus.publish(user_id, "reward", {
+        "xp_earned": xp_earned,
+        "coins_earned": coins_earned,
+        "profile": profile
+    })
+    if profile["level"] > old_level:
+        event_bus.publish(user_id, "level_up", {
+            "old_level": old_level,
+            "new_level": profile["level"]
+        })
+
+def _save_activity(supabase, user_id: str, activity: ActivityBitmap):
+    """Persist a staged bitmap, then make it the cached one. Write errors propagate."""
+    supabase.table("user_activity").upsert({"user_id": user_id, **activity.to_record()}).execute()
+    ACTIVITY[user_id] = activity
+
 @router.post("/validate-user/{user_id}")
 async def validate_user(user_id: str):
     """Validate user and create profile if doesn't exist"""
@@ -34,39 +163,46 @@ async def validate_user(user_id: str):
         
         supabase = get_supabase()
         
-        # Check if user profile exists
-        result = supabase.table("user_profiles").select("*").eq("user_id", user_id).execute()
-        
-        print(f"🔍 [DEBUG] Profile query result: {result.data}")
-        
+        if user_id in KNOWN_USERS:
+            # Known to exist: a plain read, no insert attempt
+            profile = _get_profile(supabase, user_id)
+            if profile is not None:
+                return {
+                    "exists": True,
+                    "created": False,
+                    "profile": profile
+                }
+        
+        # Insert-if-absent and read in one round trip (sql/ensure_user_profile.sql);
+        # concurrent first visits can't create duplicates
+        result = supabase.rpc("ensure_user_profile", {
+            "p_user_id": user_id, **{f"p_{key}": value for key, value in DEFAULT_PROFILE.items()}
+        }).execute()
         if not result.data:
-            print(f"🔍 [DEBUG] User profile not found, creating new profile for: {user_id}")
-            
-            # Create new user profile with default values
-            new_profile = {
-                "user_id": user_id,
-                "xp": 0,
-                "coins": 100,  # Starting coins
-                "level": 1,
-                "streak": 0
-            }
-            
-            create_result = supabase.table("user_profiles").insert(new_profile).execute()
-            print(f"✅ [DEBUG] New profile created: {create_result.data}")
-            
-            return {
-                "exists": False,
-                "created": True,
-                "profile": new_profile
-            }
+            # Lost a race with a concurrent first visit whose insert wasn't visible yet
+            result = supabase.table("user_profiles").select("*").eq("user_id", user_id).execute()
+            if not result.data:
+                raise HTTPException(status_code=500, detail="Profile upsert returned no row")
+            profile, created = result.data[0], False
+        else:
+            profile, created = result.data[0]["profile"], result.data[0]["created"]
+        
+        if created:
+            print(f"✅ [DEBUG] New profile created: {profile}")
+            if leaderboard.loaded:
+                leaderboard.update(user_id, profile["xp"], profile["level"])
         else:
-            print(f"✅ [DEBUG] User profile found: {result.data[0]}")
-            return {
-                "exists": True,
-                "created": False,
-                "profile": result.data[0]
-            }
-            
+            print(f"✅ [DEBUG] User profile found: {profile}")
+        
+        _remember_user(user_id)
+        return {
+            "exists": not created,
+            "created": created,
+            "profile": profile
+        }
+        
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ [DEBUG] Error validating user: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -96,7 +232,7 @@ async def get_user_profile(user_id: str):
         
         print(f"✅ [DEBUG] Profile retrieved successfully for user: {user_id}")
         
-        return {
+        return FastJSONResponse({
             "user_id": profile_data["user_id"],
             "xp": profile_data["xp"],
             "coins": profile_data["coins"],
@@ -104,7 +240,7 @@ async def get_user_profile(user_id: str):
             "streak": profile_data["streak"],
             "xp_for_next_level": max(0, xp_for_next_level),  # Ensure non-negative
             "progress_percentage": min(100, (profile_data["xp"] % 100))  # Progress within current level
-        }
+        })
         
     except HTTPException:
         raise
@@ -140,11 +276,11 @@ async def get_user_purchases(user_id: str):
         
         print(f"✅ [DEBUG] Found {len(purchases)} purchases for user: {user_id}")
         
-        return {
+        return FastJSONResponse({
             "user_id": user_id,
             "purchases": purchases,
             "total_purchased": len(purchases)
-        }
+        })
         
     except Exception as e:
         print(f"❌ [DEBUG] Error getting user purchases: {str(e)}")
@@ -154,33 +290,44 @@ async def get_user_purchases(user_id: str):
 async def get_shop_items():
     """Get all available shop items"""
     try:
-        print(f"🔍 [DEBUG] Getting all shop items")
-        
-        supabase = get_supabase()
+        if storefront.is_stale():
+            load_storefront()
         
-        # Get all shop items
-        result = supabase.table("shop_items").select("*").order("coin_price").execute()
+        # Served from the in-process catalog; the encoded body is reused until the next reload
+        return ENCODED_BODIES.response(
+            "shop",
+            lambda: {"shop_items": storefront.items, "total_items": len(storefront.items)},
+            version=storefront.loaded_at
+        )
         
-        print(f"🔍 [DEBUG] Shop items query result: {len(result.data)} items found")
+    except Exception as e:
+        print(f"❌ [DEBUG] Error getting shop items: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.get("/storefront/{user_id}")
+async def get_storefront(user_id: str):
+    """Get the shop catalog with owned/affordable flags for a user"""
+    try:
+        supabase = get_supabase()
         
-        shop_items = []
-        for item in result.data:
-            shop_items.append({
-                "id": item["id"],
-                "name": item["name"],
-                "description": item["description"],
-                "coin_price": item["coin_price"]
-            })
+        profile = _get_profile(supabase, user_id)
+        if profile is None:
+            raise HTTPException(status_code=404, detail="User profile not found")
         
-        print(f"✅ [DEBUG] Retrieved {len(shop_items)} shop items")
+        _ensure_ownership(supabase, user_id)
         
-        return {
-            "shop_items": shop_items,
-            "total_items": len(shop_items)
-        }
+        return FastJSONResponse({
+            "user_id": user_id,
+            "coins": profile["coins"],
+            "shop_items": storefront.view(user_id, profile["coins"]),
+            "total_items": len(storefront.items),
+            "total_owned": storefront.owned_count(user_id)
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ [DEBUG] Error getting shop items: {str(e)}")
+        print(f"❌ [DEBUG] Error getting storefront: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @router.post("/purchase/{user_id}/{shop_item_id}")
@@ -201,14 +348,15 @@ async def purchase_item(user_id: str, shop_item_id: str):
         user_profile = profile_result.data[0]
         print(f"🔍 [DEBUG] User has {user_profile['coins']} coins")
         
-        # Get shop item to check price
-        item_result = supabase.table("shop_items").select("*").eq("id", shop_item_id).execute()
+        # Get shop item from the cached catalog; reload in case it was just added
+        if storefront.item(shop_item_id) is None and storefront.can_reload():
+            load_storefront(supabase)
+        shop_item = storefront.item(shop_item_id)
         
-        if not item_result.data:
+        if shop_item is None:
             print(f"❌ [DEBUG] Shop item not found: {shop_item_id}")
             raise HTTPException(status_code=404, detail="Shop item not found")
         
-        shop_item = item_result.data[0]
         print(f"🔍 [DEBUG] Item costs {shop_item['coin_price']} coins")
         
         # Check if user has enough coins
@@ -217,9 +365,9 @@ async def purchase_item(user_id: str, shop_item_id: str):
             raise HTTPException(status_code=400, detail="Insufficient coins")
         
         # Check if already purchased
-        existing_purchase = supabase.table("user_purchases").select("*").eq("user_id", user_id).eq("shop_item_id", shop_item_id).execute()
+        _ensure_ownership(supabase, user_id)
         
-        if existing_purchase.data:
+        if storefront.owns(user_id, shop_item_id):
             print(f"❌ [DEBUG] Item already purchased by user")
             raise HTTPException(status_code=400, detail="Item already purchased")
         
@@ -239,6 +387,12 @@ async def purchase_item(user_id: str, shop_item_id: str):
             "user_id": user_id,
             "shop_item_id": shop_item_id
         }).execute()
+        storefront.mark_owned(user_id, shop_item_id)
+        event_bus.publish(user_id, "purchase", {
+            "shop_item_id": shop_item_id,
+            "coins_spent": shop_item["coin_price"],
+            "profile": {"coins": new_coin_amount}
+        })
         
         print(f"✅ [DEBUG] Purchase completed successfully")
         
@@ -263,16 +417,7 @@ async def complete_task(user_id: str, task_type: str = "custom", difficulty: str
         
         supabase = get_supabase()
         
-        # HARDCODED XP/COIN VALUES - TODO: Make these configurable
-        task_rewards = {
-            "daily_habit": {"easy": 8, "medium": 10, "hard": 15},
-            "exercise": {"easy": 12, "medium": 15, "hard": 20},
-            "assignment": {"easy": 15, "medium": 20, "hard": 30},
-            "custom": {"easy": 8, "medium": 10, "hard": 15}
-        }
-        
-        base_xp = task_rewards.get(task_type, task_rewards["custom"]).get(difficulty, 10)
-        base_coins = base_xp // 2  # Coins are half of XP
+        base_xp, base_coins = _task_reward(task_type, difficulty)
         
         print(f"🔍 [DEBUG] Base rewards: {base_xp} XP, {base_coins} coins")
         
@@ -285,17 +430,23 @@ async def complete_task(user_id: str, task_type: str = "custom", difficulty: str
         
         profile = profile_result.data[0]
         
+        # Record today's activity on a copy so a failed write leaves the cache untouched
+        today = _today()
+        activity = _get_activity(supabase, user_id).copy()
+        if activity.mark(today):
+            _save_activity(supabase, user_id, activity)
+        
         # Calculate new values
         new_xp = profile["xp"] + base_xp
         new_coins = profile["coins"] + base_coins
-        new_streak = profile["streak"] + 1  # TODO: Add proper streak logic with dates
+        new_streak = activity.current_streak(today)
         
         # Calculate level (100 XP per level)
-        new_level = max(1, new_xp // 100 + 1)
+        new_level = _level_for_xp(new_xp)
         level_up = new_level > profile["level"]
         
         if level_up:
-            new_coins += 25  # Level up bonus
+            new_coins += LEVEL_UP_BONUS
             print(f"🌟 [DEBUG] LEVEL UP! {profile['level']} -> {new_level}")
         
         # Update user profile
@@ -306,12 +457,17 @@ async def complete_task(user_id: str, task_type: str = "custom", difficulty: str
             "streak": new_streak
         }).eq("user_id", user_id).execute()
         
+        if leaderboard.loaded:
+            leaderboard.update(user_id, new_xp, new_level)
+        _publish_rewards(user_id, base_xp, new_coins - profile["coins"], profile["level"],
+                         {"xp": new_xp, "coins": new_coins, "level": new_level, "streak": new_streak})
+        
         print(f"✅ [DEBUG] Task completed: +{base_xp} XP, +{base_coins} coins, streak: {new_streak}")
         
         return {
             "success": True,
             "xp_earned": base_xp,
-            "coins_earned": base_coins + (25 if level_up else 0),
+            "coins_earned": base_coins + (LEVEL_UP_BONUS if level_up else 0),
             "new_xp": new_xp,
             "new_coins": new_coins,
             "new_level": new_level,
@@ -323,4 +479,198 @@ async def complete_task(user_id: str, task_type: str = "custom", difficulty: str
         raise
     except Exception as e:
         print(f"❌ [DEBUG] Error completing task: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.post("/complete-tasks/{user_id}")
+async def complete_tasks(user_id: str, batch: TaskCompletionBatch):
+    """Complete many tasks at once with a single profile read and one transactional write"""
+    if not batch.completions:
+        raise HTTPException(status_code=400, detail="completions must not be empty")
+    if len(batch.completions) > MAX_BATCH_COMPLETIONS:
+        raise HTTPException(status_code=400, detail=f"Too many completions (max {MAX_BATCH_COMPLETIONS})")
+    # Older days are outside the activity window, and marking them would stretch the bitmap back
+    oldest = _today() - timedelta(days=HEATMAP_DAYS - 1)
+    too_old = [i for i, item in enumerate(batch.completions) if item.completed_on and item.completed_on < oldest]
+    if too_old:
+        raise HTTPException(status_code=400,
+                            detail=f"completed_on must be on or after {oldest.isoformat()} (items {too_old})")
+    try:
+        print(f"🔍 [DEBUG] Completing {len(batch.completions)} tasks for user: {user_id}")
+        
+        supabase = get_supabase()
+        
+        profile_result = supabase.table("user_profiles").select("*").eq("user_id", user_id).execute()
+        
+        if not profile_result.data:
+            print(f"❌ [DEBUG] User profile not found: {user_id}")
+            raise HTTPException(status_code=404, detail="User profile not found")
+        
+        profile = profile_result.data[0]
+        today = _today()
+        # Marked on a copy; the cache only takes it once the write has gone through
+        activity = _get_activity(supabase, user_id).copy()
+        
+        # Fold every completion into running totals; nothing is written until the end
+        xp, coins, level = profile["xp"], profile["coins"], profile["level"]
+        activity_changed = False
+        results = []
+        for item in batch.completions:
+            item_xp, item_coins = _task_reward(item.task_type, item.difficulty)
+            xp += item_xp
+            new_level = _level_for_xp(xp)
+            level_up = new_level > level
+            if level_up:
+                item_coins += LEVEL_UP_BONUS
+                level = new_level
+            coins += item_coins
+            activity_changed |= activity.mark(min(item.completed_on or today, today))
+            results.append({
+                "task_type": item.task_type,
+                "difficulty": item.difficulty,
+                "xp_earned": item_xp,
+                "coins_earned": item_coins,
+                "level_up": level_up
+            })
+        
+        new_streak = activity.current_streak(today)
+        # Activity and profile in one round trip and transaction (sql/save_task_completions.sql)
+        supabase.rpc("save_task_completions", {
+            "p_user_id": user_id,
+            "p_xp": xp,
+            "p_coins": coins,
+            "p_level": level,
+            "p_streak": new_streak,
+            "p_activity": activity.to_record() if activity_changed else None
+        }).execute()
+        if activity_changed:
+            ACTIVITY[user_id] = activity
+        
+        if leaderboard.loaded:
+            leaderboard.update(user_id, xp, level)
+        _publish_rewards(user_id, xp - profile["xp"], coins - profile["coins"], profile["level"],
+                         {"xp": xp, "coins": coins, "level": level, "streak": new_streak})
+        
+        print(f"✅ [DEBUG] Batch completed: +{xp - profile['xp']} XP, +{coins - profile['coins']} coins, streak: {new_streak}")
+        
+        return {
+            "success": True,
+            "results": results,
+            "tasks_completed": len(results),
+            "xp_earned": xp - profile["xp"],
+            "coins_earned": coins - profile["coins"],
+            "levels_gained": level - profile["level"],
+            "new_xp": xp,
+            "new_coins": coins,
+            "new_level": level,
+            "new_streak": new_streak,
+            "streak_change": new_streak - profile["streak"]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ [DEBUG] Error completing tasks: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+# One maintenance pass at a time in this process; the job's database lease covers other workers and hosts
+_streak_maintenance_lock = asyncio.Lock()
+
+async def run_streak_maintenance() -> dict:
+    """Reset the stored streak of every user who missed a day"""
+    from ..utils.streak_maintenance import StreakMaintenanceJob  # only used by the daily pass
+
+    async with _streak_maintenance_lock:
+        job = StreakMaintenanceJob(get_supabase(), today=_today())
+        return await job.run()
+
+@router.post("/maintenance/streaks")
+async def streak_maintenance(x_maintenance_token: Optional[str] = Header(None)):
+    """Run (or resume) today's streak maintenance now; needs the X-Maintenance-Token header"""
+    # Disabled unless a token is configured
+    if not settings.MAINTENANCE_TOKEN or not x_maintenance_token or \
+            not secrets.compare_digest(x_maintenance_token, settings.MAINTENANCE_TOKEN):
+        raise HTTPException(status_code=403, detail="Maintenance token required")
+    try:
+        return await run_streak_maintenance()
+    except Exception as e:
+        print(f"❌ [DEBUG] Streak maintenance failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.get("/profile/{user_id}/streak")
+async def get_user_streak(user_id: str):
+    """Get current and longest streak from the activity bitmap"""
+    try:
+        supabase = get_supabase()
+        activity = _get_activity(supabase, user_id)
+        today = _today()
+        
+        return {
+            "user_id": user_id,
+            "current_streak": activity.current_streak(today),
+            "longest_streak": activity.longest,
+            "active_today": activity.is_active(today)
+        }
+        
+    except Exception as e:
+        print(f"❌ [DEBUG] Error getting streak: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.get("/profile/{user_id}/heatmap")
+async def get_user_heatmap(user_id: str, days: int = HEATMAP_DAYS):
+    """Get the activity heatmap as a hex bitmap (bit 0 = first day of the window)"""
+    if days < 1 or days > 5 * HEATMAP_DAYS:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 1825")
+    try:
+        supabase = get_supabase()
+        activity = _get_activity(supabase, user_id)
+        
+        return {"user_id": user_id, **activity.heatmap(_today(), days)}
+        
+    except Exception as e:
+        print(f"❌ [DEBUG] Error getting heatmap: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.get("/leaderboard")
+async def get_leaderboard(limit: int = 10, offset: int = 0):
+    """Get the global XP leaderboard"""
+    limit = max(1, min(limit, 100))
+    try:
+        _ensure_leaderboard(get_supabase())
+        return FastJSONResponse({
+            "leaderboard": leaderboard.top(limit, max(0, offset)),
+            "total_users": len(leaderboard)
+        })
+        
+    except Exception as e:
+        print(f"❌ [DEBUG] Error getting leaderboard: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.get("/leaderboard/rank/{user_id}")
+async def get_leaderboard_rank(user_id: str):
+    """Get a user's global rank"""
+    try:
+        _ensure_leaderboard(get_supabase())
+    except Exception as e:
+        print(f"❌ [DEBUG] Error loading leaderboard: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    rank = leaderboard.rank(user_id)
+    if rank is None:
+        raise HTTPException(status_code=404, detail="User profile not found")
+    return FastJSONResponse(rank)
+
+@router.get("/leaderboard/group")
+async def get_group_leaderboard(user_ids: str):
+    """Rank a friend group among themselves (comma-separated user_ids)"""
+    members = [uid.strip() for uid in user_ids.split(",") if uid.strip()]
+    if not members:
+        raise HTTPException(status_code=400, detail="user_ids must not be empty")
+    if len(members) > 500:
+        raise HTTPException(status_code=400, detail="Too many user_ids (max 500)")
+    try:
+        _ensure_leaderboard(get_supabase())
+        return FastJSONResponse({"leaderboard": leaderboard.group(members)})
+        
+    except Exception as e:
+        print(f"❌ [DEBUG] Error getting group leaderboard: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
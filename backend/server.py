@@ -1,20 +1,48 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
 
 from agents.root_agent import root_agent
 from google.genai import types
-from google.adk.sessions import InMemorySessionService
 from google.adk.runners import Runner
+from utils.session_store import SqliteSessionService
+from utils.tracing import tracer, payload_size
+from utils.deadlines import deadline_scope, AGENT_TURN_TIMEOUT
+from utils.gemini import model_limiter, model_priority, BACKGROUND
+from utils.credentials import current_calendar_user, DEFAULT_USER
+from utils.oauth import authenticated_user, turn_calendar_user, batch_calendar_user
+
+APP_NAME = "weather_tutorial_app"
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+DISCONNECT_POLL_SECONDS = 0.5
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+MAX_BATCH_CONCURRENCY = 32
+MAX_BATCH_ITEMS = 10000
 
-# ----- FastAPI app -----
-app = FastAPI(title="Agent Query API")
 
 # ----- Define request model -----
 class QueryRequest(BaseModel):
     user_id: str
     session_id: str
     query: str
+    timeout_seconds: Optional[float] = None  # can only shorten AGENT_TURN_TIMEOUT
+
+class BatchItem(BaseModel):
+    user_id: str
+    session_id: str
+    query: str
+    id: Optional[str] = None  # echoed back so callers can match results
+
+class BatchQueryRequest(BaseModel):
+    items: list[BatchItem] = Field(max_length=MAX_BATCH_ITEMS)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=MAX_BATCH_CONCURRENCY)
+    timeout_seconds: Optional[float] = None  # per item
 
 # ----- Global session and runner -----
 session_service = None
@@ -24,48 +52,233 @@ runner = None
 async def setup_agent():
     global session_service, runner
     if session_service is None:
-        session_service = InMemorySessionService()
+        session_service = SqliteSessionService(db_path=SESSION_DB_PATH)
     if runner is None:
-        runner = Runner(agent=root_agent, app_name="weather_tutorial_app", session_service=session_service)
+        runner = Runner(agent=root_agent, app_name=APP_NAME, session_service=session_service)
     return runner
 
+# ----- Lifespan: warm the runner before serving, flush sessions on exit -----
+@asynccontextmanager
+async def lifespan(app):
+    started = time.perf_counter()
+    await setup_agent()
+    print(f"[STARTUP]: runner and session store ready in {(time.perf_counter() - started) * 1000:.0f}ms")
+    yield
+    # Land any buffered event appends before the process exits
+    if session_service is not None:
+        session_service.close()
+    tracer.flush()
+
+# ----- FastAPI app -----
+app = FastAPI(title="Agent Query API", lifespan=lifespan)
+
 # ----- Helper to call agent asynchronously -----
-async def call_agent_async(query: str, user_id: str, session_id: str):
+async def call_agent_async(query: str, user_id: str, session_id: str, timeout: Optional[float] = None,
+                           calendar_user: str = DEFAULT_USER) -> dict:
+    """Runs one agent turn under a deadline, acting on `calendar_user`'s calendar.
+
+    Returns:
+        dict: The response text and a status: "complete", or "timeout" with
+              whatever the agents had said by then
+    """
     runner = await setup_agent()
+    timeout = AGENT_TURN_TIMEOUT if timeout is None else min(timeout, AGENT_TURN_TIMEOUT)
 
     content = types.Content(role='user', parts=[types.Part(text=query)])
-    final_response_text = "Agent did not produce a final response."
+    final_response_text = None
+    said_so_far = []
+    started = time.perf_counter()
+    # The runner's tool calls inherit this; without it every turn used the default account
+    current_calendar_user.set(calendar_user)
 
-    async for event in runner.run_async(user_id=user_id, session_id=session_id, new_message=content):
-        if event.is_final_response():
-            if event.content and event.content.parts:
-                final_response_text = event.content.parts[0].text
-            elif event.actions and event.actions.escalate:
-                final_response_text = f"Agent escalated: {event.error_message or 'No specific message.'}"
-            break
+    with deadline_scope(timeout) as deadline, \
+            tracer.span("agent.turn", user_id=user_id, session_id=session_id, query_chars=len(query)) as turn:
+        events = runner.run_async(user_id=user_id, session_id=session_id, new_message=content)
+        count = 0
 
-    return final_response_text
+        async def consume():
+            nonlocal final_response_text, count
+            waiting = tracer.start_span("runner.event", activate=False)
+            async for event in events:
+                # Each runner.event span covers the wait for that event
+                count += 1
+                parts = event.content.parts if event.content and event.content.parts else []
+                tracer.end_span(waiting, author=event.author, partial=bool(event.partial),
+                                function_calls=len(event.get_function_calls()),
+                                payload_chars=sum(payload_size(p.model_dump(exclude_none=True)) for p in parts))
+                if event.actions and event.actions.transfer_to_agent:
+                    with tracer.span("agent.transfer", from_agent=event.author, to_agent=event.actions.transfer_to_agent):
+                        pass
+                if not event.partial:
+                    said_so_far.extend(p.text for p in parts if p.text)
+                if event.is_final_response():
+                    if event.content and event.content.parts:
+                        final_response_text = event.content.parts[0].text
+                    elif event.actions and event.actions.escalate:
+                        final_response_text = f"Agent escalated: {event.error_message or 'No specific message.'}"
+                    break
+                waiting = tracer.start_span("runner.event", activate=False)
+            else:
+                tracer.end_span(waiting, author="", partial=False)
+
+        status = "complete"
+        try:
+            await asyncio.wait_for(consume(), timeout)
+        except (asyncio.TimeoutError, TimeoutError):
+            # Covers asyncio's timeout and DeadlineExceeded raised by a tool helper
+            status = "timeout"
+            deadline.cancel("turn timed out")
+            print(f"[TIMEOUT]: turn for {user_id}/{session_id} exceeded {timeout:g}s")
+        except asyncio.CancelledError:
+            # Client went away: stop tool helpers still running in threads
+            deadline.cancel("client disconnected")
+            status = "cancelled"
+            raise
+        finally:
+            await events.aclose()
+            # A model call cut off mid-flight never reaches after_model
+            model_limiter.release(deadline.root)
+            turn.set(events=count, status=status)
+
+    if status == "timeout":
+        partial = "\n".join(said_so_far).strip()
+        response_text = (partial + "\n\n[Response incomplete: the request timed out.]") if partial \
+            else "The agent ran out of time before it could answer. Please try again."
+    else:
+        response_text = final_response_text or "Agent did not produce a final response."
+    return {
+        "response": response_text,
+        "status": status,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+
+async def cancel_on_disconnect(request: Request, coro):
+    """Awaits `coro`, cancelling it if the HTTP client disconnects first."""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                print("[DISCONNECT]: client went away, cancelling the agent turn")
+                task.cancel()
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def ensure_session(user_id: str, session_id: str):
+    session = await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    if session is None:
+        await session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
 
 # ----- API endpoint -----
 @app.post("/query")
-async def query_agent(request: QueryRequest):
+async def query_agent(request: QueryRequest, http_request: Request, caller: str = Depends(authenticated_user)):
+    calendar_user = turn_calendar_user(request.user_id, caller)
     try:
         # Ensure session_service is initialized
-        global session_service
-        if session_service is None:
-            session_service = InMemorySessionService()
+        await setup_agent()
 
         # Ensure session exists
-        if not session_service.session_exists(request.user_id, request.session_id):
-            session_service.create_session(request.user_id, request.session_id)
+        await ensure_session(request.user_id, request.session_id)
 
         # Call the agent
-        response_text = await call_agent_async(
+        result = await cancel_on_disconnect(http_request, call_agent_async(
             query=request.query,
             user_id=request.user_id,
-            session_id=request.session_id
-        )
-        return {"response": response_text}
+            session_id=request.session_id,
+            timeout=request.timeout_seconds,
+            calendar_user=calendar_user
+        ))
+        if result is None:
+            return {"response": None, "status": "cancelled"}
+        return result
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def run_batch(items: list[BatchItem], concurrency: int, timeout: Optional[float],
+                    calendar_user: str = DEFAULT_USER):
+    """Runs the items through the shared runner, at most `concurrency` at a time.
+
+    Yields one result dict per item in completion order, then a summary.
+    """
+    await setup_agent()
+    results: asyncio.Queue = asyncio.Queue()
+    pending = iter(enumerate(items))
+    # Turns in the same session must not interleave their events
+    session_locks: dict[tuple, asyncio.Lock] = {}
+    counts = {"complete": 0, "timeout": 0, "error": 0}
+    started = time.perf_counter()
+
+    async def run_item(index: int, item: BatchItem) -> dict:
+        queued = time.perf_counter()
+        result = {"index": index, "id": item.id, "user_id": item.user_id, "session_id": item.session_id}
+        lock = session_locks.setdefault((item.user_id, item.session_id), asyncio.Lock())
+        async with lock:
+            waited = time.perf_counter() - queued
+            try:
+                await ensure_session(item.user_id, item.session_id)
+                result.update(await call_agent_async(item.query, item.user_id, item.session_id, timeout,
+                                                      calendar_user))
+            except Exception as e:
+                result.update(status="error", error=str(e),
+                              elapsed_seconds=round(time.perf_counter() - queued - waited, 3))
+        result["queued_seconds"] = round(waited, 3)
+        return result
+
+    async def worker():
+        # Batch turns queue behind interactive chat for model slots
+        model_priority.set(BACKGROUND)
+        for index, item in pending:
+            result = await run_item(index, item)
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            await results.put(result)
+        await results.put(None)
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(items)))]
+    with tracer.span("agent.batch", items=len(items), concurrency=concurrency) as span:
+        try:
+            finished = 0
+            while finished < len(workers):
+                result = await results.get()
+                if result is None:
+                    finished += 1
+                else:
+                    yield result
+        finally:
+            # Client disconnected or the batch finished: stop any turn still running
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            span.set(**counts)
+    yield {"summary": True, "items": len(items), **counts,
+           "elapsed_seconds": round(time.perf_counter() - started, 3)}
+
+@app.post("/query/batch")
+async def query_batch(request: BatchQueryRequest, caller: str = Depends(authenticated_user)):
+    """Runs many agent queries, streaming one NDJSON line per item as it finishes.
+
+    Each line has the item's index (and id if given), status ("complete",
+    "timeout" or "error"), response, elapsed_seconds and queued_seconds. The
+    last line is a summary with counts per status.
+
+    Batches need a signed-in caller, and every item must be one of the
+    caller's own turns: one request can't run sessions for other users.
+    """
+    # Checked up front so a rejected batch runs no turns at all
+    calendar_user = batch_calendar_user([item.user_id for item in request.items], caller)
+    concurrency = request.concurrency or BATCH_CONCURRENCY
+
+    async def lines():
+        async for result in run_batch(request.items, concurrency, request.timeout_seconds, calendar_user):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/traces/summary")
+async def traces_summary(limit: int = 10):
+    """Slowest stages and turns among recently traced spans"""
+    return tracer.summary(limit)
@@ -0,0 +1,49 @@
+-- One maintenance pass per job and day across every worker and host.
+-- claim_maintenance_run returns true when the caller now holds the day's lease:
+-- nobody has claimed it yet, the holder's lease ran out before finishing, or the
+-- caller already holds it. finish_maintenance_run marks the day done, or with
+-- p_done = false gives the lease up so the next run retries. Apply in the
+-- Supabase SQL editor.
+create table if not exists maintenance_runs (
+    job text not null,
+    run_date date not null,
+    owner text not null,
+    lease_until timestamptz not null,
+    done boolean not null default false,
+    primary key (job, run_date)
+);
+
+create or replace function claim_maintenance_run(
+    p_job text,
+    p_run_date date,
+    p_owner text,
+    p_lease_seconds integer
+)
+returns boolean
+language sql
+as $$
+    with claimed as (
+        insert into maintenance_runs (job, run_date, owner, lease_until)
+        values (p_job, p_run_date, p_owner, now() + make_interval(secs => p_lease_seconds))
+        on conflict (job, run_date) do update
+            set owner = excluded.owner, lease_until = excluded.lease_until
+            where not maintenance_runs.done
+              and (maintenance_runs.lease_until < now() or maintenance_runs.owner = excluded.owner)
+        returning 1
+    )
+    select exists (select 1 from claimed)
+$$;
+
+create or replace function finish_maintenance_run(
+    p_job text,
+    p_run_date date,
+    p_owner text,
+    p_done boolean
+)
+returns void
+language sql
+as $$
+    update maintenance_runs
+    set done = p_done, lease_until = now()
+    where job = p_job and run_date = p_run_date and owner = p_owner
+$$;
@@ -0,0 +1,24 @@
+-- validate_user in one round trip: creates the profile if it doesn't exist and
+-- returns it with whether this call created it. Apply in the Supabase SQL editor.
+create or replace function ensure_user_profile(
+    p_user_id user_profiles.user_id%type,
+    p_xp integer,
+    p_coins integer,
+    p_level integer,
+    p_streak integer
+)
+returns table (profile jsonb, created boolean)
+language sql
+as $$
+    with inserted as (
+        insert into user_profiles (user_id, xp, coins, level, streak)
+        values (p_user_id, p_xp, p_coins, p_level, p_streak)
+        on conflict (user_id) do nothing
+        returning *
+    )
+    select to_jsonb(inserted), true from inserted
+    union all
+    -- The statement's snapshot predates the insert, so this only sees a row that already existed
+    select to_jsonb(existing), false from user_profiles existing
+    where existing.user_id = p_user_id and not exists (select 1 from inserted)
+$$;
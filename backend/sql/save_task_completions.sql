@@ -0,0 +1,28 @@
+-- complete_tasks' write in one round trip and one transaction: the activity
+-- bitmap (when it changed) and the profile totals. Apply in the Supabase SQL editor.
+create or replace function save_task_completions(
+    p_user_id user_profiles.user_id%type,
+    p_xp integer,
+    p_coins integer,
+    p_level integer,
+    p_streak integer,
+    p_activity jsonb default null
+)
+returns void
+language plpgsql
+as $$
+begin
+    if p_activity is not null then
+        insert into user_activity (user_id, origin, bitmap, longest_streak)
+        values (p_user_id, (p_activity->>'origin')::date, p_activity->>'bitmap',
+                (p_activity->>'longest_streak')::integer)
+        on conflict (user_id) do update
+            set origin = excluded.origin,
+                bitmap = excluded.bitmap,
+                longest_streak = excluded.longest_streak;
+    end if;
+    update user_profiles
+        set xp = p_xp, coins = p_coins, level = p_level, streak = p_streak
+        where user_id = p_user_id;
+end;
+$$;
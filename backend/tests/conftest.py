@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modules import each other as top-level packages (utils, tools, agents) from backend/
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# routes/* use package-relative imports (..utils), so they load as backend.routes
+sys.path.insert(0, os.path.dirname(BACKEND_DIR))
@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+import tools.calendar_tools as calendar_tools
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    monkeypatch.setattr(calendar_tools, "_calendar_versions", {})
+
+    def execute(request, user_id=None, read_key=None):
+        if request.fail:
+            raise RuntimeError("write failed")
+        return {}
+    monkeypatch.setattr(calendar_tools.calendar_scheduler, "execute", execute)
+
+def send(method_id, http_method="POST", fail=False):
+    request = SimpleNamespace(methodId=method_id, method=http_method, fail=fail)
+    try:
+        calendar_tools._execute(request)
+    except RuntimeError:
+        pass
+
+def test_reads_leave_the_version_alone_even_when_posted():
+    send("calendar.events.list", "GET")
+    send("calendar.freebusy.query")
+    assert calendar_tools.calendar_version() == 0
+
+def test_only_successful_writes_bump_the_version():
+    send("calendar.events.insert", fail=True)
+    assert calendar_tools.calendar_version() == 0
+    send("calendar.events.insert")
+    send("calendar.events.patch", "PATCH")
+    send("calendar.events.delete", "DELETE")
+    assert calendar_tools.calendar_version() == 3
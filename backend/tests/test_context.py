@@ -0,0 +1,27 @@
+from google.genai import types
+
+from utils.context import compact_contents
+
+def text(role, body):
+    return types.Content(role=role, parts=[types.Part(text=body)])
+
+def call(name):
+    return types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(name=name, args={}))])
+
+def response(name, payload):
+    return types.Content(role="user", parts=[types.Part(
+        function_response=types.FunctionResponse(name=name, response=payload))])
+
+def test_recent_window_never_starts_with_an_orphaned_tool_response():
+    contents = [text("user", "old question " * 200), call("get_events"),
+                response("get_events", {"events": "x" * 500}), text("model", "Here are your events."),
+                text("user", "And tomorrow?")]
+    compacted = compact_contents(contents, budget=10, keep_recent=3)
+    responses = [i for i, c in enumerate(compacted) if any(p.function_response for p in c.parts)]
+    calls = [i for i, c in enumerate(compacted) if any(p.function_call for p in c.parts)]
+    assert responses and calls and calls[0] == responses[0] - 1
+    assert compacted[0].parts[0].text.startswith("Summary of earlier conversation")
+
+def test_small_sessions_are_returned_unchanged():
+    contents = [text("user", "hi"), text("model", "hello"), text("user", "thanks")]
+    assert [c.parts[0].text for c in compact_contents(contents)] == ["hi", "hello", "thanks"]
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.deadlines import Deadline, DeadlineExceeded, current_deadline, deadline_scope
+from utils.gemini import ModelCallLimiter
+
+def test_child_deadline_never_outlives_its_parent():
+    parent = Deadline(1.0)
+    child = Deadline(60.0, parent=parent)
+    assert child.expires_at == parent.expires_at
+    assert child.root is parent
+
+def test_cancelling_the_turn_cancels_its_tools_with_the_reason():
+    turn = Deadline(60.0)
+    tool = Deadline(30.0, parent=turn)
+    turn.cancel("client disconnected")
+    with pytest.raises(DeadlineExceeded, match="client disconnected"):
+        tool.check("calendar request")
+
+def test_on_cancel_runs_once_and_can_be_unregistered():
+    turn = Deadline()
+    calls = []
+    Deadline(parent=turn).on_cancel(lambda: calls.append("tool"))
+    unregister = turn.on_cancel(lambda: calls.append("gone"))
+    unregister()
+    turn.cancel()
+    turn.cancel()
+    # Registering after the fact runs the callback immediately
+    turn.on_cancel(lambda: calls.append("late"))
+    assert calls == ["tool", "late"]
+
+def test_sleep_wakes_up_on_cancel():
+    turn = Deadline()
+    threading.Timer(0.05, turn.cancel, args=("turn timed out",)).start()
+    with pytest.raises(DeadlineExceeded, match="turn timed out"):
+        turn.sleep(5)
+
+def test_cancel_wakes_a_queued_model_call_and_frees_its_turn_slot():
+    async def scenario():
+        limiter = ModelCallLimiter(max_concurrent=1, queue_timeout=5)
+        with deadline_scope(60) as other_turn:
+            await limiter.acquire(owner=other_turn)
+
+        with deadline_scope(60) as turn:
+            waiting = asyncio.create_task(limiter.acquire(owner=turn))
+            await asyncio.sleep(0.01)
+            turn.cancel("client disconnected")
+            with pytest.raises(DeadlineExceeded, match="client disconnected"):
+                await asyncio.wait_for(waiting, 0.5)
+
+        # The runner releases the turn's slot even though after_model never ran
+        limiter.release(other_turn)
+        return limiter.stats()
+
+    assert asyncio.run(scenario()) == {"in_use": 0, "queued": 0, "max_concurrent": 1}
+    assert current_deadline.get() is None
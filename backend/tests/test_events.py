@@ -0,0 +1,60 @@
+import asyncio
+
+from utils.events import UserEventBus
+
+def test_publish_reaches_every_stream_of_the_user():
+    async def run():
+        bus = UserEventBus()
+        first, second = bus.subscribe("u1"), bus.subscribe("u1")
+        other = bus.subscribe("u2")
+        bus.publish("u1", "reward", {"xp_earned": 10})
+        assert first.get_nowait()["seq"] == 1 and second.get_nowait()["xp_earned"] == 10
+        assert other.empty()
+    asyncio.run(run())
+
+def test_reconnect_replays_missed_updates():
+    async def run():
+        bus = UserEventBus(grace=60)
+        queue = bus.subscribe("u1")
+        bus.publish("u1", "reward", {})
+        bus.unsubscribe("u1", queue)
+        bus.publish("u1", "level_up", {})
+        replayed = bus.subscribe("u1", last_seq=1)
+        assert replayed.get_nowait()["type"] == "level_up" and replayed.empty()
+        assert bus.last_seq("u1") == 2
+    asyncio.run(run())
+
+def test_state_is_evicted_after_the_last_stream_closes():
+    async def run():
+        bus = UserEventBus(grace=0.01)
+        queue = bus.subscribe("u1")
+        bus.publish("u1", "reward", {})
+        bus.unsubscribe("u1", queue)
+        await asyncio.sleep(0.05)
+        assert bus.last_seq("u1") == 0
+        assert not bus._seq and not bus._recent and not bus._evictions
+        # Nobody is listening, so nothing is kept for the user
+        assert bus.publish("u1", "reward", {})["seq"] == 0
+        assert not bus._seq and not bus._recent
+    asyncio.run(run())
+
+def test_resubscribing_within_the_grace_period_cancels_eviction():
+    async def run():
+        bus = UserEventBus(grace=0.02)
+        bus.unsubscribe("u1", bus.subscribe("u1"))
+        bus.publish("u1", "reward", {})
+        queue = bus.subscribe("u1")
+        await asyncio.sleep(0.05)
+        assert bus.last_seq("u1") == 1
+        bus.unsubscribe("u1", queue)
+    asyncio.run(run())
+
+def test_one_queue_can_merge_two_streams():
+    async def run():
+        bus = UserEventBus()
+        queue = bus.subscribe("profile-1")
+        bus.subscribe("session-9", queue=queue)
+        bus.publish("session-9", "syllabus_import", {"stage": "parsed"})
+        bus.publish("profile-1", "purchase", {"coins_spent": 5})
+        assert [queue.get_nowait()["type"], queue.get_nowait()["type"]] == ["syllabus_import", "purchase"]
+    asyncio.run(run())
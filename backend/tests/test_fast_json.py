@@ -0,0 +1,81 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from pydantic import BaseModel
+
+import utils.fast_json as fast_json
+from utils.fast_json import EncodedCache, FastJSONResponse, dumps
+
+class Item(BaseModel):
+    name: str
+    price: Decimal
+
+@pytest.fixture(params=["orjson", "pydantic-core"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        if fast_json.orjson is None:
+            pytest.skip("orjson not installed")
+    else:
+        monkeypatch.setattr(fast_json, "orjson", None)
+    return request.param
+
+def test_dumps_encodes_models_dates_sets_and_decimals(encoder):
+    body = json.loads(dumps({"day": date(2025, 10, 20), "tags": {"a"}, "price": Decimal("2.50"),
+                             "items": [{"cost": Decimal("1")}], "item": Item(name="hat", price=Decimal("3.25"))}))
+    assert body == {"day": "2025-10-20", "tags": ["a"], "price": 2.5, "items": [{"cost": 1.0}],
+                    "item": {"name": "hat", "price": "3.25"}}
+
+def test_dumps_rejects_unknown_types(encoder):
+    with pytest.raises((TypeError, ValueError)):
+        dumps({"value": object()})
+
+def test_cache_hits_until_the_version_changes():
+    cache = EncodedCache()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {"items": len(calls)}
+    first = cache.response("shop", build, version=1)
+    second = cache.response("shop", build, version=1)
+    assert first.body == second.body == b'{"items":1}'
+    assert 'cache;desc="miss"' in first.headers["Server-Timing"]
+    assert 'cache;desc="hit"' in second.headers["Server-Timing"]
+    assert json.loads(cache.response("shop", build, version=2).body) == {"items": 2}
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_cache_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(fast_json.time, "monotonic", lambda: now[0])
+    cache = EncodedCache(ttl=30)
+    cache.put("events", b"[]")
+    now[0] += 29
+    assert cache.get("events") == b"[]"
+    now[0] += 2
+    assert cache.get("events") is None
+
+def test_cache_evicts_least_recently_used():
+    cache = EncodedCache(max_entries=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    cache.get("a")
+    cache.put("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1" and cache.get("c") == b"3"
+
+def test_invalidate_one_key_or_all():
+    cache = EncodedCache()
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    cache.invalidate("a")
+    assert cache.get("a") is None and cache.get("b") == b"2"
+    cache.invalidate()
+    assert cache.get("b") is None
+
+def test_response_sends_preencoded_bytes_as_is():
+    response = FastJSONResponse(b'{"ok":true}', cache_hit=True)
+    assert response.body == b'{"ok":true}'
+    assert response.media_type == "application/json"
+    assert response.headers["Server-Timing"].startswith("encode;dur=")
@@ -0,0 +1,54 @@
+import random
+
+from utils.leaderboard import Leaderboard
+
+def board(*rows):
+    leaderboard = Leaderboard()
+    leaderboard.load({"user_id": user_id, "xp": xp, "level": level} for user_id, xp, level in rows)
+    return leaderboard
+
+def test_top_orders_by_xp_then_level_then_user_id():
+    leaderboard = board(("c", 50, 1), ("a", 120, 2), ("b", 120, 3), ("d", 50, 1))
+    assert [row["user_id"] for row in leaderboard.top()] == ["b", "a", "c", "d"]
+    assert leaderboard.top(limit=2, offset=1) == [
+        {"rank": 2, "user_id": "a", "xp": 120, "level": 2},
+        {"rank": 3, "user_id": "c", "xp": 50, "level": 1},
+    ]
+
+def test_ties_share_a_competition_rank():
+    leaderboard = board(("a", 100, 2), ("b", 80, 1), ("c", 80, 1), ("d", 10, 1))
+    assert [row["rank"] for row in leaderboard.top()] == [1, 2, 2, 4]
+    assert leaderboard.rank("c") == {"rank": 2, "user_id": "c", "xp": 80, "level": 1, "total_users": 4}
+    assert leaderboard.rank("nobody") is None
+
+def test_update_moves_a_user_and_remove_drops_them():
+    leaderboard = board(("a", 100, 2), ("b", 50, 1))
+    leaderboard.update("b", 150, 2)
+    leaderboard.update("new", 75, 1)
+    assert [row["user_id"] for row in leaderboard.top()] == ["b", "a", "new"]
+    leaderboard.remove("a")
+    leaderboard.remove("a")  # unknown users are ignored
+    assert leaderboard.rank("new")["rank"] == 2 and len(leaderboard) == 2
+
+def test_group_ranks_members_among_themselves():
+    leaderboard = board(("a", 300, 4), ("b", 200, 3), ("c", 200, 3), ("d", 100, 2))
+    assert leaderboard.group(["d", "c", "b", "ghost"]) == [
+        {"rank": 1, "user_id": "b", "xp": 200, "level": 3},
+        {"rank": 1, "user_id": "c", "xp": 200, "level": 3},
+        {"rank": 3, "user_id": "d", "xp": 100, "level": 2},
+    ]
+
+def test_incremental_updates_match_a_full_sort():
+    rng = random.Random(3)
+    leaderboard = Leaderboard()
+    profiles = {}
+    for _ in range(500):
+        user_id = f"u{rng.randrange(60)}"
+        xp = rng.randrange(0, 400, 10)
+        profiles[user_id] = (xp, xp // 100 + 1)
+        leaderboard.update(user_id, *profiles[user_id])
+    expected = sorted(profiles, key=lambda u: (-profiles[u][0], -profiles[u][1], u))
+    assert [row["user_id"] for row in leaderboard.top(limit=len(profiles))] == expected
+    for user_id, (xp, level) in profiles.items():
+        better = sum(1 for other in profiles.values() if other > (xp, level))
+        assert leaderboard.rank(user_id)["rank"] == better + 1
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from utils.gemini import ModelCallLimiter, ModelBusyError, INTERACTIVE, BACKGROUND
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_waiters_are_served_by_priority_then_fifo():
+    async def scenario():
+        limiter = ModelCallLimiter(max_concurrent=1)
+        await limiter.acquire(owner="holder")
+        order = []
+
+        async def waiter(name, priority):
+            await limiter.acquire(priority, owner=name)
+            order.append(name)
+            limiter.release(name)
+
+        tasks = [asyncio.create_task(waiter("batch", BACKGROUND)),
+                 asyncio.create_task(waiter("chat-1", INTERACTIVE)),
+                 asyncio.create_task(waiter("chat-2", INTERACTIVE))]
+        await asyncio.sleep(0)
+        limiter.release("holder")
+        await asyncio.gather(*tasks)
+        return order
+
+    assert run(scenario()) == ["chat-1", "chat-2", "batch"]
+
+def test_queue_timeout_raises_busy_and_frees_nothing():
+    async def scenario():
+        limiter = ModelCallLimiter(max_concurrent=1)
+        await limiter.acquire(owner="holder")
+        with pytest.raises(ModelBusyError):
+            await limiter.acquire(owner="late", timeout=0.01)
+        return limiter.stats()
+
+    assert run(scenario()) == {"in_use": 1, "queued": 0, "max_concurrent": 1}
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    async def scenario():
+        limiter = ModelCallLimiter(max_concurrent=1)
+        await limiter.acquire(owner="holder")
+        task = asyncio.create_task(limiter.acquire(owner="gone"))
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        limiter.release("holder")
+        # The slot went to nobody, so the next caller gets it right away
+        await asyncio.wait_for(limiter.acquire(owner="next"), 0.1)
+        return limiter.stats()
+
+    assert run(scenario())["in_use"] == 1
+
+def test_slot_is_released_when_the_body_raises():
+    async def scenario():
+        limiter = ModelCallLimiter(max_concurrent=1)
+        with pytest.raises(RuntimeError):
+            async with limiter.slot():
+                raise RuntimeError("model call failed")
+        return limiter.stats()
+
+    assert run(scenario())["in_use"] == 0
+
+def test_reacquire_by_the_same_owner_is_a_no_op():
+    async def scenario():
+        limiter = ModelCallLimiter(max_concurrent=1)
+        await limiter.acquire(owner="turn")
+        await asyncio.wait_for(limiter.acquire(owner="turn"), 0.1)
+        return limiter.stats()
+
+    assert run(scenario())["in_use"] == 1
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from google.auth import crypt, jwt
+
+import utils.oauth as oauth
+
+CLIENT_ID = "test-client.apps.googleusercontent.com"
+
+def _key_pair():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption())
+    public_pem = key.public_key().public_bytes(serialization.Encoding.PEM,
+                                               serialization.PublicFormat.SubjectPublicKeyInfo)
+    return private_pem, public_pem.decode()
+
+KEY_1 = _key_pair()
+KEY_2 = _key_pair()
+
+class KeyServer:
+    """Stand-in for Google's cert endpoint: serves {kid: public key PEM} and counts fetches."""
+
+    def __init__(self):
+        self.certs = {}
+        self.fetches = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.fetches += 1
+                body = json.dumps(server.certs).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", "public, max-age=3600")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/certs"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def key_server(monkeypatch):
+    server = KeyServer()
+    server.certs = {"kid-1": KEY_1[1]}
+    monkeypatch.setattr(oauth, "signing_keys", oauth.SigningKeyCache(server.url))
+    monkeypatch.setattr(oauth.settings, "GOOGLE_CLIENT_ID", CLIENT_ID)
+    yield server
+    server.close()
+
+def make_token(private_pem=KEY_1[0], kid="kid-1", **overrides):
+    now = int(time.time())
+    claims = {"iss": "https://accounts.google.com", "aud": CLIENT_ID, "sub": "1234",
+              "email": "student@example.com", "iat": now, "exp": now + 3600, **overrides}
+    signer = crypt.RSASigner.from_string(private_pem, key_id=kid)
+    return jwt.encode(signer, claims).decode()
+
+def verify(token):
+    async def run():
+        try:
+            return await oauth.verify_id_token(token)
+        finally:
+            # The pooled client belongs to this test's event loop
+            await oauth.close_http_client()
+    return asyncio.run(run())
+
+def test_valid_token_returns_claims(key_server):
+    claims = verify(make_token())
+    assert claims["sub"] == "1234" and claims["email"] == "student@example.com"
+
+def test_bad_signature_is_rejected(key_server):
+    # Signed with another key but claiming kid-1
+    with pytest.raises(ValueError):
+        verify(make_token(private_pem=KEY_2[0]))
+
+def test_wrong_audience_is_rejected(key_server):
+    with pytest.raises(ValueError, match="audience"):
+        verify(make_token(aud="someone-else.apps.googleusercontent.com"))
+
+def test_wrong_issuer_is_rejected(key_server):
+    with pytest.raises(ValueError, match="issuer"):
+        verify(make_token(iss="https://evil.example.com"))
+
+def test_expired_token_is_rejected(key_server):
+    now = int(time.time())
+    with pytest.raises(ValueError, match="expired"):
+        verify(make_token(iat=now - 7200, exp=now - 3600))
+
+def test_missing_client_id_fails_closed(key_server, monkeypatch):
+    monkeypatch.setattr(oauth.settings, "GOOGLE_CLIENT_ID", None)
+    with pytest.raises(ValueError, match="GOOGLE_CLIENT_ID"):
+        verify(make_token())
+
+def test_certs_are_cached_between_verifications(key_server):
+    verify(make_token())
+    verify(make_token())
+    assert key_server.fetches == 1
+
+def test_unknown_kid_refetches_after_key_rotation(key_server, monkeypatch):
+    monkeypatch.setattr(oauth, "MIN_REFETCH_INTERVAL", 0)
+    verify(make_token())
+    key_server.certs = {"kid-2": KEY_2[1]}
+    claims = verify(make_token(private_pem=KEY_2[0], kid="kid-2"))
+    assert claims["sub"] == "1234"
+    assert key_server.fetches == 2
+
+def test_unknown_kid_refetch_is_rate_limited(key_server):
+    verify(make_token())
+    with pytest.raises(ValueError, match="unknown key id"):
+        verify(make_token(private_pem=KEY_2[0], kid="kid-2"))
+    # Garbage key ids can't make us hammer the cert endpoint
+    assert key_server.fetches == 1
+
+def authenticate(authorization):
+    async def run():
+        try:
+            return await oauth.authenticated_user(authorization)
+        finally:
+            await oauth.close_http_client()
+    return asyncio.run(run())
+
+def test_bearer_id_token_authenticates_its_subject(key_server):
+    assert authenticate(f"Bearer {make_token()}") == "1234"
+
+def test_requests_without_a_token_act_as_the_default_user(key_server):
+    assert authenticate(None) == oauth.DEFAULT_USER
+
+@pytest.mark.parametrize("authorization", ["Basic abc", "Bearer ", "Bearer not-a-jwt"])
+def test_bad_authorization_is_rejected(key_server, authorization):
+    with pytest.raises(HTTPException) as raised:
+        authenticate(authorization)
+    assert raised.value.status_code == 401
+
+def test_token_for_another_client_is_rejected(key_server):
+    with pytest.raises(HTTPException) as raised:
+        authenticate(f"Bearer {make_token(aud='someone-else.apps.googleusercontent.com')}")
+    assert raised.value.status_code == 401
+
+def test_batches_from_anonymous_callers_are_rejected():
+    with pytest.raises(HTTPException) as raised:
+        oauth.batch_calendar_user(["1234"], oauth.DEFAULT_USER)
+    assert raised.value.status_code == 401
+
+def test_batch_items_must_all_belong_to_the_caller():
+    assert oauth.batch_calendar_user(["1234", "1234"], "1234") == "1234"
+    with pytest.raises(HTTPException) as raised:
+        oauth.batch_calendar_user(["1234", "5678"], "1234")
+    assert raised.value.status_code == 403 and "5678" in raised.value.detail
+
+def test_single_turns_as_another_user_are_rejected():
+    assert oauth.turn_calendar_user("anyone", oauth.DEFAULT_USER) == oauth.DEFAULT_USER
+    with pytest.raises(HTTPException) as raised:
+        oauth.turn_calendar_user("5678", "1234")
+    assert raised.value.status_code == 403
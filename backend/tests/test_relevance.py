@@ -0,0 +1,80 @@
+from utils.relevance import (MAX_SECTION_LINES, RELEVANCE_MIN_SCORE, filter_relevant, is_relevant_page,
+                             score_section, split_sections)
+
+POLICY = """ACADEMIC INTEGRITY
+Plagiarism and any violation of the honor code will be reported. Please read the
+integrity policy on the course website. Contact me by email or come to office hours
+if you need an accommodation for a disability."""
+
+SCHEDULE = """SCHEDULE
+Week 1   Sep 2    Introduction
+Week 2   Sep 9    Homework 1 due
+Week 5   Sep 30   Midterm exam
+Week 8   Oct 21   Project proposal due"""
+
+DEADLINES = """Deadlines:
+Essay 1 due 10/03/2025
+Lab report due 2025-10-17
+Final exam December 12th"""
+
+def test_split_on_page_breaks_blank_lines_and_headings():
+    text = f"{POLICY}\n\n{SCHEDULE}\fGRADING\nHomework counts for 40% of the grade."
+    sections = split_sections(text)
+    assert sections[0].startswith("ACADEMIC INTEGRITY") and sections[1].startswith("SCHEDULE")
+    assert sections[-1] == "GRADING\nHomework counts for 40% of the grade."
+
+def test_long_sections_are_cut():
+    text = "\n".join(f"line {i} of a long paragraph, with details." for i in range(MAX_SECTION_LINES * 2 + 1))
+    assert [len(s.splitlines()) for s in split_sections(text)] == [MAX_SECTION_LINES, MAX_SECTION_LINES, 1]
+
+def test_schedules_score_above_boilerplate():
+    assert score_section(SCHEDULE) >= RELEVANCE_MIN_SCORE
+    assert score_section(DEADLINES) >= RELEVANCE_MIN_SCORE
+    assert score_section(POLICY) < RELEVANCE_MIN_SCORE
+    assert score_section("") == 0.0
+
+def test_deadline_words_without_dates_are_discounted():
+    undated = "Homework is due every week\nThe final project is a report"
+    dated = "Homework due Sep 9\nThe final project report due Dec 1"
+    assert score_section(undated) < RELEVANCE_MIN_SCORE <= score_section(dated)
+
+def test_filter_keeps_schedule_sections_and_counts_savings():
+    text = "\n\n".join([POLICY, SCHEDULE, POLICY, DEADLINES])
+    filtered, stats = filter_relevant(text)
+    assert "Midterm exam" in filtered and "Final exam" in filtered
+    assert "Plagiarism" not in filtered
+    # The bare "SCHEDULE" heading is kept along with the table under it
+    assert stats["sections_kept"] == 3 and not stats["fallback"]
+    assert stats["tokens_saved"] == stats["tokens_before"] - stats["tokens_after"] > 0
+
+def test_heading_on_its_own_is_kept_with_its_section():
+    text = f"{POLICY}\n\nImportant Dates\n\n{DEADLINES}"
+    filtered, _ = filter_relevant(text)
+    assert filtered.startswith("Important Dates\n\nDeadlines:")
+
+def test_falls_back_to_the_full_text_when_nothing_scores():
+    filtered, stats = filter_relevant(POLICY)
+    assert filtered == POLICY
+    assert stats["fallback"] and stats["tokens_saved"] == 0
+
+def test_is_relevant_page():
+    assert is_relevant_page(f"{POLICY}\n\n{SCHEDULE}")
+    assert not is_relevant_page(POLICY)
+
+def test_all_caps_and_numbered_headings_start_sections():
+    text = ("Readings are posted online each week\n"
+            "WEEK 3 – MIDTERM REVIEW\nbring questions on chapters 1-4\n"
+            "WEEK 4 – Midterm\nthe exam is in the usual room\n"
+            "2. Course Schedule\nsee the table below\n"
+            "3.1 Schedule of Readings\nchapter five and six")
+    assert [section.splitlines()[0] for section in split_sections(text)] == [
+        "Readings are posted online each week", "WEEK 3 – MIDTERM REVIEW", "WEEK 4 – Midterm",
+        "2. Course Schedule", "3.1 Schedule of Readings"]
+
+def test_sentences_are_not_headings():
+    text = "the midterm covers chapters 1-4\nHomework is due every Friday\nsee the course site for details"
+    assert split_sections(text) == [text]
+
+def test_numbered_heading_is_kept_with_its_section():
+    filtered, _ = filter_relevant(f"{POLICY}\n\n4. Important Dates\n\n{DEADLINES}")
+    assert filtered.startswith("4. Important Dates\n\nDeadlines:")
@@ -0,0 +1,57 @@
+import utils.storefront as storefront_module
+from utils.storefront import Storefront
+
+CATALOG = [
+    {"id": "hat", "name": "Hat", "description": "", "coin_price": 50, "created_at": "ignored"},
+    {"id": "cape", "name": "Cape", "description": "", "coin_price": 200},
+    {"id": "pin", "name": "Pin", "description": "", "coin_price": 10},
+]
+
+def loaded():
+    storefront = Storefront()
+    storefront.load(CATALOG)
+    return storefront
+
+def test_catalog_is_ordered_by_price_and_trimmed():
+    storefront = loaded()
+    assert [item["id"] for item in storefront.items] == ["pin", "hat", "cape"]
+    assert storefront.item("hat") == {"id": "hat", "name": "Hat", "description": "", "coin_price": 50}
+    assert storefront.item("missing") is None
+
+def test_ownership_bitset():
+    storefront = loaded()
+    assert not storefront.has_ownership("u1")
+    storefront.load_ownership("u1", ["cape", "retired-item"])
+    assert storefront.owns("u1", "cape") and not storefront.owns("u1", "hat")
+    storefront.mark_owned("u1", "pin")
+    assert storefront.owned_count("u1") == 2
+    # Users whose purchases were never loaded aren't marked piecemeal
+    storefront.mark_owned("u2", "pin")
+    assert not storefront.has_ownership("u2")
+
+def test_view_flags_owned_and_affordable_items():
+    storefront = loaded()
+    storefront.load_ownership("u1", ["pin"])
+    view = storefront.view("u1", coins=60)
+    assert [(item["id"], item["owned"], item["affordable"]) for item in view] == [
+        ("pin", True, True), ("hat", False, True), ("cape", False, False)]
+
+def test_reload_clears_ownership_because_positions_change():
+    storefront = loaded()
+    storefront.load_ownership("u1", ["hat"])
+    storefront.load(CATALOG + [{"id": "badge", "name": "Badge", "description": "", "coin_price": 20}])
+    assert not storefront.has_ownership("u1")
+    storefront.load_ownership("u1", ["hat"])
+    assert storefront.owns("u1", "hat") and not storefront.owns("u1", "badge")
+
+def test_staleness_and_reload_throttle(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(storefront_module.time, "monotonic", lambda: now[0])
+    storefront = Storefront()
+    assert storefront.is_stale() and storefront.can_reload()
+    storefront.load(CATALOG)
+    assert not storefront.is_stale() and not storefront.can_reload()
+    now[0] += storefront_module.MIN_RELOAD_INTERVAL
+    assert storefront.can_reload() and not storefront.is_stale()
+    now[0] += storefront_module.CATALOG_TTL
+    assert storefront.is_stale()
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import time
+from datetime import date, timedelta
+
+import pytest
+
+import utils.streak_maintenance as streak_maintenance
+from utils.streak_maintenance import StreakMaintenanceJob
+from utils.streaks import ActivityBitmap
+
+TODAY = date(2025, 10, 20)
+
+class FakeQuery:
+    """Just enough of a postgrest builder for the job, over in-memory tables."""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.filters = []
+        self.values = None
+        self.row_limit = None
+
+    def select(self, *columns):
+        return self
+
+    def update(self, values):
+        self.values = values
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row[column] > value)
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def is_(self, column, value):
+        assert value == "null"
+        self.filters.append(lambda row: row.get(column) is None)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row[column] in values)
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def execute(self):
+        rows = sorted((row for row in self.db.tables[self.table].values() if all(f(row) for f in self.filters)),
+                      key=lambda row: row["user_id"])
+        if self.values is not None:
+            self.db.before_update(rows)
+            rows = [row for row in rows if all(f(row) for f in self.filters)]
+            for row in rows:
+                row.update(self.values)
+            self.db.updates += 1
+        elif self.row_limit is not None:
+            rows = rows[:self.row_limit]
+        return type("Result", (), {"data": [dict(row) for row in rows]})
+
+class FakeRpc:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return type("Result", (), {"data": self.result})
+
+class FakeSupabase:
+    def __init__(self, profiles, activity):
+        self.tables = {"user_profiles": profiles, "user_activity": activity}
+        self.updates = 0
+        self.before_update = lambda rows: None
+        # sql/claim_maintenance_run.sql: (job, run_date) -> lease
+        self.runs = {}
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params):
+        key = (params["p_job"], params["p_run_date"])
+        run = self.runs.get(key)
+        if name == "claim_maintenance_run":
+            if run and (run["done"] or (run["lease_until"] > time.time() and run["owner"] != params["p_owner"])):
+                return FakeRpc(False)
+            self.runs[key] = {"owner": params["p_owner"], "done": False,
+                              "lease_until": time.time() + params["p_lease_seconds"]}
+            return FakeRpc(True)
+        assert name == "finish_maintenance_run"
+        if run and run["owner"] == params["p_owner"]:
+            run.update(done=params["p_done"], lease_until=time.time())
+        return FakeRpc(None)
+
+def make_db(users=50, last_active=lambda i: TODAY - timedelta(days=i % 4)):
+    """Every user has a stored streak of 3; users with i % 4 >= 2 were last active 2-3 days ago."""
+    profiles, activity = {}, {}
+    for i in range(users):
+        user_id = f"u{i:04d}"
+        profiles[user_id] = {"user_id": user_id, "streak": 3}
+        bitmap = ActivityBitmap()
+        for day in range(3):
+            bitmap.mark(last_active(i) - timedelta(days=day))
+        activity[user_id] = {"user_id": user_id, **bitmap.to_record()}
+    return FakeSupabase(profiles, activity)
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return str(tmp_path / "streaks.json")
+
+def run(db, checkpoint, **kwargs):
+    job = StreakMaintenanceJob(db, today=TODAY, chunk_size=8, concurrency=3, checkpoint_path=checkpoint, **kwargs)
+    return asyncio.run(job.run())
+
+def test_resets_broken_streaks_with_one_update_per_value(checkpoint):
+    db = make_db()
+    updated = {}
+    stats = run(db, checkpoint, on_update=updated.__setitem__)
+    streaks = {row["user_id"]: row["streak"] for row in db.tables["user_profiles"].values()}
+    # Active today or yesterday keeps the 3-day streak, older activity breaks it
+    assert all(streak == (3 if int(user_id[1:]) % 4 < 2 else 0) for user_id, streak in streaks.items())
+    assert stats["rows_scanned"] == 50 and stats["streaks_broken"] == 24 and stats["errors"] == 0
+    assert set(updated) == {user_id for user_id, streak in streaks.items() if streak == 0}
+    # One (3 -> 0) group per chunk; the last chunk (u0048, u0049) has nothing to write
+    assert db.updates == 6
+
+def test_update_skips_users_whose_streak_changed_since_the_read(checkpoint):
+    db = make_db()
+
+    def complete_task_meanwhile(rows):
+        # u0002 completes a task between the page read and the bulk update
+        db.tables["user_profiles"]["u0002"]["streak"] = 1
+    db.before_update = complete_task_meanwhile
+    updated = {}
+    stats = run(db, checkpoint, on_update=updated.__setitem__)
+    assert db.tables["user_profiles"]["u0002"]["streak"] == 1
+    assert "u0002" not in updated
+    assert stats["rows_updated"] == 23
+
+def test_null_streak_is_matched_by_the_guard(checkpoint):
+    db = make_db(users=4)
+    db.tables["user_profiles"]["u0003"]["streak"] = None
+    # u0003's last activity was 3 days ago, but its streak was never stored: nothing to break
+    run(db, checkpoint)
+    assert db.tables["user_profiles"]["u0003"]["streak"] is None
+    db = make_db(users=4, last_active=lambda i: TODAY)
+    db.tables["user_profiles"]["u0003"]["streak"] = None
+    run(db, checkpoint + ".2")
+    assert db.tables["user_profiles"]["u0003"]["streak"] == 3
+
+def test_failed_chunk_is_retried_by_the_next_run(checkpoint):
+    db = make_db()
+
+    def fail_on_u0022(rows):
+        if any(row["user_id"] == "u0022" for row in rows):
+            raise RuntimeError("connection reset")
+    db.before_update = fail_on_u0022
+    first = run(db, checkpoint)
+    assert first["errors"] == 1
+    saved = json.load(open(checkpoint))
+    assert not saved["done"] and saved["cursor"] < "u0022"
+
+    db.before_update = lambda rows: None
+    second = run(db, checkpoint)
+    assert second["errors"] == 0
+    assert json.load(open(checkpoint))["done"]
+    # Resumes after the checkpoint, so the chunks before it aren't scanned twice
+    assert second["rows_scanned"] == 50
+    assert all(row["streak"] == (3 if int(row["user_id"][1:]) % 4 < 2 else 0)
+               for row in db.tables["user_profiles"].values())
+
+def test_finished_day_is_skipped(checkpoint):
+    db = make_db()
+    run(db, checkpoint)
+    updates = db.updates
+    assert run(db, checkpoint)["skipped"]
+    assert db.updates == updates
+
+def test_finished_day_is_skipped_on_other_hosts_too(checkpoint):
+    db = make_db()
+    run(db, checkpoint)
+    updates = db.updates
+    # Another host has no checkpoint file, but the day is done in the database
+    assert run(db, checkpoint + ".other-host")["skipped"]
+    assert db.updates == updates
+
+def test_run_is_skipped_while_another_worker_holds_the_lease(checkpoint):
+    db = make_db()
+    db.runs[("streaks", TODAY.isoformat())] = {"owner": "other-host:1", "done": False,
+                                               "lease_until": time.time() + 60}
+    assert run(db, checkpoint)["skipped"]
+    assert db.updates == 0
+    # The holder crashed: once its lease runs out the pass is taken over
+    db.runs[("streaks", TODAY.isoformat())]["lease_until"] = time.time() - 1
+    assert not run(db, checkpoint).get("skipped")
+    assert db.runs[("streaks", TODAY.isoformat())]["done"]
+
+def test_checkpoint_defaults_to_an_absolute_path_and_creates_its_directory(tmp_path):
+    assert os.path.isabs(streak_maintenance.STREAK_CHECKPOINT_FILE)
+    path = str(tmp_path / "data" / "streaks.json")
+    job = StreakMaintenanceJob(make_db(), today=TODAY, checkpoint_path=path)
+    job.save_checkpoint("u0001")
+    assert job.load_checkpoint()["cursor"] == "u0001"
@@ -0,0 +1,87 @@
+import random
+from datetime import date, timedelta
+
+from utils.streaks import ActivityBitmap
+
+TODAY = date(2025, 10, 20)
+
+def days_ago(*offsets):
+    return [TODAY - timedelta(days=n) for n in offsets]
+
+def bitmap_of(days):
+    bitmap = ActivityBitmap()
+    for day in days:
+        bitmap.mark(day)
+    return bitmap
+
+def reference_streak(active: set, today: date) -> int:
+    day = today if today in active else today - timedelta(days=1)
+    streak = 0
+    while day in active:
+        streak += 1
+        day -= timedelta(days=1)
+    return streak
+
+def reference_longest(active: set) -> int:
+    return max((reference_streak(active, day) for day in active), default=0)
+
+def test_empty_bitmap():
+    bitmap = ActivityBitmap()
+    assert bitmap.current_streak(TODAY) == 0
+    assert bitmap.window(TODAY) == 0
+    assert not bitmap.is_active(TODAY)
+
+def test_streak_counts_today_or_yesterday():
+    assert bitmap_of(days_ago(0, 1, 2)).current_streak(TODAY) == 3
+    # Today has no activity yet: the streak from yesterday still stands
+    assert bitmap_of(days_ago(1, 2)).current_streak(TODAY) == 2
+    assert bitmap_of(days_ago(2, 3)).current_streak(TODAY) == 0
+
+def test_mark_reports_duplicates_and_grows_backwards():
+    bitmap = ActivityBitmap()
+    assert bitmap.mark(TODAY)
+    assert not bitmap.mark(TODAY)
+    # Before the origin: the bits shift up and the origin moves back
+    assert bitmap.mark(TODAY - timedelta(days=3))
+    assert bitmap.origin == (TODAY - timedelta(days=3)).toordinal()
+    assert bitmap.is_active(TODAY) and bitmap.is_active(TODAY - timedelta(days=3))
+    assert not bitmap.is_active(TODAY - timedelta(days=1))
+
+def test_filling_a_gap_joins_runs_into_the_longest_streak():
+    bitmap = bitmap_of(days_ago(0, 1, 3, 4, 5))
+    assert bitmap.longest == 3
+    bitmap.mark(TODAY - timedelta(days=2))
+    assert bitmap.longest == 6 and bitmap.current_streak(TODAY) == 6
+
+def test_matches_a_set_based_reference():
+    rng = random.Random(7)
+    for _ in range(200):
+        active = set(days_ago(*rng.sample(range(60), rng.randint(0, 40))))
+        days = list(active)
+        rng.shuffle(days)  # marking order mustn't matter
+        bitmap = bitmap_of(days)
+        assert bitmap.current_streak(TODAY) == reference_streak(active, TODAY)
+        assert bitmap.longest == reference_longest(active)
+
+def test_window_and_heatmap():
+    bitmap = bitmap_of(days_ago(0, 2, 9))
+    # Bit 0 is the oldest day of the window
+    assert bitmap.window(TODAY, days=3) == 0b101
+    # A window reaching before the origin is zero-padded
+    assert bitmap.window(TODAY, days=12) == (1 << 11) | (1 << 9) | (1 << 2)
+    heatmap = bitmap.heatmap(TODAY, days=7)
+    assert heatmap == {"start": "2025-10-14", "end": "2025-10-20", "days": 7, "bitmap": "50", "active_days": 2}
+
+def test_record_round_trip():
+    bitmap = bitmap_of(days_ago(0, 1, 5))
+    restored = ActivityBitmap.from_record(bitmap.to_record())
+    assert (restored.origin, restored.bits, restored.longest) == (bitmap.origin, bitmap.bits, bitmap.longest)
+    empty = ActivityBitmap.from_record({"origin": None, "bitmap": None, "longest_streak": None})
+    assert empty.current_streak(TODAY) == 0 and empty.longest == 0
+
+def test_copy_is_independent():
+    bitmap = bitmap_of(days_ago(1))
+    staged = bitmap.copy()
+    staged.mark(TODAY)
+    assert staged.current_streak(TODAY) == 2 and staged.longest == 2
+    assert not bitmap.is_active(TODAY) and bitmap.longest == 1
@@ -0,0 +1,60 @@
+import asyncio
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+import tools.syllabus_pipeline as pipeline
+
+PAGES = ["Week 1 Sep 2 Homework 1 due", "Week 2 Sep 9 Midterm exam", "Week 3 Sep 16 Essay due"]
+
+@pytest.fixture(autouse=True)
+def fakes(monkeypatch):
+    pdf = SimpleNamespace(pages=[SimpleNamespace(extract_text=lambda text=text: text) for text in PAGES])
+
+    class Document:
+        def __enter__(self):
+            return pdf
+
+        def __exit__(self, *exc):
+            return False
+    monkeypatch.setitem(sys.modules, "pdfplumber", SimpleNamespace(open=lambda path: Document()))
+    monkeypatch.setattr(pipeline, "is_relevant_page", lambda text: True)
+
+    async def extract(text, previous_tail):
+        number = PAGES.index(text) + 1
+        return {"status": "success",
+                "assignments": [{"assignment_name": f"Item {number}", "due_date": f"2025-09-0{number}"}]}
+    monkeypatch.setattr(pipeline, "extract_assignment_list", extract)
+    monkeypatch.setattr(pipeline, "create_deadline_event",
+                        lambda name, due, description: {"status": "success", "action": "created"})
+
+def run(timeout=5):
+    return asyncio.run(asyncio.wait_for(pipeline.run_syllabus_import("u1", "syllabus.pdf"), timeout))
+
+def run_failing(error):
+    async def scenario():
+        with pytest.raises(error) as raised:
+            await asyncio.wait_for(pipeline.run_syllabus_import("u1", "syllabus.pdf"), 5)
+        # No stage is left running (or waiting on a queue) after the import gives up
+        leftover = asyncio.all_tasks() - {asyncio.current_task()}
+        assert not leftover
+        return raised.value
+    return asyncio.run(scenario())
+
+def test_every_page_becomes_an_event():
+    progress = run()
+    assert progress["pages_parsed"] == 3 and progress["events_created"] == 3 and progress["errors"] == 0
+
+def test_a_failing_extractor_stops_every_stage(monkeypatch):
+    def broken(text):
+        raise RuntimeError("relevance check failed")
+    monkeypatch.setattr(pipeline, "is_relevant_page", broken)
+    assert str(run_failing(RuntimeError)) == "relevance check failed"
+
+def test_a_failing_writer_stops_every_stage(monkeypatch):
+    def broken(name, due, description):
+        return {"status": "success"}  # no "action": the writer raises KeyError outside its try
+    monkeypatch.setattr(pipeline, "create_deadline_event", broken)
+    run_failing(KeyError)
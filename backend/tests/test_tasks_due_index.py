@@ -0,0 +1,85 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from backend.routes import tasks
+from backend.routes.tasks import Task
+
+NOW = datetime(2025, 10, 20, 12, 0)
+
+@pytest.fixture(autouse=True)
+def empty_store(monkeypatch):
+    monkeypatch.setattr(tasks, "TASKS", {})
+    monkeypatch.setattr(tasks, "DUE_INDEX", {})
+    monkeypatch.setattr(tasks, "INDEX_KEYS", {})
+    monkeypatch.setattr(tasks, "_utcnow", lambda: NOW)
+
+def create(task_id, due, user_id="u1", **fields):
+    return asyncio.run(tasks.create_task(Task(id=task_id, title=task_id, due=due, user_id=user_id, **fields)))
+
+def call(route, **params):
+    return json.loads(asyncio.run(route(**params)).body)
+
+def ids(page):
+    return [task["id"] for task in page["tasks"]]
+
+def test_due_lists_open_tasks_in_window_soonest_first():
+    create("later", "2025-10-25")
+    create("soon", "2025-10-20T15:00:00Z")
+    create("tomorrow", "2025-10-21T09:00:00+02:00")
+    create("next-month", "2025-11-30")
+    create("past", "2025-10-19")
+    create("done", "2025-10-22", completed=True)
+    create("someone-else", "2025-10-21", user_id="u2")
+    assert ids(call(tasks.tasks_due, user_id="u1")) == ["soon", "tomorrow", "later"]
+
+def test_overdue_lists_past_tasks_oldest_first():
+    create("yesterday", "2025-10-19")
+    create("last-week", "2025-10-13")
+    create("future", "2025-10-21")
+    assert ids(call(tasks.tasks_overdue, user_id="u1")) == ["last-week", "yesterday"]
+
+def test_cursor_pages_through_equal_due_dates_without_gaps():
+    for i in range(5):
+        create(f"t{i}", "2025-10-22")
+    first = call(tasks.tasks_due, user_id="u1", limit=2)
+    second = call(tasks.tasks_due, user_id="u1", limit=2, cursor=first["next_cursor"])
+    third = call(tasks.tasks_due, user_id="u1", limit=2, cursor=second["next_cursor"])
+    assert ids(first) + ids(second) + ids(third) == ["t0", "t1", "t2", "t3", "t4"]
+    assert third["next_cursor"] is None
+
+def test_completed_and_rescheduled_tasks_leave_the_index():
+    create("a", "2025-10-21")
+    create("b", "2025-10-22")
+    asyncio.run(tasks.complete_task("a"))
+    create("b", "2025-10-30")  # same id: moved, not duplicated
+    assert ids(call(tasks.tasks_due, user_id="u1", days=30)) == ["b"]
+    assert tasks.INDEX_KEYS == {"b": (datetime(2025, 10, 30), "b")}
+
+def test_limit_is_capped():
+    for i in range(tasks.MAX_PAGE_SIZE + 5):
+        create(f"t{i:03d}", "2025-10-22")
+    page = call(tasks.tasks_due, user_id="u1", limit=1000)
+    assert len(page["tasks"]) == tasks.MAX_PAGE_SIZE and page["next_cursor"]
+
+def test_bad_cursor_and_due_are_rejected():
+    create("x", "2025-10-22")
+    with pytest.raises(HTTPException) as raised:
+        call(tasks.tasks_due, user_id="u1", cursor="garbage")
+    assert raised.value.status_code == 400
+    with pytest.raises(HTTPException) as raised:
+        create("y", "next tuesday")
+    assert raised.value.status_code == 400
+
+def test_timezone_aware_cursor_is_normalized_to_utc():
+    for i in range(4):
+        create(f"t{i}", f"2025-10-22T0{i}:00:00Z")
+    # Same instant as t1's key, written with an offset and with Z
+    for cursor in ("2025-10-22T03:00:00+02:00|t1", "2025-10-22T01:00:00Z|t1"):
+        assert ids(call(tasks.tasks_due, user_id="u1", cursor=cursor)) == ["t2", "t3"]
+    with pytest.raises(HTTPException) as raised:
+        call(tasks.tasks_due, user_id="u1", cursor="2025-10-22T01:00:00+99:00|t1")
+    assert raised.value.status_code == 400
@@ -0,0 +1,57 @@
+import json
+import time
+
+import utils.tracing as tracing
+from utils.tracing import Tracer
+
+def read_spans(path):
+    if not path.exists():
+        return []
+    return [span["name"] for line in path.read_text().splitlines()
+            for span in json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_ending_a_root_span_does_not_write_the_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_FLUSH_SECONDS", 60)
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(str(path))
+    with tracer.span("agent.turn"):
+        with tracer.span("tool.call"):
+            pass
+    assert read_spans(path) == []
+    tracer.flush()
+    assert read_spans(path) == ["tool.call", "agent.turn"]
+
+def test_writer_thread_flushes_on_the_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_FLUSH_SECONDS", 0.05)
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(str(path))
+    with tracer.span("agent.turn"):
+        pass
+    assert wait_for(lambda: read_spans(path) == ["agent.turn"])
+
+def test_a_full_batch_wakes_the_writer_early(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_FLUSH_SECONDS", 60)
+    monkeypatch.setattr(tracing, "FLUSH_BATCH", 3)
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(str(path))
+    for i in range(3):
+        with tracer.span(f"step.{i}"):
+            pass
+    assert wait_for(lambda: len(read_spans(path)) == 3)
+
+def test_disabled_tracer_only_keeps_the_summary(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(str(path), enabled=False)
+    with tracer.span("agent.turn"):
+        pass
+    tracer.flush()
+    assert not path.exists()
+    assert tracer.summary()["slowest_turns"][0]["name"] == "agent.turn"
@@ -1,33 +1,163 @@
 import os
+import base64
+import hashlib
+import json
+import threading
 import datetime as dt
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from collections import OrderedDict
+from zoneinfo import ZoneInfo
 from googleapiclient.errors import HttpError
+from utils.calendar_scheduler import calendar_scheduler
+from utils.credentials import credential_store, current_calendar_user, DEFAULT_USER, SCOPES, MissingCredentialsError
+from utils.tracing import tracer
+from utils.deadlines import DeadlineExceeded
 
-SCOPES = ['https://www.googleapis.com/auth/calendar.events']
+# One service per user for the whole process, so the startup warm-up serves every thread.
+# Its requests aren't thread-safe over one httplib2.Http, so each request runs
+# on its calling thread's own connection (see _request_builder).
+_services: dict[str, tuple] = {}  # user -> (credentials, service)
+_services_lock = threading.Lock()
+_local = threading.local()
 
-def authenticate(): 
-    """Handles OAuth authentication and token management."""
-    creds = None 
+# Events this process has written or confirmed: (user, event id) -> body fingerprint
+_known_events: "OrderedDict[tuple, str]" = OrderedDict()
+_known_events_lock = threading.Lock()
+MAX_KNOWN_EVENTS = 10000
+# Fields compared when an event with the same deterministic id already exists
+COMPARED_FIELDS = ('summary', 'description', 'start', 'end', 'recurrence')
+# Bumped on every successful write this process makes to a user's calendar, so cached event lists can tell
+# they are stale. Reads sent as POST (freebusy.query) and failed writes leave it alone.
+_calendar_versions: dict[str, int] = {}
+_calendar_versions_lock = threading.Lock()  # writes run on scheduler threads
+WRITE_METHODS = ('insert', 'patch', 'update', 'delete', 'import', 'move', 'quickAdd')
 
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+def calendar_version(user_id: str = None) -> int:
+    return _calendar_versions.get(user_id or current_calendar_user.get(), 0)
 
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
+def _execute(request, read_key=None):
+    """Sends a Calendar API request through the shared rate-limited scheduler."""
+    user_id = current_calendar_user.get()
+    with tracer.span("calendar.request", method=getattr(request, "methodId", "") or ""):
+        result = calendar_scheduler.execute(request, user_id=user_id, read_key=read_key)
+    if (getattr(request, "methodId", "") or "").rsplit(".", 1)[-1] in WRITE_METHODS:
+        with _calendar_versions_lock:
+            _calendar_versions[user_id] = _calendar_versions.get(user_id, 0) + 1
+    return result
+
+@tracer.traced("calendar.authenticate")
+def authenticate(user_id: str = None): 
+    """Handles OAuth authentication and token management for one user (defaults to the current one)."""
+    user_id = user_id or current_calendar_user.get()
+    creds = credential_store.get(user_id)
+
+    if creds is None:
+        if user_id != DEFAULT_USER:
+            raise MissingCredentialsError(f"User {user_id} has not connected Google Calendar")
+        # Local development: run the first-time consent flow for the default user
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
+        creds = flow.run_local_server(port=0)
+        credential_store.put(user_id, creds)
+
+    with _services_lock:
+        cached = _services.get(user_id)
+        # A refresh hands out new credentials; rebuild so requests use them
+        if cached is not None and cached[0] is creds:
+            return cached[1]
+        from googleapiclient.discovery import build
+        service = build('calendar', 'v3', requestBuilder=_request_builder(creds),
+                        http=_thread_http(creds))
+        _services[user_id] = (creds, service)
+        return service
+
+def _thread_http(creds):
+    """This thread's connection, authorized as `creds`."""
+    import google_auth_httplib2
+    import httplib2
+    http = getattr(_local, 'http', None)
+    if http is None:
+        http = _local.http = httplib2.Http()
+    return google_auth_httplib2.AuthorizedHttp(creds, http=http)
+
+def _request_builder(creds):
+    from googleapiclient.http import HttpRequest
+
+    def build_request(http, *args, **kwargs):
+        # Ignore the service's http (built on another thread) and use this thread's
+        return HttpRequest(_thread_http(creds), *args, **kwargs)
+    return build_request
+
+def event_id_for(idempotency_key: str) -> str:
+    """Deterministic Google event id for a key (base32hex: only a-v and 0-9 are allowed)."""
+    digest = hashlib.sha256(idempotency_key.encode("utf-8")).digest()
+    return base64.b32hexencode(digest).decode("ascii").lower().rstrip("=")[:32]
+
+def _normalized_time(value: dict):
+    """The same instant compares equal however Google echoes it back (offset, 'Z', timeZone)."""
+    if not value or 'date' in value:
+        return value and value['date']
+    moment = dt.datetime.fromisoformat(value['dateTime'].replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=ZoneInfo(value.get('timeZone') or 'UTC'))
+    return moment.astimezone(dt.timezone.utc).isoformat()
+
+def _fingerprint(event: dict) -> str:
+    # Empty fields are left out because Google omits them in responses
+    fields = {name: event.get(name) for name in COMPARED_FIELDS if event.get(name)}
+    for name in ('start', 'end'):
+        if name in fields:
+            fields[name] = _normalized_time(fields[name])
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _remember_event(event_id: str, fingerprint: str):
+    key = (current_calendar_user.get(), event_id)
+    with _known_events_lock:
+        _known_events[key] = fingerprint
+        _known_events.move_to_end(key)
+        while len(_known_events) > MAX_KNOWN_EVENTS:
+            _known_events.popitem(last=False)
+
+def _forget_event(event_id: str):
+    with _known_events_lock:
+        _known_events.pop((current_calendar_user.get(), event_id), None)
+
+def _insert_idempotent(service, event: dict, idempotency_key: str) -> tuple:
+    """Inserts `event` under the id derived from `idempotency_key`.
+
+    A re-run of the same write is skipped (known locally) or, if the event
+    already exists in Google Calendar, left alone when unchanged and patched
+    when its content differs or it was deleted.
+
+    Returns:
+        tuple: (action, event) where action is "created", "updated" or "unchanged"
+    """
+    event_id = event_id_for(idempotency_key)
+    fingerprint = _fingerprint(event)
+    with _known_events_lock:
+        known = _known_events.get((current_calendar_user.get(), event_id))
+    if known == fingerprint:
+        return "unchanged", {'id': event_id}
+
+    try:
+        created = _execute(service.events().insert(calendarId='primary', body={**event, 'id': event_id}))
+        _remember_event(event_id, fingerprint)
+        return "created", created
+    except HttpError as error:
+        if error.resp.status != 409:
+            raise
 
-    return build('calendar', 'v3', credentials=creds)
+    # Already exists: Google keeps ids of deleted events, so check its status too
+    existing = _execute(service.events().get(calendarId='primary', eventId=event_id))
+    if existing.get('status') != 'cancelled' and _fingerprint(existing) == fingerprint:
+        _remember_event(event_id, fingerprint)
+        return "unchanged", existing
+    patched = _execute(service.events().patch(calendarId='primary', eventId=event_id,
+                                              body={**event, 'status': 'confirmed'}))
+    _remember_event(event_id, fingerprint)
+    return "updated", patched
 
-def write_to_calendar(event_summary: str, start_time: str, end_time: str) -> dict:
-    """Writes events into the user's calendar
+def write_to_calendar(event_summary: str, start_time: str, end_time: str, idempotency_key: str = "") -> dict:
+    """Writes events into the user's calendar. Writing the same event again does not duplicate it.
 
     Args:
         event_summary (str): The title or summary of the event.
@@ -35,9 +165,11 @@ def write_to_calendar(event_summary: str, start_time: str, end_time: str) -> dic
                           (e.g., '2025-09-29T15:00:00-04:00').
         end_time (str): Event end time in ISO 8601 format 
                         (e.g., '2025-09-29T16:00:00-04:00').
+        idempotency_key (str): Optional key identifying this write; defaults to one
+                               derived from the summary and times.
 
     Returns:
-        dict: Status of the request and htmlLink or error msg
+        dict: Status of the request, whether the event was created/updated/unchanged, and htmlLink or error msg
     """
     print(f"--- Tool: write_to_calendar called for: {event_summary} ---") 
 
@@ -57,19 +189,66 @@ def write_to_calendar(event_summary: str, start_time: str, end_time: str) -> dic
             },
         }
         
-        created_event = service.events().insert(calendarId='primary', body=event).execute()
-        print(f"Event created: {created_event.get('htmlLink')}")
+        key = idempotency_key or f"event|{event_summary.strip().lower()}|{start_time}|{end_time}"
+        action, written_event = _insert_idempotent(service, event, key)
+        print(f"Event {action}: {written_event.get('htmlLink', written_event.get('id'))}")
         return {
             "status": "success",
-            "htmlLink": created_event.get('htmlLink')
+            "action": action,
+            "event_id": written_event.get('id'),
+            "htmlLink": written_event.get('htmlLink')
         }
 
-    except HttpError as error:
+    except (HttpError, MissingCredentialsError, DeadlineExceeded) as error:
         print(f"An error occurred: {error}")
         return {
             "status": "error"
         }
     
+def create_deadline_event(event_summary: str, due_date: str, description: str = "",
+                          idempotency_key: str = "") -> dict:
+    """Adds an all-day event for a deadline (e.g. an assignment due date)
+
+    Args:
+        event_summary (str): The title of the deadline.
+        due_date (str): The due date in 'YYYY-MM-DD' format.
+        description (str): Optional details shown on the event.
+        idempotency_key (str): Optional key identifying this deadline; defaults to one
+                               derived from the title and due date, so re-imports don't duplicate it.
+
+    Returns:
+        dict: Status of the request, whether the event was created/updated/unchanged, the event id and htmlLink or error msg
+    """
+    print(f"--- Tool: create_deadline_event called for: {event_summary} ({due_date}) ---")
+
+    try:
+        service = authenticate()
+
+        end_date = dt.date.fromisoformat(due_date) + dt.timedelta(days=1)
+        event = {
+            'summary': event_summary,
+            'description': description,
+            'start': {'date': due_date},
+            'end': {'date': end_date.isoformat()},
+        }
+
+        key = idempotency_key or f"deadline|{event_summary.strip().lower()}|{due_date}"
+        action, written_event = _insert_idempotent(service, event, key)
+        print(f"Deadline {action}: {written_event.get('htmlLink', written_event.get('id'))}")
+        return {
+            "status": "success",
+            "action": action,
+            "event_id": written_event.get('id'),
+            "htmlLink": written_event.get('htmlLink')
+        }
+
+    except (HttpError, MissingCredentialsError, DeadlineExceeded, ValueError) as error:
+        print(f"An error occurred: {error}")
+        return {
+            "status": "error",
+            "message": f"An error occurred: {error}"
+        }
+
 def get_upcoming_events(max_results: int = 10):
     """
     Fetches upcoming events and returns them as a list of dictionaries.
@@ -84,18 +263,18 @@ def get_upcoming_events(max_results: int = 10):
         service = authenticate()
         now = dt.datetime.now(dt.timezone.utc).isoformat() 
         
-        events_result = service.events().list(
+        events_result = _execute(service.events().list(
             calendarId='primary',
             timeMin=now,
             maxResults=max_results,
             singleEvents=True,
             orderBy='startTime'
-        ).execute()
+        ), read_key=('events.list', max_results))
         
         events = events_result.get('items', [])
         return events
     
-    except HttpError as error:
+    except (HttpError, MissingCredentialsError, DeadlineExceeded) as error:
         return [{
             "error": f"An error occurred: {error}"
         }]
@@ -113,12 +292,13 @@ def delete_event(event_id: str) -> dict:
     try:
         service = authenticate()
 
-        service.events().delete(calendarId='primary', eventId=event_id).execute()
+        _execute(service.events().delete(calendarId='primary', eventId=event_id))
+        _forget_event(event_id)
 
         return {
             "status": "success"
         }
-    except HttpError as error:
+    except (HttpError, MissingCredentialsError, DeadlineExceeded) as error:
         return {
             "error": f"An error occurred: {error}"
         }
@@ -137,18 +317,285 @@ def update_event(event_id: str, update_fields: dict) -> dict:
     try:
         service = authenticate()
 
-        event = service.events().get(calendarId='primary', eventId=event_id).execute()
+        event = _execute(service.events().get(calendarId='primary', eventId=event_id), read_key=('events.get', event_id))
 
         event.update(update_fields)
 
-        update_event = service.events().update(calendarId='primary', eventId=event_id, body=event).execute()
+        update_event = _execute(service.events().update(calendarId='primary', eventId=event_id, body=event))
+        _forget_event(event_id)
 
         return {
             "event": update_event,
             "status": "success"
         }
-    except HttpError as error:
+    except (HttpError, MissingCredentialsError, DeadlineExceeded) as error:
         return {
             "status": "error",
             "message": error
-        }
\ No newline at end of file
+        }
+
+def _normalize_rrule(recurrence_rule: str) -> str:
+    rule = recurrence_rule.strip()
+    return rule if rule.upper().startswith('RRULE:') else f'RRULE:{rule}'
+
+def _find_instance(service, event_id: str, occurrence_start: str):
+    """Looks up the single occurrence of a recurring series that starts at occurrence_start."""
+    instances = _execute(service.events().instances(
+        calendarId='primary',
+        eventId=event_id,
+        originalStart=occurrence_start,
+    ), read_key=('events.instances', event_id, occurrence_start))
+    items = instances.get('items', [])
+    return items[0] if items else None
+
+def create_recurring_event(event_summary: str, start_time: str, end_time: str,
+                           recurrence_rule: str, time_zone: str = "UTC") -> dict:
+    """Creates one recurring event series (e.g. a routine) with a single API call
+
+    Args:
+        event_summary (str): The title or summary of the routine.
+        start_time (str): Start of the first occurrence in ISO 8601 format
+                          (e.g., '2025-09-29T07:00:00').
+        end_time (str): End of the first occurrence in ISO 8601 format
+                        (e.g., '2025-09-29T08:00:00').
+        recurrence_rule (str): An RFC 5545 RRULE, e.g. 'FREQ=WEEKLY;BYDAY=MO,WE,FR;UNTIL=20251215T000000Z'
+                               or 'FREQ=DAILY;COUNT=30'.
+        time_zone (str): IANA time zone the occurrences repeat in (e.g., 'America/New_York').
+
+    Returns:
+        dict: Status of the request, the series event id and htmlLink or error msg
+    """
+    print(f"--- Tool: create_recurring_event called for: {event_summary} ({recurrence_rule}) ---")
+
+    try:
+        service = authenticate()
+
+        event = {
+            'summary': event_summary,
+            'start': {
+                'dateTime': start_time,
+                'timeZone': time_zone,
+            },
+            'end': {
+                'dateTime': end_time,
+                'timeZone': time_zone,
+            },
+            'recurrence': [_normalize_rrule(recurrence_rule)],
+        }
+
+        created_event = _execute(service.events().insert(calendarId='primary', body=event))
+        print(f"Recurring event created: {created_event.get('htmlLink')}")
+        return {
+            "status": "success",
+            "event_id": created_event.get('id'),
+            "htmlLink": created_event.get('htmlLink')
+        }
+
+    except (HttpError, MissingCredentialsError, DeadlineExceeded) as error:
+        print(f"An error occurred: {error}")
+        return {
+            "status": "error",
+            "message": f"An error occurred: {error}"
+        }
+
+def update_recurring_event(event_id: str, update_fields: dict, occurrence_start: str = "") -> dict:
+    """
+    Updates a whole recurring series, or just one of its occurrences.
+
+    Args:
+        event_id (str): The id of the recurring series
+        update_fields (dict): The fields to change (e.g. {'summary': 'Gym', 'recurrence': ['RRULE:...']})
+        occurrence_start (str): Original start time (ISO 8601) of a single occurrence to edit.
+                                Leave empty to edit the whole series.
+
+    Returns:
+        dict: A dictionary containing the updated event and status code or error msg
+    """
+    try:
+        service = authenticate()
+
+        target_id = event_id
+        if occurrence_start:
+            instance = _find_instance(service, event_id, occurrence_start)
+            if instance is None:
+                return {
+                    "status": "error",
+                    "message": f"No occurrence of {event_id} starts at {occurrence_start}"
+                }
+            target_id = instance['id']
+
+        updated = _execute(service.events().patch(calendarId='primary', eventId=target_id, body=update_fields))
+        _forget_event(event_id)
+
+        return {
+            "event": updated,
+            "status": "success"
+        }
+    except (HttpError, MissingCredentialsError, DeadlineExceeded) as error:
+        return {
+            "status": "error",
+            "message": f"An error occurred: {error}"
+        }
+
+def delete_recurring_event(event_id: str, occurrence_start: str = "") -> dict:
+    """
+    Deletes a whole recurring series, or just one of its occurrences.
+
+    Args:
+        event_id (str): The id of the recurring series
+        occurrence_start (str): Original start time (ISO 8601) of a single occurrence to delete.
+                                Leave empty to delete the whole series.
+
+    Returns:
+        dict: A dictionary containing the status code of the operation or error msg
+    """
+    try:
+        service = authenticate()
+
+        target_id = event_id
+        if occurrence_start:
+            instance = _find_instance(service, event_id, occurrence_start)
+            if instance is None:
+                return {
+                    "status": "error",
+                    "message": f"No occurrence of {event_id} starts at {occurrence_start}"
+                }
+            target_id = instance['id']
+
+        _execute(service.events().delete(calendarId='primary', eventId=target_id))
+        _forget_event(event_id)
+
+        return {
+            "status": "success"
+        }
+    except (HttpError, MissingCredentialsError, DeadlineExceeded) as error:
+        return {
+            "error": f"An error occurred: {error}"
+        }
+
+def _parse_time(value: str, tz: ZoneInfo) -> dt.datetime:
+    """Parses an ISO 8601 date/datetime into `tz`, interpreting naive values as local."""
+    parsed = dt.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed.astimezone(tz) if parsed.tzinfo else parsed.replace(tzinfo=tz)
+
+def _merge_intervals(intervals: list) -> list:
+    """Merges overlapping or touching (start, end) intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+def _free_windows(busy: list, range_start: dt.datetime, range_end: dt.datetime,
+                  work_start: dt.time, work_end: dt.time, tz: ZoneInfo,
+                  min_duration: dt.timedelta) -> list:
+    """Sweeps each day's working hours and subtracts the merged busy intervals.
+
+    Returns:
+        list[tuple]: (start, end) free windows of at least min_duration, in order
+    """
+    busy = _merge_intervals(busy)
+    windows = []
+    i = 0
+    day = range_start.astimezone(tz).date()
+    last_day = range_end.astimezone(tz).date()
+    while day <= last_day:
+        cursor = max(dt.datetime.combine(day, work_start, tz), range_start)
+        day_end = min(dt.datetime.combine(day, work_end, tz), range_end)
+        # Busy intervals are sorted, so skip the ones that ended before today's window
+        while i < len(busy) and busy[i][1] <= cursor:
+            i += 1
+        j = i
+        while cursor < day_end:
+            if j < len(busy) and busy[j][0] < day_end:
+                gap_end = min(busy[j][0], day_end)
+                if gap_end - cursor >= min_duration:
+                    windows.append((cursor, gap_end))
+                cursor = max(cursor, busy[j][1])
+                j += 1
+            else:
+                if day_end - cursor >= min_duration:
+                    windows.append((cursor, day_end))
+                break
+        day += dt.timedelta(days=1)
+    return windows
+
+def find_free_slots(range_start: str, range_end: str, duration_minutes: int = 60,
+                    working_hours_start: str = "09:00", working_hours_end: str = "17:00",
+                    time_zone: str = "UTC", max_results: int = 5, prefer: str = "earliest") -> dict:
+    """
+    Finds open time slots in the user's calendar using a single free/busy query.
+
+    Args:
+        range_start (str): Start of the search range in ISO 8601 format (e.g., '2025-09-29T00:00:00-04:00').
+        range_end (str): End of the search range in ISO 8601 format.
+        duration_minutes (int): Minimum length of a slot in minutes. Default is 60.
+        working_hours_start (str): Earliest time of day for a slot, 'HH:MM'. Default is '09:00'.
+        working_hours_end (str): Latest time of day for a slot to end, 'HH:MM'. Default is '17:00'.
+        time_zone (str): IANA time zone for working hours and naive times (e.g., 'America/New_York').
+        max_results (int): Maximum number of candidate slots to return. Default is 5.
+        prefer (str): 'earliest' to rank the soonest slots first, 'longest' to rank slots
+                      inside the largest free windows first.
+
+    Returns:
+        dict: Status and ranked slots, each with 'start', 'end' and 'free_minutes', or error msg
+    """
+    print(f"--- Tool: find_free_slots called for {range_start} -> {range_end} ---")
+
+    try:
+        tz = ZoneInfo(time_zone)
+        start = _parse_time(range_start, tz)
+        end = _parse_time(range_end, tz)
+        work_start = dt.time.fromisoformat(working_hours_start)
+        work_end = dt.time.fromisoformat(working_hours_end)
+        duration = dt.timedelta(minutes=duration_minutes)
+    except (ValueError, KeyError) as error:
+        return {
+            "status": "error",
+            "message": f"Invalid argument: {error}"
+        }
+
+    if end <= start or work_end <= work_start or duration_minutes <= 0:
+        return {
+            "status": "error",
+            "message": "range_end, working_hours_end and duration_minutes must describe a non-empty window"
+        }
+
+    try:
+        service = authenticate()
+
+        query = {
+            'timeMin': start.isoformat(),
+            'timeMax': end.isoformat(),
+            'timeZone': time_zone,
+            'items': [{'id': 'primary'}],
+        }
+        freebusy = _execute(service.freebusy().query(body=query),
+                            read_key=('freebusy', query['timeMin'], query['timeMax'], time_zone))
+
+        busy = [
+            (_parse_time(b['start'], tz), _parse_time(b['end'], tz))
+            for b in freebusy.get('calendars', {}).get('primary', {}).get('busy', [])
+        ]
+    except (HttpError, MissingCredentialsError, DeadlineExceeded) as error:
+        return {
+            "status": "error",
+            "message": f"An error occurred: {error}"
+        }
+
+    windows = _free_windows(busy, start, end, work_start, work_end, tz, duration)
+    if prefer == "longest":
+        windows.sort(key=lambda w: (-(w[1] - w[0]), w[0]))
+
+    slots = [{
+        "start": w_start.isoformat(),
+        "end": (w_start + duration).isoformat(),
+        "free_minutes": int((w_end - w_start).total_seconds() // 60),
+    } for w_start, w_end in windows[:max_results]]
+
+    return {
+        "status": "success",
+        "slots": slots
+    }
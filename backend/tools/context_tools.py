@@ -0,0 +1,23 @@
+from utils.context import get_reference
+
+def recall_tool_output(ref_id: str) -> dict:
+    """Fetches the full output of an earlier tool call that was shortened to a reference
+
+    Args:
+        ref_id (str): The reference id from the shortened output (e.g. 'ref_1a2b3c4d5e6f')
+
+    Returns:
+        dict: Status and the original tool output or error msg
+    """
+    print(f"--- Tool: recall_tool_output called for: {ref_id} ---")
+
+    output = get_reference(ref_id)
+    if output is None:
+        return {
+            "status": "error",
+            "message": f"No stored output for {ref_id}; it may have expired, re-run the original tool."
+        }
+    return {
+        "status": "success",
+        "output": output
+    }
@@ -0,0 +1,178 @@
+# Streaming syllabus -> calendar import.
+# Three stages connected by bounded queues run concurrently:
+#   pages:       pdfplumber reads the PDF one page at a time (in a thread)
+#   extraction:  each page is sent to Gemini for structured assignments
+#                (pages with no schedule-like text are skipped, see utils.relevance)
+#   calendar:    each assignment is written as an all-day event right away
+# The first deadline lands in the calendar as soon as its page is parsed,
+# instead of after the whole document has been read and formatted. Progress
+# is published to the user's event stream (`/events/{user_id}`).
+import asyncio
+import concurrent.futures
+import datetime as dt
+import threading
+import time
+import uuid
+
+from tools.calendar_tools import create_deadline_event
+from tools.syllabus_tools import extract_assignment_list
+from utils.credentials import current_calendar_user, DEFAULT_USER
+from utils.events import event_bus
+from utils.relevance import is_relevant_page
+from utils.tokens import estimate_tokens
+from utils.tracing import tracer
+
+PAGE_QUEUE_SIZE = 4
+ASSIGNMENT_QUEUE_SIZE = 16
+EXTRACT_WORKERS = 2
+CALENDAR_WORKERS = 2
+PAGE_OVERLAP_CHARS = 500
+
+_DONE = object()
+
+async def run_syllabus_import(user_id: str, file_path: str, calendar_user: str = DEFAULT_USER,
+                              import_id: str = None) -> dict:
+    """Imports the deadlines in a syllabus PDF into `calendar_user`'s calendar.
+
+    Progress messages (type "syllabus_import") go to `user_id`'s event stream.
+
+    Returns:
+        dict: Final counts for the import
+    """
+    import_id = import_id or uuid.uuid4().hex[:8]
+    current_calendar_user.set(calendar_user)
+    loop = asyncio.get_running_loop()
+    pages: asyncio.Queue = asyncio.Queue(maxsize=PAGE_QUEUE_SIZE)
+    assignments: asyncio.Queue = asyncio.Queue(maxsize=ASSIGNMENT_QUEUE_SIZE)
+    stop = threading.Event()
+    seen = set()
+    started = time.perf_counter()
+    progress = {
+        "import_id": import_id,
+        "pages_read": 0,
+        "pages_parsed": 0,
+        "pages_skipped": 0,
+        "tokens_saved": 0,
+        "assignments_found": 0,
+        "events_created": 0,
+        "events_updated": 0,
+        "events_unchanged": 0,
+        "errors": 0,
+        "first_event_seconds": None,
+    }
+
+    def emit(stage: str, **extra):
+        event_bus.publish(user_id, "syllabus_import", {**progress, "stage": stage, **extra})
+
+    def read_pages():
+        import pdfplumber  # heavy, and only needed when a syllabus is uploaded
+        with pdfplumber.open(file_path) as pdf:
+            previous_tail = ""
+            for number, page in enumerate(pdf.pages, 1):
+                with tracer.span("pdf.page", page=number) as span:
+                    text = page.extract_text() or ""
+                    span.set(chars=len(text))
+                # Block while the extraction stage is behind (backpressure)
+                future = asyncio.run_coroutine_threadsafe(pages.put((number, previous_tail, text)), loop)
+                while True:
+                    try:
+                        future.result(timeout=1)
+                        break
+                    except concurrent.futures.TimeoutError:
+                        if stop.is_set():
+                            future.cancel()
+                            return
+                previous_tail = text[-PAGE_OVERLAP_CHARS:]
+
+    async def reader():
+        try:
+            await asyncio.to_thread(read_pages)
+        except Exception as e:
+            print(f"[SYLLABUS IMPORT]: could not read {file_path}: {e}")
+            progress["errors"] += 1
+            emit("error", error=f"Could not read PDF: {e}")
+
+    async def extractor():
+        while (item := await pages.get()) is not _DONE:
+            number, previous_tail, text = item
+            progress["pages_read"] += 1
+            if text.strip() and not is_relevant_page(text):
+                # Policy/boilerplate page: no model call at all
+                progress["pages_skipped"] += 1
+                progress["tokens_saved"] += estimate_tokens(len(text) + len(previous_tail))
+                emit("page_skipped", page=number)
+                continue
+            if text.strip():
+                try:
+                    result = await extract_assignment_list(text, previous_tail)
+                except Exception as e:
+                    result = {"status": "error", "error": str(e)}
+                if result["status"] != "success":
+                    progress["errors"] += 1
+                    emit("error", page=number, error=result["error"])
+                for assignment in result.get("assignments", []):
+                    name = str(assignment.get("assignment_name", "")).strip()
+                    due_date = str(assignment.get("due_date", "")).strip()
+                    try:
+                        dt.date.fromisoformat(due_date)
+                    except ValueError:
+                        continue
+                    # Overlapping page context can report the same item twice
+                    key = (name.lower(), due_date)
+                    if not name or key in seen:
+                        continue
+                    seen.add(key)
+                    progress["assignments_found"] += 1
+                    await assignments.put({"assignment_name": name, "due_date": due_date,
+                                           "description": str(assignment.get("description") or "")})
+            progress["pages_parsed"] += 1
+            emit("page_parsed", page=number)
+
+    async def writer():
+        while (assignment := await assignments.get()) is not _DONE:
+            try:
+                result = await asyncio.to_thread(create_deadline_event, assignment["assignment_name"],
+                                                 assignment["due_date"], assignment["description"])
+            except Exception as e:
+                result = {"status": "error", "message": str(e)}
+            if result["status"] != "success":
+                progress["errors"] += 1
+                emit("error", assignment=assignment, error=result.get("message"))
+                continue
+            # Re-imports find most events already in place ("unchanged")
+            progress[f"events_{result['action']}"] += 1
+            if progress["first_event_seconds"] is None:
+                progress["first_event_seconds"] = round(time.perf_counter() - started, 3)
+            emit(f"event_{result['action']}", assignment=assignment, event_id=result.get("event_id"),
+                 htmlLink=result.get("htmlLink"))
+
+    async def close_queue(stage: list, queue: asyncio.Queue, consumers: int):
+        # Once a stage has finished, tell the next one there is no more input
+        await asyncio.gather(*stage)
+        for _ in range(consumers):
+            await queue.put(_DONE)
+
+    print(f"[SYLLABUS IMPORT]: {import_id} started for {user_id}: {file_path}")
+    emit("started")
+    with tracer.span("syllabus.import", import_id=import_id, user_id=user_id) as span:
+        readers = [asyncio.create_task(reader())]
+        extractors = [asyncio.create_task(extractor()) for _ in range(EXTRACT_WORKERS)]
+        writers = [asyncio.create_task(writer()) for _ in range(CALENDAR_WORKERS)]
+        tasks = readers + extractors + writers + [
+            asyncio.create_task(close_queue(readers, pages, EXTRACT_WORKERS)),
+            asyncio.create_task(close_queue(extractors, assignments, CALENDAR_WORKERS)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # A stage that raised (or cancelling the import) stops every other stage,
+            # so nothing is left waiting on a queue that will never be closed
+            stop.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        span.set(**{k: v for k, v in progress.items() if isinstance(v, int)})
+    progress["total_seconds"] = round(time.perf_counter() - started, 3)
+    emit("done")
+    print(f"[SYLLABUS IMPORT]: {import_id} done: {progress}")
+    return progress
@@ -1,6 +1,7 @@
-import pdfplumber 
-import os
-import google.genai as genai
+import json
+
+from utils.gemini import get_genai_client, model_limiter, ModelBusyError, BACKGROUND
+from utils.tracing import tracer
 
 ASSIGNMENTS_YEAR = "2025"
 GENERATIVE_MODEL = "gemini-2.0-flash-exp"
@@ -17,11 +18,15 @@ def extract_pdf_text(file_path: str) -> dict:
     print("Agent called extract text tool\n")
     full_text = "" 
     try: 
-        with pdfplumber.open(file_path) as pdf: 
-            for page in pdf.pages: 
-                text = page.extract_text()
-                if text:
-                    full_text += f"{text}\n"
+        with tracer.span("pdf.extract_text") as span:
+            import pdfplumber  # heavy, and only needed when a syllabus is uploaded
+            with pdfplumber.open(file_path) as pdf: 
+                for page in pdf.pages: 
+                    text = page.extract_text()
+                    if text:
+                        # Form feed keeps page boundaries for the relevance filter
+                        full_text += f"{text}\n\f"
+                span.set(pages=len(pdf.pages), chars=len(full_text))
         return {
             "status": "success",
             "text": full_text.strip() 
@@ -33,23 +38,30 @@ def extract_pdf_text(file_path: str) -> dict:
             "exception_code": e
         } 
     
-def extract_assignments(syllabus_text: str) -> dict:
+async def extract_assignments(syllabus_text: str) -> dict:
     """
         Receives raw syllabus text, uses the Gemini model to extarct assignment dates,
-        and returns them as a JSON formatted string.
+        and returns them as a JSON formatted string. Only the schedule-like sections
+        of the text (see utils.relevance) are sent to the model.
 
         Args:
             syllabus_text (str): The full text of the syllabus to parse
 
         Returns:
-            dict: Status and str containing the structured JSON of extracted assignments or error msg
+            dict: Status, str containing the structured JSON of extracted assignments and
+            relevance stats (tokens saved), or error msg
     """
 
     print("Agent called extract assignments tool\n")
 
     try:
-        # Configure and create client
-        client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
+        from utils.relevance import filter_relevant  # only needed once a syllabus is parsed
+        syllabus_text, relevance = filter_relevant(syllabus_text)
+        print(f"[RELEVANCE]: kept {relevance['sections_kept']}/{relevance['sections_total']} sections, "
+              f"saved {relevance['tokens_saved']} tokens ({relevance['saved_pct']}%)")
+
+        # Shared client; extraction queues behind interactive chat turns without holding a thread
+        client = get_genai_client()
 
         prompt = f"""
 You are an expert academic assistant. Your task is to extract all assignments and their due dates from the provided syllabus text.
@@ -67,19 +79,97 @@ Syllabus Text:
 ---
 """
         
-        response = client.models.generate_content(
-            model=GENERATIVE_MODEL,
-            contents=prompt
-        )
+        with tracer.span("gemini.generate", model=GENERATIVE_MODEL, prompt_chars=len(prompt),
+                         tokens_saved=relevance["tokens_saved"]) as span:
+            async with model_limiter.slot(BACKGROUND):
+                response = await client.aio.models.generate_content(
+                    model=GENERATIVE_MODEL,
+                    contents=prompt
+                )
+            span.set(response_chars=len(response.text or ""))
         
         return {
             "status": "success",
-            "assignments": response.text
+            "assignments": response.text,
+            "relevance": relevance
         }
         
+    except ModelBusyError as e:
+        print(f"extract_assignments queued too long: {e}")
+        return {
+            "status": "error",
+            "error": "The model is busy right now, please retry the extraction shortly."
+        }
     except Exception as e:
         print(f"Error in extract_assignments: {e}")
         return {
             "status": "error",
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+async def extract_assignment_list(page_text: str, previous_text: str = "") -> dict:
+    """Extracts assignments from one page of a syllabus as structured data.
+
+    Used by the streaming import pipeline, which schedules each assignment as
+    soon as its page has been parsed.
+
+    Args:
+        page_text (str): Text of the page to parse
+        previous_text (str): The end of the previous page, for assignments split across pages
+
+    Returns:
+        dict: Status and a list of {assignment_name, due_date, description} or error msg
+    """
+    try:
+        client = get_genai_client()
+
+        prompt = f"""
+You are an expert academic assistant. Extract every assignment, exam or other deadline that has a due date on this syllabus page.
+
+Return a JSON array of objects with:
+- "assignment_name": The name of the assignment (string).
+- "due_date": The due date in "YYYY-MM-DD" format (string). Use the year {ASSIGNMENTS_YEAR}.
+- "description": The description if available (string). Else an empty string.
+
+Only include items whose due date appears on this page. Return [] if there are none.
+
+End of the previous page (context only):
+---
+{previous_text}
+---
+
+Syllabus page:
+---
+{page_text}
+---
+"""
+
+        with tracer.span("gemini.generate", model=GENERATIVE_MODEL, prompt_chars=len(prompt)) as span:
+            async with model_limiter.slot(BACKGROUND):
+                response = await client.aio.models.generate_content(
+                    model=GENERATIVE_MODEL,
+                    contents=prompt,
+                    config={"response_mime_type": "application/json"}
+                )
+            span.set(response_chars=len(response.text or ""))
+
+        assignments = json.loads(response.text or "[]")
+        if isinstance(assignments, dict):
+            assignments = assignments.get("assignments", [])
+        return {
+            "status": "success",
+            "assignments": [a for a in assignments if isinstance(a, dict)]
+        }
+
+    except ModelBusyError as e:
+        print(f"extract_assignment_list queued too long: {e}")
+        return {
+            "status": "error",
+            "error": "The model is busy right now, please retry the extraction shortly."
+        }
+    except Exception as e:
+        print(f"Error in extract_assignment_list: {e}")
+        return {
+            "status": "error",
+            "error": str(e)
+        }
@@ -0,0 +1,169 @@
+# Shared scheduler for Google Calendar API calls.
+# Every calendar request goes through `calendar_scheduler.execute`, which
+#   - waits on a per-user and a global token bucket before sending,
+#   - retries rate-limit (403/429) and 5xx responses with exponential backoff + full jitter,
+#   - coalesces identical reads that are already in flight into one request.
+# Tools are plain sync functions, so this is thread-based rather than asyncio.
+import copy
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Hashable, Optional
+
+from googleapiclient.errors import HttpError
+
+from .deadlines import check_deadline, deadline_sleep, remaining_time, DeadlineExceeded
+
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded"}
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available (0 if available now)."""
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+class CalendarScheduler:
+    def __init__(self, user_rate: float = 5.0, user_burst: float = 10.0,
+                 global_rate: float = 20.0, global_burst: float = 40.0,
+                 max_retries: int = 5, backoff_base: float = 0.5, backoff_cap: float = 32.0):
+        self.user_rate, self.user_burst = user_rate, user_burst
+        self.max_retries = max_retries
+        self.backoff_base, self.backoff_cap = backoff_base, backoff_cap
+        self._global = TokenBucket(global_rate, global_burst)
+        self._users: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._inflight: dict[Hashable, Future] = {}
+        self._metrics = {
+            "requests_total": 0,
+            "retries_total": 0,
+            "rate_limited_total": 0,
+            "coalesced_total": 0,
+            "errors_total": 0,
+            "queue_depth": 0,
+            "queue_depth_max": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def _acquire(self, user_id: str):
+        """Blocks until both the user's and the global bucket have a token."""
+        started = time.monotonic()
+        with self._lock:
+            self._metrics["queue_depth"] += 1
+            self._metrics["queue_depth_max"] = max(self._metrics["queue_depth_max"], self._metrics["queue_depth"])
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    bucket = self._users.get(user_id)
+                    if bucket is None:
+                        bucket = self._users[user_id] = TokenBucket(self.user_rate, self.user_burst)
+                    bucket.refill(now)
+                    self._global.refill(now)
+                    wait = max(bucket.wait_time(), self._global.wait_time())
+                    if wait == 0:
+                        bucket.tokens -= 1
+                        self._global.tokens -= 1
+                        break
+                # Waiting for quota is where abandoned turns would otherwise pile up
+                deadline_sleep(wait, "Calendar request")
+        finally:
+            waited = time.monotonic() - started
+            with self._lock:
+                self._metrics["queue_depth"] -= 1
+                self._metrics["wait_seconds_total"] += waited
+                self._metrics["wait_seconds_max"] = max(self._metrics["wait_seconds_max"], waited)
+
+    def _is_retryable(self, error: HttpError) -> bool:
+        status = getattr(error.resp, "status", None)
+        if status == 429 or (status is not None and status >= 500):
+            return True
+        if status == 403:
+            reasons = {d.get("reason") for d in (getattr(error, "error_details", None) or []) if isinstance(d, dict)}
+            return bool(reasons & RATE_LIMIT_REASONS) or b"RateLimitExceeded" in (error.content or b"")
+        return False
+
+    def _send(self, request, user_id: str):
+        for attempt in range(self.max_retries + 1):
+            check_deadline("Calendar request")
+            self._acquire(user_id)
+            with self._lock:
+                self._metrics["requests_total"] += 1
+            try:
+                return request.execute()
+            except HttpError as error:
+                if attempt == self.max_retries or not self._is_retryable(error):
+                    with self._lock:
+                        self._metrics["errors_total"] += 1
+                    raise
+                with self._lock:
+                    self._metrics["retries_total"] += 1
+                    if getattr(error.resp, "status", None) in (403, 429):
+                        self._metrics["rate_limited_total"] += 1
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                print(f"Calendar API rate limited/unavailable, retrying in {delay:.2f}s (attempt {attempt + 1})")
+                deadline_sleep(delay, "Calendar request")
+
+    def execute(self, request, user_id: str = "default", read_key: Optional[Hashable] = None):
+        """Sends a googleapiclient request under the rate limits.
+
+        Args:
+            request: An unexecuted googleapiclient HttpRequest
+            user_id (str): Whose quota bucket the call is charged to
+            read_key: Set for idempotent reads; identical in-flight reads share one call
+
+        Returns:
+            The decoded API response
+        """
+        if read_key is None:
+            return self._send(request, user_id)
+
+        key = (user_id, read_key)
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                leader = True
+                pending = self._inflight[key] = Future()
+            else:
+                leader = False
+                self._metrics["coalesced_total"] += 1
+
+        if not leader:
+            try:
+                return copy.deepcopy(pending.result(timeout=remaining_time()))
+            except TimeoutError:
+                raise DeadlineExceeded("Calendar request ran past its deadline")
+
+        try:
+            result = self._send(request, user_id)
+            pending.set_result(result)
+            # Every caller gets its own copy so tools can mutate what they read
+            return copy.deepcopy(result)
+        except BaseException as error:
+            pending.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {**self._metrics, "inflight_reads": len(self._inflight), "tracked_users": len(self._users)}
+
+calendar_scheduler = CalendarScheduler(
+    user_rate=float(os.getenv("CALENDAR_USER_QPS", "5")),
+    user_burst=float(os.getenv("CALENDAR_USER_BURST", "10")),
+    global_rate=float(os.getenv("CALENDAR_GLOBAL_QPS", "20")),
+    global_burst=float(os.getenv("CALENDAR_GLOBAL_BURST", "40")),
+)
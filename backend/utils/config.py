@@ -6,7 +6,12 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_ID: str | None = None
     GOOGLE_CLIENT_SECRET: str | None = None
     GOOGLE_REDIRECT_URI: str | None = None
+    # Overridable so a local stand-in server can serve tokens and signing certs
+    GOOGLE_TOKEN_URL: str = "https://oauth2.googleapis.com/token"
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v1/certs"
     FRONTEND_ORIGIN: str = "http://localhost:5173"
     BACKEND_ORIGIN: str = "http://localhost:8000"
+    # Shared secret for POST /api/maintenance/streaks; the route is disabled while unset
+    MAINTENANCE_TOKEN: str | None = None
 
 settings = Settings()
@@ -0,0 +1,127 @@
+# Keeps the prompt sent to Gemini within a fixed budget as a session grows.
+# Sessions still store every event; only the per-call request is compacted:
+#   1. the current turn is always sent verbatim,
+#   2. large tool outputs from earlier turns become short references,
+#   3. if that is still over budget, the oldest messages (never the last few)
+#      are folded into one extractive summary message.
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Optional
+
+from google.genai import types
+
+from .tokens import estimate_tokens
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+CONTEXT_KEEP_RECENT = int(os.getenv("CONTEXT_KEEP_RECENT", "6"))
+TOOL_OUTPUT_MAX_CHARS = int(os.getenv("CONTEXT_TOOL_OUTPUT_MAX_CHARS", "1500"))
+SUMMARY_LINE_CHARS = 160
+MAX_REFERENCES = 256
+
+# Full tool outputs that were replaced by a reference, so a tool can fetch them back
+REFERENCES: "OrderedDict[str, dict]" = OrderedDict()
+
+def _part_chars(part: types.Part) -> int:
+    if part.text:
+        return len(part.text)
+    if part.function_call:
+        return len(json.dumps(part.function_call.args or {}, default=str))
+    if part.function_response:
+        return len(json.dumps(part.function_response.response or {}, default=str))
+    if part.inline_data and part.inline_data.data:
+        return len(part.inline_data.data)
+    return 0
+
+def content_tokens(content: types.Content) -> int:
+    return estimate_tokens(sum(_part_chars(p) for p in content.parts or []))
+
+def store_reference(payload: dict) -> str:
+    raw = json.dumps(payload, default=str, sort_keys=True)
+    ref_id = "ref_" + hashlib.sha1(raw.encode()).hexdigest()[:12]
+    REFERENCES[ref_id] = payload
+    REFERENCES.move_to_end(ref_id)
+    while len(REFERENCES) > MAX_REFERENCES:
+        REFERENCES.popitem(last=False)
+    return ref_id
+
+def get_reference(ref_id: str) -> Optional[dict]:
+    return REFERENCES.get(ref_id)
+
+def _shrink_part(part: types.Part) -> types.Part:
+    """Replaces an oversized tool output or text part with a compact stand-in."""
+    if _part_chars(part) <= TOOL_OUTPUT_MAX_CHARS:
+        return part
+    if part.function_response:
+        response = part.function_response.response or {}
+        ref_id = store_reference(response)
+        preview = json.dumps(response, default=str)[:SUMMARY_LINE_CHARS]
+        compact = {
+            "status": response.get("status", "success"),
+            "ref": ref_id,
+            "note": f"Large output ({_part_chars(part)} chars) omitted; call recall_tool_output('{ref_id}') if needed.",
+            "preview": preview,
+        }
+        return types.Part(function_response=types.FunctionResponse(
+            id=part.function_response.id, name=part.function_response.name, response=compact))
+    if part.text:
+        return types.Part(text=part.text[:TOOL_OUTPUT_MAX_CHARS] + " …[truncated]")
+    return part
+
+def _summary_line(content: types.Content) -> Optional[str]:
+    for part in content.parts or []:
+        if part.text and part.text.strip():
+            text = " ".join(part.text.split())[:SUMMARY_LINE_CHARS]
+            return f"- {content.role}: {text}"
+        if part.function_call:
+            return f"- {content.role} called {part.function_call.name}"
+    return None
+
+def _starts_with_tool_response(content: types.Content) -> bool:
+    return any(p.function_response for p in content.parts or [])
+
+def compact_contents(contents: list, budget: int = CONTEXT_TOKEN_BUDGET,
+                     keep_recent: int = CONTEXT_KEEP_RECENT) -> list:
+    """Returns a copy of `contents` whose estimated size fits `budget` tokens where possible."""
+    if not contents:
+        return contents
+
+    # Never touch the current turn: everything from the last user text message on
+    current = 0
+    for i in range(len(contents) - 1, -1, -1):
+        content = contents[i]
+        if content.role == "user" and any(p.text for p in content.parts or []):
+            current = i
+            break
+    shrunk = [types.Content(role=c.role, parts=[_shrink_part(p) for p in c.parts or []])
+              for c in contents[:current]] + list(contents[current:])
+
+    # The last few messages are never dropped, only their tool outputs shrunk
+    protected = max(0, min(current, len(contents) - keep_recent))
+    # ...and they don't start with a tool response whose call would be dropped
+    while protected > 0 and _starts_with_tool_response(shrunk[protected]):
+        protected -= 1
+    older, recent = shrunk[:protected], shrunk[protected:]
+
+    total = sum(content_tokens(c) for c in older) + sum(content_tokens(c) for c in recent)
+    if total <= budget:
+        return older + recent
+
+    # Drop the oldest messages until the rest fits, keeping call/response pairs together
+    cut = 0
+    while cut < len(older) and total > budget:
+        total -= content_tokens(older[cut])
+        cut += 1
+    while cut < len(older) and _starts_with_tool_response(older[cut]):
+        total -= content_tokens(older[cut])
+        cut += 1
+
+    lines = [line for line in (_summary_line(c) for c in older[:cut]) if line]
+    summary = []
+    if lines:
+        # Keep the most recent summary lines if even the summary would be too big
+        max_lines = max(1, (budget - total) * 4 // SUMMARY_LINE_CHARS) if budget > total else 1
+        text = "Summary of earlier conversation:\n" + "\n".join(lines[-max_lines:])
+        summary = [types.Content(role="user", parts=[types.Part(text=text)])]
+    return summary + older[cut:] + recent
@@ -0,0 +1,125 @@
+# Per-user Google OAuth credentials with single-flight refresh.
+# Credentials live in memory and are written through to one token file per
+# user (the default/local user keeps using token.json). Tokens are refreshed
+# shortly before they expire; concurrent callers for the same user wait on
+# one refresh instead of each refreshing and racing on the file write.
+import datetime as dt
+import os
+import re
+import threading
+from contextvars import ContextVar
+from typing import Optional
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+# calendar.freebusy is for find_free_slots; tokens granted before it was added need re-consent
+SCOPES = ['https://www.googleapis.com/auth/calendar.events', 'https://www.googleapis.com/auth/calendar.freebusy']
+DEFAULT_USER = "default"
+
+# Whose calendar the current request/agent turn acts on
+current_calendar_user: ContextVar[str] = ContextVar("current_calendar_user", default=DEFAULT_USER)
+
+class MissingCredentialsError(PermissionError):
+    pass
+
+class CredentialStore:
+    def __init__(self, token_dir: str = "tokens", default_token_file: str = "token.json",
+                 refresh_margin: dt.timedelta = dt.timedelta(minutes=5)):
+        self.token_dir = token_dir
+        self.default_token_file = default_token_file
+        self.refresh_margin = refresh_margin
+        self._creds: dict[str, Credentials] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _path(self, user_id: str) -> str:
+        if user_id == DEFAULT_USER:
+            return self.default_token_file
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", user_id)
+        return os.path.join(self.token_dir, f"{safe}.json")
+
+    def _lock_for(self, user_id: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(user_id)
+            if lock is None:
+                lock = self._locks[user_id] = threading.Lock()
+            return lock
+
+    def _fresh(self, creds: Credentials) -> bool:
+        if not creds.token:
+            return False
+        if creds.expiry is None:
+            return True
+        # google-auth keeps expiry as naive UTC
+        now = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+        return creds.expiry - now > self.refresh_margin
+
+    def _load(self, user_id: str) -> Optional[Credentials]:
+        path = self._path(user_id)
+        if not os.path.exists(path):
+            return None
+        return Credentials.from_authorized_user_file(path, SCOPES)
+
+    def _save(self, user_id: str, creds: Credentials):
+        path = self._path(user_id)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and swap it in so readers never see a partial file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as token:
+            token.write(creds.to_json())
+        os.replace(tmp_path, path)
+
+    def get(self, user_id: str = DEFAULT_USER) -> Optional[Credentials]:
+        """Returns fresh credentials for `user_id`, refreshing at most once across callers.
+
+        Returns None if the user has never connected their Google account.
+        """
+        creds = self._creds.get(user_id)
+        if creds is not None and self._fresh(creds):
+            return creds
+
+        with self._lock_for(user_id):
+            # Someone else may have refreshed while we waited for the lock
+            creds = self._creds.get(user_id) or self._load(user_id)
+            if creds is None:
+                return None
+            if not self._fresh(creds):
+                if not creds.refresh_token:
+                    return None
+                print(f"Refreshing Google token for {user_id}")
+                creds.refresh(Request())
+                self._save(user_id, creds)
+            self._creds[user_id] = creds
+            return creds
+
+    def put(self, user_id: str, creds: Credentials):
+        """Stores newly granted credentials (e.g. from the OAuth callback)."""
+        with self._lock_for(user_id):
+            self._creds[user_id] = creds
+            self._save(user_id, creds)
+
+    def put_token_response(self, user_id: str, tokens: dict, client_id: str, client_secret: str):
+        """Stores the JSON returned by Google's token endpoint."""
+        expiry = None
+        if tokens.get("expires_in"):
+            expiry = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None) + dt.timedelta(seconds=int(tokens["expires_in"]))
+        refresh_token = tokens.get("refresh_token")
+        if refresh_token is None:
+            # Google only returns a refresh token on first consent; keep the old one
+            previous = self._creds.get(user_id) or self._load(user_id)
+            refresh_token = previous.refresh_token if previous else None
+        creds = Credentials(
+            token=tokens["access_token"],
+            refresh_token=refresh_token,
+            token_uri="https://oauth2.googleapis.com/token",
+            client_id=client_id,
+            client_secret=client_secret,
+            scopes=tokens.get("scope", " ".join(SCOPES)).split(),
+            expiry=expiry,
+        )
+        self.put(user_id, creds)
+
+credential_store = CredentialStore()
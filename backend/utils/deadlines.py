@@ -0,0 +1,126 @@
+# Deadlines and cancellation for agent turns and the tool work they start.
+# A Deadline is put in a ContextVar for the turn, so it follows the turn into
+# asyncio tasks and tool threads (ADK copies the context into its thread pool).
+# Blocking helpers (the Calendar scheduler) check it before sending and while
+# they wait, and async waiters (the model limiter) are woken by on_cancel, so a
+# timed-out or abandoned turn stops starting new Calendar/Gemini calls instead
+# of running to completion in the background.
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+AGENT_TURN_TIMEOUT = float(os.getenv("AGENT_TURN_TIMEOUT", "60"))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "30"))
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+class Deadline:
+    def __init__(self, seconds: Optional[float] = None, parent: Optional["Deadline"] = None):
+        expires_at = time.monotonic() + seconds if seconds is not None else None
+        if parent is not None and parent.expires_at is not None:
+            expires_at = parent.expires_at if expires_at is None else min(expires_at, parent.expires_at)
+        self.expires_at = expires_at
+        self.parent = parent
+        # Children share the turn's cancel flag (and cancel callbacks), so
+        # cancelling the turn stops its tools
+        self._cancelled = parent._cancelled if parent is not None else threading.Event()
+        self._callbacks: dict = parent._callbacks if parent is not None else {}
+        self._callbacks_lock = parent._callbacks_lock if parent is not None else threading.Lock()
+        self.reason = None
+
+    @property
+    def root(self) -> "Deadline":
+        """The turn (or connection) deadline this one was derived from."""
+        deadline = self
+        while deadline.parent is not None:
+            deadline = deadline.parent
+        return deadline
+
+    def cancel(self, reason: str = "cancelled"):
+        self.reason = reason
+        self._cancelled.set()
+        with self._callbacks_lock:
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Calls `callback` (on the cancelling thread) when the turn is cancelled.
+
+        Async waiters use this to wake up, since they can't block on the
+        threading.Event. Returns a function that unregisters the callback.
+        """
+        key = object()
+        with self._callbacks_lock:
+            if not self._cancelled.is_set():
+                self._callbacks[key] = callback
+                return lambda: self._unregister(key)
+        callback()
+        return lambda: None
+
+    def _unregister(self, key):
+        with self._callbacks_lock:
+            self._callbacks.pop(key, None)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, 0 once cancelled, None if there is no time limit."""
+        if self.cancelled:
+            return 0.0
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self, what: str = "operation"):
+        if self.cancelled:
+            deadline, reason = self, None
+            while deadline is not None and reason is None:
+                deadline, reason = deadline.parent, deadline.reason
+            raise DeadlineExceeded(f"{what} cancelled: {reason or 'turn cancelled'}")
+        if self.remaining() == 0:
+            raise DeadlineExceeded(f"{what} ran past its deadline")
+
+    def sleep(self, seconds: float, what: str = "operation"):
+        """time.sleep that wakes up early (and raises) on cancellation or expiry."""
+        remaining = self.remaining()
+        if remaining is not None and remaining < seconds:
+            self._cancelled.wait(remaining)
+            self.check(what)
+        if self._cancelled.wait(seconds):
+            self.check(what)
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+def check_deadline(what: str = "operation"):
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.check(what)
+
+def remaining_time() -> Optional[float]:
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+def deadline_sleep(seconds: float, what: str = "operation"):
+    deadline = current_deadline.get()
+    if deadline is None:
+        time.sleep(seconds)
+    else:
+        deadline.sleep(seconds, what)
+
+@contextmanager
+def deadline_scope(seconds: Optional[float] = None):
+    """Runs the block under a deadline of `seconds`, never later than the enclosing one."""
+    deadline = Deadline(seconds, parent=current_deadline.get())
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
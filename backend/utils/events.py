@@ -0,0 +1,90 @@
+# Per-user push updates (profile deltas, rewards, level-ups) for the SSE stream.
+# Every message gets a per-user sequence number. A subscriber whose queue is
+# full misses messages instead of blocking the publisher; it can spot the gap
+# from the numbering and re-fetch the profile. Reconnecting clients can pass
+# the last sequence number they saw to replay recent messages. A user's
+# numbering and history are dropped REPLAY_GRACE_SECONDS after their last
+# stream closes, and messages for users with no stream (and no recent one)
+# aren't kept at all, so per-user state only exists for connected users.
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Optional
+
+MAX_QUEUED_UPDATES = 100
+REPLAY_HISTORY = 50
+REPLAY_GRACE_SECONDS = 60.0  # long enough to cover a client's reconnect
+
+class UserEventBus:
+    def __init__(self, max_queued: int = MAX_QUEUED_UPDATES, history: int = REPLAY_HISTORY,
+                 grace: float = REPLAY_GRACE_SECONDS):
+        self.max_queued = max_queued
+        self.history = history
+        self.grace = grace
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._seq: dict[str, int] = {}
+        self._recent: dict[str, deque] = {}
+        self._evictions: dict[str, asyncio.TimerHandle] = {}
+        self.dropped = 0
+
+    def publish(self, user_id: str, event_type: str, data: dict) -> dict:
+        """Send one update to every open stream of `user_id` (call from the event loop)."""
+        if user_id not in self._subscribers and user_id not in self._seq:
+            # Nobody listening or about to reconnect: nothing to deliver or replay
+            return {"type": event_type, "seq": 0, "ts": time.time(), **data}
+        seq = self._seq.get(user_id, 0) + 1
+        self._seq[user_id] = seq
+        message = {"type": event_type, "seq": seq, "ts": time.time(), **data}
+        recent = self._recent.get(user_id)
+        if recent is None:
+            recent = self._recent[user_id] = deque(maxlen=self.history)
+        recent.append(message)
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.dropped += 1
+        return message
+
+    def subscribe(self, user_id: str, last_seq: Optional[int] = None,
+                  queue: Optional[asyncio.Queue] = None) -> asyncio.Queue:
+        """Opens a stream of `user_id`'s updates; pass `queue` to merge them into an existing stream."""
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.max_queued)
+        if last_seq is not None:
+            for message in self._recent.get(user_id, ()):
+                if message["seq"] > last_seq and not queue.full():
+                    queue.put_nowait(message)
+        eviction = self._evictions.pop(user_id, None)
+        if eviction is not None:
+            eviction.cancel()
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        self._seq.setdefault(user_id, 0)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+                try:
+                    self._evictions[user_id] = asyncio.get_running_loop().call_later(
+                        self.grace, self._evict, user_id)
+                except RuntimeError:
+                    self._evict(user_id)
+
+    def _evict(self, user_id: str):
+        self._evictions.pop(user_id, None)
+        self._seq.pop(user_id, None)
+        self._recent.pop(user_id, None)
+
+    def last_seq(self, user_id: str) -> int:
+        return self._seq.get(user_id, 0)
+
+def sse_message(message: dict) -> str:
+    """Same framing as the agent stream: one JSON object per `data:` line."""
+    return f"data: {json.dumps(message)}\n\n"
+
+event_bus = UserEventBus()
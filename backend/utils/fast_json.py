@@ -0,0 +1,116 @@
+# Fast JSON responses for hot read routes.
+# Returning a dict or a list of models from a route makes FastAPI walk it with
+# jsonable_encoder (and validate it against response_model) before the stdlib
+# encoder runs. These routes only return data we built ourselves, so they hand
+# FastAPI a ready FastJSONResponse instead: one pass through orjson (when
+# installed, else pydantic-core's Rust encoder), and bodies that rarely change (catalog, calendar event lists)
+# are kept as pre-encoded bytes. Each response carries a Server-Timing header
+# with its encode time, which browser dev tools and most proxies display.
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Callable, Hashable, Optional
+
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:  # optional: pydantic-core's encoder is nearly as fast
+    orjson = None
+
+MAX_CACHED_BODIES = 1000
+
+def _default(value: Any):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _decimals_to_float(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, dict):
+        return {k: _decimals_to_float(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_decimals_to_float(v) for v in value]
+    return value
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    # Serializes models, dates and sets itself, without validating anything. It
+    # writes Decimals (numeric columns) as strings, so they are made floats
+    # first to match orjson's output.
+    return to_json(_decimals_to_float(content), fallback=_default)
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def __init__(self, content: Any = None, status_code: int = 200, headers: Optional[dict] = None,
+                 cache_hit: Optional[bool] = None, encode_ms: float = 0.0, **kwargs):
+        """`content` may be already-encoded bytes (then pass `encode_ms` if it was just encoded)."""
+        started = time.perf_counter()
+        body = content if isinstance(content, bytes) else dumps(content)
+        encode_ms += (time.perf_counter() - started) * 1000
+        timing = f"encode;dur={encode_ms:.3f}"
+        if cache_hit is not None:
+            timing += f', cache;desc="{"hit" if cache_hit else "miss"}"'
+        super().__init__(body, status_code, {**(headers or {}), "Server-Timing": timing}, **kwargs)
+
+class EncodedCache:
+    """Pre-encoded response bodies, keyed by request and tagged with the version of their data.
+
+    A body is rebuilt when the version changes or it is older than `ttl` seconds.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: int = MAX_CACHED_BODIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._bodies: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (version, encoded at, bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: Hashable = None) -> Optional[bytes]:
+        with self._lock:
+            entry = self._bodies.get(key)
+            if entry is None or entry[0] != version or \
+                    (self.ttl is not None and time.monotonic() - entry[1] > self.ttl):
+                self.misses += 1
+                return None
+            self._bodies.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, body: bytes, version: Hashable = None) -> bytes:
+        with self._lock:
+            self._bodies[key] = (version, time.monotonic(), body)
+            self._bodies.move_to_end(key)
+            while len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+        return body
+
+    def invalidate(self, key: Hashable = None):
+        with self._lock:
+            if key is None:
+                self._bodies.clear()
+            else:
+                self._bodies.pop(key, None)
+
+    def response(self, key: Hashable, build: Callable[[], Any], version: Hashable = None) -> FastJSONResponse:
+        """Serves the cached body for `key`, calling `build()` and encoding it on a miss."""
+        body = self.get(key, version)
+        if body is not None:
+            return FastJSONResponse(body, cache_hit=True)
+        content = build()
+        started = time.perf_counter()
+        body = self.put(key, dumps(content), version)
+        return FastJSONResponse(body, cache_hit=False, encode_ms=(time.perf_counter() - started) * 1000)
@@ -0,0 +1,150 @@
+# Shared Gemini client and a priority-aware limiter for model calls.
+# Agent turns (interactive chat) and tool-side generation (e.g. syllabus
+# extraction) share one client/connection pool and one concurrency budget;
+# when the budget is exhausted, callers queue by priority instead of failing.
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Hashable, Optional
+
+from .deadlines import check_deadline, remaining_time, current_deadline, DeadlineExceeded
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+# Priority for agent model calls made in this context; batch jobs lower it so
+# they queue behind interactive chat
+model_priority: ContextVar[int] = ContextVar("model_priority", default=INTERACTIVE)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_genai_client():
+    """Returns the process-wide Gemini client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import google.genai as genai
+                _client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
+    return _client
+
+class ModelBusyError(TimeoutError):
+    pass
+
+class ModelCallLimiter:
+    """Priority semaphore for model calls. Use it from the event loop only.
+
+    Waiters park on futures rather than threads, so a queue of turns never ties
+    up the default executor that calendar, session and supabase calls share.
+    """
+
+    def __init__(self, max_concurrent: int = 4, queue_timeout: float = 30.0, lease_seconds: float = 120.0):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.lease_seconds = lease_seconds
+        self._waiters: list = []  # heap of (priority, seq, future, owner)
+        self._seq = itertools.count()
+        self._holders: dict[Hashable, float] = {}  # owner -> acquired at
+
+    def _in_use(self) -> int:
+        return len(self._holders)
+
+    def _reclaim_expired(self, now: float):
+        # Last resort for a holder whose release never ran; error and
+        # cancellation paths release explicitly.
+        for owner, acquired in list(self._holders.items()):
+            if now - acquired > self.lease_seconds:
+                print(f"Reclaiming expired model slot held by {owner}")
+                del self._holders[owner]
+
+    def _wake_next(self):
+        # The slot is taken on the waiter's behalf before it wakes up, so a
+        # release racing with a new acquire can't hand out more slots than are free.
+        while self._waiters and self._in_use() < self.max_concurrent:
+            _, _, waiter, owner = heapq.heappop(self._waiters)
+            if waiter.done():
+                continue  # timed out or cancelled while queued
+            self._holders[owner] = time.monotonic()
+            waiter.set_result(True)
+
+    def _abandon(self, waiter: asyncio.Future, owner: Hashable):
+        if waiter.done() and not waiter.cancelled():
+            self.release(owner)  # granted just as the caller gave up
+        else:
+            waiter.cancel()
+
+    async def acquire(self, priority: int = INTERACTIVE, owner: Optional[Hashable] = None,
+                      timeout: Optional[float] = None) -> Hashable:
+        """Waits until a slot is free. Lower priority values are served first.
+
+        Returns:
+            The owner key to pass to `release` (a new one if `owner` is None)
+
+        Raises:
+            ModelBusyError: if no slot frees up within `timeout` seconds
+            DeadlineExceeded: if the current turn's deadline passes or it is cancelled first
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        check_deadline("Model call")
+        # Don't queue past the caller's deadline
+        deadline_left = remaining_time()
+        bounded = deadline_left is not None and deadline_left < timeout
+        if bounded:
+            timeout = deadline_left
+        owner = object() if owner is None else owner
+        if owner in self._holders:
+            return owner
+        self._reclaim_expired(time.monotonic())
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter, owner))
+        self._wake_next()
+
+        # A cancelled turn (timeout, client disconnect) stops waiting right away
+        deadline = current_deadline.get()
+        unregister = deadline.on_cancel(lambda: loop.call_soon_threadsafe(waiter.cancel)) \
+            if deadline is not None else None
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter, owner)
+            raise
+        finally:
+            if unregister is not None:
+                unregister()
+        if deadline is not None and deadline.cancelled:
+            self._abandon(waiter, owner)
+            deadline.check("Model call")
+        if waiter.done() and not waiter.cancelled():
+            return owner
+        self._abandon(waiter, owner)
+        if bounded:
+            raise DeadlineExceeded(f"No model slot available before the deadline ({timeout:.1f}s)")
+        raise ModelBusyError(f"No model slot available within {timeout:g}s")
+
+    def release(self, owner: Hashable):
+        if self._holders.pop(owner, None) is not None:
+            self._wake_next()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE, timeout: Optional[float] = None):
+        owner = await self.acquire(priority, timeout=timeout)
+        try:
+            yield
+        finally:
+            self.release(owner)
+
+    def stats(self) -> dict:
+        queued = sum(1 for _, _, waiter, _ in self._waiters if not waiter.done())
+        return {"in_use": self._in_use(), "queued": queued, "max_concurrent": self.max_concurrent}
+
+model_limiter = ModelCallLimiter(
+    max_concurrent=int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")),
+    queue_timeout=float(os.getenv("GEMINI_QUEUE_TIMEOUT", "30")),
+)
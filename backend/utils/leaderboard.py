@@ -0,0 +1,70 @@
+# In-process XP leaderboard kept sorted as profiles change.
+# Rebuilt from `user_profiles` once, then updated incrementally whenever XP is
+# awarded, so top-N and "my rank" are O(log n) instead of a table sort per view.
+from typing import Iterable, Optional
+from sortedcontainers import SortedList
+
+class Leaderboard:
+    def __init__(self):
+        self._ranked = SortedList()  # (-xp, -level, user_id)
+        self._entries: dict[str, tuple[int, int]] = {}
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(user_id: str, xp: int, level: int):
+        return (-xp, -level, user_id)
+
+    def load(self, rows: Iterable[dict]):
+        """Replace the board with `rows` of user_id/xp/level."""
+        self._entries = {row["user_id"]: (row["xp"], row["level"]) for row in rows}
+        self._ranked = SortedList(self._key(uid, xp, level) for uid, (xp, level) in self._entries.items())
+        self.loaded = True
+
+    def update(self, user_id: str, xp: int, level: int):
+        old = self._entries.get(user_id)
+        if old == (xp, level):
+            return
+        if old is not None:
+            self._ranked.remove(self._key(user_id, *old))
+        self._entries[user_id] = (xp, level)
+        self._ranked.add(self._key(user_id, xp, level))
+
+    def remove(self, user_id: str):
+        old = self._entries.pop(user_id, None)
+        if old is not None:
+            self._ranked.remove(self._key(user_id, *old))
+
+    def _row(self, key) -> dict:
+        neg_xp, neg_level, user_id = key
+        return {"rank": self._rank_of(neg_xp, neg_level), "user_id": user_id,
+                "xp": -neg_xp, "level": -neg_level}
+
+    def _rank_of(self, neg_xp: int, neg_level: int) -> int:
+        # Competition ranking: users with equal xp/level share a rank
+        return self._ranked.bisect_left((neg_xp, neg_level)) + 1
+
+    def top(self, limit: int = 10, offset: int = 0) -> list[dict]:
+        return [self._row(key) for key in self._ranked.islice(offset, offset + limit)]
+
+    def rank(self, user_id: str) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        xp, level = entry
+        return {"rank": self._rank_of(-xp, -level), "user_id": user_id,
+                "xp": xp, "level": level, "total_users": len(self._entries)}
+
+    def group(self, user_ids: Iterable[str]) -> list[dict]:
+        """Rank a small group (e.g. friends) among themselves."""
+        members = sorted(self._key(uid, *self._entries[uid]) for uid in set(user_ids) if uid in self._entries)
+        rows, rank = [], 0
+        for i, (neg_xp, neg_level, uid) in enumerate(members):
+            if i == 0 or members[i - 1][:2] != (neg_xp, neg_level):
+                rank = i + 1
+            rows.append({"rank": rank, "user_id": uid, "xp": -neg_xp, "level": -neg_level})
+        return rows
+
+leaderboard = Leaderboard()
@@ -1,17 +1,182 @@
-# Minimal Google OAuth web flow helpers — stubbed for hackathon wiring.
+# Google OAuth web flow helpers.
+# The token exchange goes through one pooled async HTTP client, and the
+# returned ID token is verified locally against Google's signing certs, which
+# are cached for as long as Google's Cache-Control allows and refetched when a
+# token is signed with a key id we haven't seen (key rotation). That makes the
+# separate userinfo call unnecessary on login.
+import asyncio
+import re
 import secrets
-from typing import Tuple
+import time
+from typing import Optional, Tuple
+from urllib.parse import urlencode
+
+import httpx
+from fastapi import Header, HTTPException
+from google.auth import jwt
+
+from .config import settings
+from .credentials import DEFAULT_USER
+
+AUTH_URL = "https://accounts.google.com/o/oauth2/v2/auth"
+USERINFO_URL = "https://openidconnect.googleapis.com/v1/userinfo"
+ID_TOKEN_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+OAUTH_SCOPES = ("openid email profile https://www.googleapis.com/auth/calendar.events "
+                "https://www.googleapis.com/auth/calendar.freebusy")
+DEFAULT_CERTS_MAX_AGE = 3600
+MIN_REFETCH_INTERVAL = 60
+CLOCK_SKEW_SECONDS = 30
+
+_http: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the shared HTTP client (keeps connections to Google warm)."""
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http
+
+async def close_http_client():
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+class SigningKeyCache:
+    """Google's ID-token signing certs ({kid: PEM}), refreshed per Cache-Control."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._certs: dict[str, str] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _fetch(self):
+        response = await get_http_client().get(self.url)
+        response.raise_for_status()
+        match = re.search(r"max-age=(\d+)", response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else DEFAULT_CERTS_MAX_AGE
+        self._certs = response.json()
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + max_age
+
+    async def get(self, kid: Optional[str] = None) -> dict[str, str]:
+        def usable():
+            return time.monotonic() < self._expires_at and (kid is None or kid in self._certs)
+
+        if usable():
+            return self._certs
+        async with self._lock:
+            # One fetch for everyone waiting; an unknown kid refetches at most once a minute
+            expired = time.monotonic() >= self._expires_at
+            recently_fetched = time.monotonic() - self._fetched_at < MIN_REFETCH_INTERVAL
+            if not usable() and (expired or not recently_fetched):
+                await self._fetch()
+        return self._certs
+
+signing_keys = SigningKeyCache(settings.GOOGLE_CERTS_URL)
 
 def google_oauth_flow() -> Tuple[str, str]:
     # Return auth URL & state
     state = secrets.token_urlsafe(16)
-    auth_url = "https://accounts.google.com/o/oauth2/v2/auth?client_id=CLIENT_ID&scope=openid%20email%20profile%20https://www.googleapis.com/auth/calendar&redirect_uri=REDIRECT_URI&response_type=code&access_type=offline&prompt=consent&state=" + state
+    auth_url = AUTH_URL + "?" + urlencode({
+        "client_id": settings.GOOGLE_CLIENT_ID or "CLIENT_ID",
+        "scope": OAUTH_SCOPES,
+        "redirect_uri": settings.GOOGLE_REDIRECT_URI or "REDIRECT_URI",
+        "response_type": "code",
+        "access_type": "offline",
+        "prompt": "consent",
+        "state": state,
+    })
     return auth_url, state
 
 async def exchange_code_for_tokens(code: str) -> dict:
-    # TODO: Implement token exchange
-    return {"access_token": "stub", "refresh_token": "stub"}
+    response = await get_http_client().post(settings.GOOGLE_TOKEN_URL, data={
+        "code": code,
+        "client_id": settings.GOOGLE_CLIENT_ID,
+        "client_secret": settings.GOOGLE_CLIENT_SECRET,
+        "redirect_uri": settings.GOOGLE_REDIRECT_URI,
+        "grant_type": "authorization_code",
+    })
+    if response.status_code != 200:
+        raise ValueError(f"Token exchange failed ({response.status_code}): {response.text}")
+    return response.json()
+
+async def verify_id_token(id_token: str) -> dict:
+    """Verifies a Google ID token's signature, audience, issuer and expiry locally.
+
+    Raises:
+        ValueError: if the token fails any check, or GOOGLE_CLIENT_ID isn't set
+
+    Returns:
+        dict: The token claims (sub, email, name, picture, ...)
+    """
+    if not settings.GOOGLE_CLIENT_ID:
+        # google.auth skips the audience check when it's None, which would accept
+        # a token issued to any Google client
+        raise ValueError("GOOGLE_CLIENT_ID is not configured; refusing to verify ID tokens")
+    kid = jwt.decode_header(id_token).get("kid")
+    certs = await signing_keys.get(kid)
+    if kid not in certs:
+        raise ValueError(f"ID token signed with unknown key id {kid}")
+    claims = jwt.decode(id_token, certs={kid: certs[kid]}, audience=settings.GOOGLE_CLIENT_ID,
+                        clock_skew_in_seconds=CLOCK_SKEW_SECONDS)
+    if claims.get("iss") not in ID_TOKEN_ISSUERS:
+        raise ValueError(f"Unexpected ID token issuer: {claims.get('iss')}")
+    return claims
+
+async def user_from_id_token(id_token: Optional[str]) -> str:
+    """The Google account (`sub`) an ID token was issued to.
+
+    Without a token the caller acts as DEFAULT_USER, the local token.json
+    account; a token that doesn't verify is rejected with a 401.
+    """
+    if not id_token:
+        return DEFAULT_USER
+    try:
+        claims = await verify_id_token(id_token)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=f"Invalid ID token: {e}")
+    return claims["sub"]
+
+async def authenticated_user(authorization: Optional[str] = Header(None)) -> str:
+    """FastAPI dependency: the user from an `Authorization: Bearer <Google ID token>` header."""
+    if authorization is None:
+        return DEFAULT_USER
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise HTTPException(status_code=401, detail="Expected 'Authorization: Bearer <Google ID token>'")
+    return await user_from_id_token(token.strip())
+
+def turn_calendar_user(user_id: str, caller: str) -> str:
+    """The calendar a turn for `user_id` acts on.
+
+    An authenticated caller may only run turns as themselves, on their own
+    calendar; anonymous callers get the local default account.
+    """
+    if caller != DEFAULT_USER and user_id != caller:
+        raise HTTPException(status_code=403, detail=f"Authenticated as a different user than {user_id!r}")
+    return caller
+
+def batch_calendar_user(user_ids: list[str], caller: str) -> str:
+    """The calendar a batch of turns acts on.
+
+    Unlike single turns, batches are never anonymous (401), and every item
+    must belong to the authenticated caller (403).
+    """
+    if caller == DEFAULT_USER:
+        raise HTTPException(status_code=401, detail="Batch queries need 'Authorization: Bearer <Google ID token>'")
+    foreign = sorted({user_id for user_id in user_ids if user_id != caller})
+    if foreign:
+        raise HTTPException(status_code=403, detail=f"Batch items for other users: {foreign}")
+    return caller
 
 async def get_userinfo(access_token: str) -> dict:
-    # TODO: Call https://openidconnect.googleapis.com/v1/userinfo
-    return {"email": "user@example.com", "name": "Student Hacker"}
+    # Fallback for tokens without an id_token; the login flow doesn't need it
+    response = await get_http_client().get(USERINFO_URL, headers={"Authorization": f"Bearer {access_token}"})
+    response.raise_for_status()
+    return response.json()
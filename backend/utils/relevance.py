@@ -0,0 +1,131 @@
+# Local relevance scoring for syllabus text.
+# Most of a syllabus is policy boilerplate (grading, integrity, office hours)
+# that costs tokens and latency without containing a single deadline. Text is
+# split into sections (page breaks, blank lines, headings, at most
+# MAX_SECTION_LINES lines), each section is scored on date density, deadline
+# keywords and table-like layout, and only schedule-like sections are kept.
+import os
+import re
+
+from .tokens import estimate_tokens
+
+RELEVANCE_MIN_SCORE = float(os.getenv("RELEVANCE_MIN_SCORE", "0.35"))
+MAX_SECTION_LINES = 12
+
+_MONTHS = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+DATE_PATTERN = re.compile(
+    rf"\b{_MONTHS}\.?\s+\d{{1,2}}(?:st|nd|rd|th)?\b"    # Sep 29, September 29th
+    rf"|\b\d{{1,2}}\s+{_MONTHS}\b"                      # 29 Sep
+    r"|\b\d{4}-\d{2}-\d{2}\b"                          # 2025-09-29
+    r"|\b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b"               # 9/29, 09/29/2025
+    r"|\bweek\s+\d{1,2}\b",                            # Week 5
+    re.IGNORECASE,
+)
+DEADLINE_PATTERN = re.compile(
+    r"\b(?:due|deadline|submit(?:ted|ssion)?|exam|midterm|final|quiz(?:zes)?|test|"
+    r"homework|hw\s*#?\d*|assignment|project|lab|essay|paper|presentation|report|problem\s+set|ps\s*\d+)\b",
+    re.IGNORECASE,
+)
+BOILERPLATE_PATTERN = re.compile(
+    r"\b(?:policy|policies|plagiarism|integrity|honor code|office hours|accommodation|disabilit(?:y|ies)|"
+    r"attendance|grading scale|letter grade|e-?mail|textbook|prerequisite|learning outcomes?|objectives?|"
+    r"title ix|counseling|copyright)\b",
+    re.IGNORECASE,
+)
+TABLE_ROW_PATTERN = re.compile(r"\S(?:\s{2,}|\t|\s\|\s)\S.*(?:\s{2,}|\t|\s\|\s)\S")
+
+# Lowercase words that don't stop a line from reading as a title ("Schedule of Readings")
+_TITLE_SMALL_WORDS = {"a", "an", "and", "at", "by", "for", "in", "of", "on", "or", "the", "to", "vs"}
+
+def _is_title_case(line: str) -> bool:
+    """Every word starts with a capital, ignoring numbering and dashes ("WEEK 3 – Midterm", "2. Course Schedule")."""
+    words = [word for word in line.split() if word[0].isalpha()]
+    return bool(words) and words[0][0].isupper() and all(
+        word[0].isupper() or word.lower() in _TITLE_SMALL_WORDS for word in words)
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip()
+    return 0 < len(stripped) <= 60 and not stripped.endswith((".", ",", ";")) and (
+        stripped.isupper() or _is_title_case(stripped) or stripped.endswith(":"))
+
+def split_sections(text: str) -> list[str]:
+    """Splits text on page breaks, blank lines and headings into sections of bounded length."""
+    sections, current = [], []
+
+    def close():
+        if any(line.strip() for line in current):
+            sections.append("\n".join(current))
+        current.clear()
+
+    for page in text.split("\f"):
+        for line in page.splitlines():
+            if not line.strip():
+                close()
+                continue
+            if _is_heading(line) or len(current) >= MAX_SECTION_LINES:
+                close()
+            current.append(line)
+        close()
+    return sections
+
+def score_section(section: str) -> float:
+    """Roughly 0 for boilerplate, above RELEVANCE_MIN_SCORE for schedules and deadline lists."""
+    lines = [line for line in section.splitlines() if line.strip()]
+    if not lines:
+        return 0.0
+    dates = len(DATE_PATTERN.findall(section))
+    deadlines = len(DEADLINE_PATTERN.findall(section))
+    boilerplate = len(BOILERPLATE_PATTERN.findall(section))
+    table_rows = sum(1 for line in lines if TABLE_ROW_PATTERN.search(line))
+    dated_lines = sum(1 for line in lines if DATE_PATTERN.search(line))
+
+    # Densities per line, so long policy paragraphs with one date score low
+    score = (
+        1.0 * min(1.0, dates / len(lines))
+        + 0.6 * min(1.0, deadlines / len(lines))
+        + 0.3 * (table_rows / len(lines))
+        + 0.3 * (dated_lines / len(lines))
+        - 0.4 * min(1.0, boilerplate / len(lines))
+    )
+    if dates == 0:
+        # Without any date there is nothing to schedule; keep only strong deadline lists
+        score *= 0.3
+    return max(0.0, score)
+
+def filter_relevant(text: str, min_score: float = RELEVANCE_MIN_SCORE) -> tuple[str, dict]:
+    """Keeps the schedule-like sections of `text`.
+
+    A section's heading is kept with it. If nothing scores high enough, the
+    full text is returned so a badly formatted syllabus still gets parsed.
+
+    Returns:
+        tuple: (filtered text, stats with tokens_before/after/saved and section counts)
+    """
+    sections = split_sections(text)
+    kept = []
+    for i, section in enumerate(sections):
+        if score_section(section) >= min_score:
+            previous = sections[i - 1] if i > 0 else ""
+            if previous and _is_heading(previous.splitlines()[-1]) and len(previous.splitlines()) == 1 \
+                    and (not kept or kept[-1] is not previous):
+                kept.append(previous)
+            kept.append(section)
+
+    fallback = not kept
+    filtered = text if fallback else "\n\n".join(kept)
+    tokens_before = estimate_tokens(len(text))
+    tokens_after = estimate_tokens(len(filtered))
+    stats = {
+        "sections_total": len(sections),
+        "sections_kept": len(sections) if fallback else len(kept),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "saved_pct": round(100 * (tokens_before - tokens_after) / tokens_before, 1) if tokens_before else 0.0,
+        "fallback": fallback,
+    }
+    return filtered, stats
+
+def is_relevant_page(text: str, min_score: float = RELEVANCE_MIN_SCORE) -> bool:
+    """True if any section of the page looks schedule-like."""
+    return any(score_section(section) >= min_score for section in split_sections(text))
@@ -0,0 +1,213 @@
+# SQLite-backed drop-in replacement for ADK's InMemorySessionService.
+# Sessions survive restarts; only recently used sessions are kept in memory
+# (LRU, `max_active`), others are loaded lazily on access. Event appends are
+# buffered and written by a background thread in batches, at most
+# `flush_interval` seconds after they happen (or sooner if the buffer fills).
+import asyncio
+import copy
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    last_update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+);
+CREATE TABLE IF NOT EXISTS events (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, position)
+);
+"""
+
+class SqliteSessionService(BaseSessionService):
+    def __init__(self, db_path: str = "sessions.db", max_active: int = 1000,
+                 flush_interval: float = 1.0, max_batch: int = 500):
+        self.max_active = max_active
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._active: "OrderedDict[tuple, Session]" = OrderedDict()
+        self._pending: list = []  # (sql, params) waiting for the next flush
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-flush", daemon=True)
+        self._flusher.start()
+
+    # ----- write-behind -----
+
+    def _enqueue(self, sql: str, params: tuple):
+        with self._lock:
+            self._pending.append((sql, params))
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wakeup.set()
+
+    def _flush_now(self):
+        # Take the batch while holding the db lock so batches land in order
+        with self._db_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            with self._db:
+                for sql, params in batch:
+                    self._db.execute(sql, params)
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self._flush_now()
+            except Exception as e:
+                print(f"Session flush failed: {e}")
+
+    async def flush(self) -> None:
+        await asyncio.to_thread(self._flush_now)
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        self._flusher.join(timeout=5)
+        self._flush_now()
+        self._db.close()
+
+    # ----- in-memory working set -----
+
+    def _remember(self, session: Session):
+        key = (session.app_name, session.user_id, session.id)
+        with self._lock:
+            self._active[key] = session
+            self._active.move_to_end(key)
+            while len(self._active) > self.max_active:
+                self._active.popitem(last=False)
+
+    def _load(self, app_name: str, user_id: str, session_id: str) -> Optional[Session]:
+        # Pending writes may belong to this session, so land them before reading
+        self._flush_now()
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT state, last_update_time FROM sessions WHERE app_name=? AND user_id=? AND id=?",
+                (app_name, user_id, session_id)).fetchone()
+            if row is None:
+                return None
+            events = self._db.execute(
+                "SELECT data FROM events WHERE app_name=? AND user_id=? AND session_id=? ORDER BY position",
+                (app_name, user_id, session_id)).fetchall()
+        return Session(
+            id=session_id, app_name=app_name, user_id=user_id,
+            state=json.loads(row[0]), last_update_time=row[1],
+            events=[Event.model_validate_json(data) for (data,) in events],
+        )
+
+    # ----- BaseSessionService -----
+
+    async def create_session(self, *, app_name: str, user_id: str,
+                             state: Optional[dict[str, Any]] = None,
+                             session_id: Optional[str] = None) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        key = (app_name, user_id, session_id)
+        with self._lock:
+            exists = key in self._active
+        if exists or await asyncio.to_thread(self._load, app_name, user_id, session_id):
+            raise ValueError(f"Session with id {session_id} already exists.")
+
+        session = Session(id=session_id, app_name=app_name, user_id=user_id,
+                          state=copy.deepcopy(state or {}), last_update_time=time.time())
+        self._remember(session)
+        self._enqueue(
+            "INSERT OR REPLACE INTO sessions (app_name, user_id, id, state, last_update_time) VALUES (?, ?, ?, ?, ?)",
+            (app_name, user_id, session_id, json.dumps(session.state, default=str), session.last_update_time))
+        return copy.deepcopy(session)
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                          config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        with self._lock:
+            session = self._active.get(key)
+            if session is not None:
+                self._active.move_to_end(key)
+        if session is None:
+            session = await asyncio.to_thread(self._load, app_name, user_id, session_id)
+            if session is None:
+                return None
+            self._remember(session)
+
+        result = copy.deepcopy(session)
+        if config:
+            if config.num_recent_events is not None:
+                result.events = result.events[-config.num_recent_events:] if config.num_recent_events else []
+            if config.after_timestamp:
+                result.events = [e for e in result.events if e.timestamp >= config.after_timestamp]
+        return result
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        await self.flush()
+        query = "SELECT user_id, id, state, last_update_time FROM sessions WHERE app_name=?"
+        params: tuple = (app_name,)
+        if user_id is not None:
+            query += " AND user_id=?"
+            params += (user_id,)
+        with self._db_lock:
+            rows = self._db.execute(query + " ORDER BY last_update_time", params).fetchall()
+        return ListSessionsResponse(sessions=[
+            Session(id=sid, app_name=app_name, user_id=uid, state=json.loads(state), last_update_time=updated)
+            for uid, sid, state, updated in rows
+        ])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        with self._lock:
+            self._active.pop((app_name, user_id, session_id), None)
+        self._enqueue("DELETE FROM events WHERE app_name=? AND user_id=? AND session_id=?",
+                      (app_name, user_id, session_id))
+        self._enqueue("DELETE FROM sessions WHERE app_name=? AND user_id=? AND id=?",
+                      (app_name, user_id, session_id))
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        # Apply to the caller's copy (state deltas, events list) the usual way
+        event = await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+
+        key = (session.app_name, session.user_id, session.id)
+        with self._lock:
+            stored = self._active.get(key)
+        if stored is None:
+            stored = await asyncio.to_thread(self._load, *key)
+            if stored is None:
+                raise ValueError(f"Session {session.id} not found.")
+            self._remember(stored)
+        if stored is not session:
+            stored.events.append(event)
+            stored.state = {k: v for k, v in session.state.items() if not k.startswith("temp:")}
+            stored.last_update_time = session.last_update_time
+
+        self._enqueue(
+            "INSERT INTO events (app_name, user_id, session_id, position, data) VALUES (?, ?, ?, ?, ?)",
+            (*key, len(stored.events) - 1, event.model_dump_json(exclude_none=True)))
+        self._enqueue(
+            "UPDATE sessions SET state=?, last_update_time=? WHERE app_name=? AND user_id=? AND id=?",
+            (json.dumps(stored.state, default=str), stored.last_update_time, *key))
+        return event
@@ -0,0 +1,127 @@
+# Precompressed, fingerprinted static files.
+# At startup every file under the static dir is read once, hashed, and
+# compressed with gzip (and brotli when the `brotli` package is installed).
+# Each asset is served under its plain name (revalidated via ETag) and under a
+# content-hashed name like `js/app.3f2a9c1b0d.js` (cached as immutable).
+# HTML files get their `/static/...` references rewritten to the hashed names.
+import gzip
+import hashlib
+import mimetypes
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # optional: serve gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_BYTES = 512
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+@dataclass
+class Asset:
+    content_type: str
+    etag: str
+    variants: dict = field(default_factory=dict)  # encoding ("identity", "gzip", "br") -> bytes
+    immutable: bool = False
+
+def _fingerprint(rel_path: str, digest: str) -> str:
+    stem, dot, suffix = rel_path.rpartition(".")
+    return f"{stem}.{digest}.{suffix}" if dot else f"{rel_path}.{digest}"
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+class StaticAssets:
+    def __init__(self, root: Path, url_prefix: str = "/static/"):
+        self.root = Path(root)
+        self.url_prefix = url_prefix
+        self.assets: dict[str, Asset] = {}
+        self.hashed_names: dict[str, str] = {}  # plain rel path -> fingerprinted rel path
+        self.built = False
+
+    def _compress(self, asset: Asset):
+        body = asset.variants["identity"]
+        if len(body) < MIN_COMPRESS_BYTES or not asset.content_type.startswith(COMPRESSIBLE_TYPES):
+            return
+        asset.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            asset.variants["br"] = brotli.compress(body, quality=11)
+
+    def _add(self, rel_path: str, body: bytes):
+        content_type = mimetypes.guess_type(rel_path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        digest = hashlib.sha256(body).hexdigest()[:10]
+        plain = Asset(content_type=content_type, etag=f'"{digest}"', variants={"identity": body})
+        self._compress(plain)
+        hashed = Asset(content_type=content_type, etag=plain.etag, variants=plain.variants, immutable=True)
+
+        self.assets[rel_path] = plain
+        self.hashed_names[rel_path] = _fingerprint(rel_path, digest)
+        self.assets[self.hashed_names[rel_path]] = hashed
+
+    def build(self):
+        self.assets.clear()
+        self.hashed_names.clear()
+        files = sorted(p for p in self.root.rglob("*") if p.is_file())
+        html = []
+        for path in files:
+            rel_path = path.relative_to(self.root).as_posix()
+            if rel_path.endswith(".html"):
+                html.append((rel_path, path.read_bytes()))
+            else:
+                self._add(rel_path, path.read_bytes())
+
+        # HTML goes last so it can point at the fingerprinted names
+        pattern = re.compile(re.escape(self.url_prefix) + r"([\w./-]+)")
+        def rewrite(match):
+            name = self.hashed_names.get(match.group(1))
+            return self.url_prefix + name if name else match.group(0)
+        for rel_path, body in html:
+            self._add(rel_path, pattern.sub(rewrite, body.decode("utf-8")).encode("utf-8"))
+
+        self.built = True
+        sizes = sum(len(a.variants["identity"]) for name, a in self.assets.items() if not a.immutable)
+        print(f"Static assets ready: {len(self.hashed_names)} files, {sizes} bytes, brotli={'on' if brotli else 'off'}")
+
+    def url_for(self, rel_path: str) -> str:
+        return self.url_prefix + self.hashed_names.get(rel_path, rel_path)
+
+    def response(self, rel_path: str, request: Request) -> Optional[Response]:
+        """Builds the response for `rel_path`, or None if there is no such asset."""
+        if not self.built:
+            self.build()
+        asset = self.assets.get(rel_path)
+        if asset is None:
+            return None
+
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = next((e for e in ("br", "gzip") if e in asset.variants and e in accepted), "identity")
+        etag = asset.etag if encoding == "identity" else f'{asset.etag[:-1]}-{encoding}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE if asset.immutable else REVALIDATE_CACHE,
+            "Vary": "Accept-Encoding",
+        }
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=asset.variants[encoding], media_type=asset.content_type, headers=headers)
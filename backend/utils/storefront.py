@@ -0,0 +1,75 @@
+# In-process shop catalog with per-user ownership bitsets.
+# The catalog is loaded from `shop_items` once and each item gets a fixed
+# position. A user's purchases are stored as one int whose bit i is set when
+# they own catalog item i, so "owned?" checks and storefront rendering need no
+# database call after the user's purchases have been loaded once. The catalog
+# is reloaded once it is CATALOG_TTL seconds old, so edits to shop_items show
+# up without a restart.
+import os
+import time
+from typing import Iterable, Optional
+
+MIN_RELOAD_INTERVAL = 60
+CATALOG_TTL = float(os.getenv("CATALOG_TTL_SECONDS", "300"))
+
+class Storefront:
+    def __init__(self):
+        self.items: list[dict] = []  # catalog, ordered by coin_price
+        self._positions: dict[str, int] = {}  # shop_item_id -> bit position
+        self._owned: dict[str, int] = {}  # user_id -> ownership bitset
+        self.loaded = False
+        self.loaded_at = 0.0
+
+    def load(self, rows: Iterable[dict]):
+        """Replace the catalog with `rows` of id/name/description/coin_price."""
+        self.items = [{"id": row["id"], "name": row["name"], "description": row["description"],
+                       "coin_price": row["coin_price"]}
+                      for row in sorted(rows, key=lambda r: r["coin_price"])]
+        self._positions = {item["id"]: i for i, item in enumerate(self.items)}
+        # Bit positions changed, so ownership has to be reloaded
+        self._owned.clear()
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+
+    def is_stale(self) -> bool:
+        """Not loaded yet, or loaded more than CATALOG_TTL seconds ago."""
+        return not self.loaded or time.monotonic() - self.loaded_at >= CATALOG_TTL
+
+    def can_reload(self) -> bool:
+        """Unknown item ids trigger a reload at most once a minute."""
+        return not self.loaded or time.monotonic() - self.loaded_at >= MIN_RELOAD_INTERVAL
+
+    def item(self, shop_item_id: str) -> Optional[dict]:
+        position = self._positions.get(shop_item_id)
+        return None if position is None else self.items[position]
+
+    def has_ownership(self, user_id: str) -> bool:
+        return user_id in self._owned
+
+    def load_ownership(self, user_id: str, shop_item_ids: Iterable[str]):
+        bits = 0
+        for shop_item_id in shop_item_ids:
+            position = self._positions.get(shop_item_id)
+            if position is not None:
+                bits |= 1 << position
+        self._owned[user_id] = bits
+
+    def owns(self, user_id: str, shop_item_id: str) -> bool:
+        position = self._positions.get(shop_item_id)
+        return position is not None and bool(self._owned.get(user_id, 0) >> position & 1)
+
+    def mark_owned(self, user_id: str, shop_item_id: str):
+        position = self._positions.get(shop_item_id)
+        if position is not None and user_id in self._owned:
+            self._owned[user_id] |= 1 << position
+
+    def owned_count(self, user_id: str) -> int:
+        return self._owned.get(user_id, 0).bit_count()
+
+    def view(self, user_id: str, coins: int) -> list[dict]:
+        """The catalog with `owned` and `affordable` flags for one user."""
+        bits = self._owned.get(user_id, 0)
+        return [{**item, "owned": bool(bits >> i & 1), "affordable": item["coin_price"] <= coins}
+                for i, item in enumerate(self.items)]
+
+storefront = Storefront()
@@ -0,0 +1,244 @@
+# Daily streak maintenance.
+# complete_task only writes `streak` when a user completes something, so a
+# user who stops keeps their old streak in user_profiles. This job walks every
+# profile in user_id order (keyset pagination: `user_id > cursor`, no OFFSET
+# rescans), recomputes the streak from the user's activity bitmap (whose
+# highest set bit is the last completion date) and writes the changed rows back
+# in bulk: one `update ... where user_id in (...) and streak = <old>` per
+# distinct (old, new) pair in the chunk, which for a daily run is mostly
+# "set streak = 0 where streak = n". The old-value guard makes the update a
+# no-op for a user who completed a task after the page was read, so their
+# fresh streak is never overwritten. Chunks are processed by a few workers while
+# the next page is read; the cursor of the last fully processed prefix is
+# saved to a checkpoint file, so an interrupted run resumes where it stopped.
+# Every uvicorn worker on every host schedules the job, so a run first claims
+# the day's lease in the database (sql/claim_maintenance_run.sql); whoever
+# doesn't get it skips the run, and a finished day is never claimed again.
+import asyncio
+import json
+import os
+import socket
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from .streaks import ActivityBitmap
+from .tracing import tracer
+
+# Local state lives under DATA_DIR (default backend/data), not the working directory
+DATA_DIR = os.path.abspath(os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")))
+STREAK_CHUNK_SIZE = int(os.getenv("STREAK_CHUNK_SIZE", "500"))
+STREAK_CONCURRENCY = int(os.getenv("STREAK_CONCURRENCY", "4"))
+STREAK_CHECKPOINT_FILE = os.path.abspath(
+    os.getenv("STREAK_CHECKPOINT_FILE", os.path.join(DATA_DIR, "streak_maintenance.json")))
+# A pass that doesn't finish within its lease (crashed worker) can be taken over by another
+STREAK_LEASE_SECONDS = int(os.getenv("STREAK_LEASE_SECONDS", "3600"))
+STREAK_MAINTENANCE_HOUR = int(os.getenv("STREAK_MAINTENANCE_HOUR", "0"))  # UTC
+
+class StreakMaintenanceJob:
+    def __init__(self, supabase, today: Optional[date] = None, chunk_size: int = STREAK_CHUNK_SIZE,
+                 concurrency: int = STREAK_CONCURRENCY, checkpoint_path: str = STREAK_CHECKPOINT_FILE,
+                 on_update: Optional[Callable[[str, int], None]] = None):
+        self.supabase = supabase
+        self.today = today or datetime.now(timezone.utc).date()
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.checkpoint_path = checkpoint_path
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        # Called (on the event loop) for every user whose streak changed, to refresh caches
+        self.on_update = on_update
+        self.stats = {
+            "date": self.today.isoformat(),
+            "rows_scanned": 0,
+            "rows_updated": 0,
+            "streaks_broken": 0,
+            "chunks": 0,
+            "errors": 0,
+        }
+        # Totals over the checkpointed prefix only, so a resumed run doesn't count chunks twice
+        self._committed = {"rows_scanned": 0, "rows_updated": 0, "streaks_broken": 0, "chunks": 0}
+
+    # ----- checkpoint -----
+
+    def load_checkpoint(self) -> Optional[dict]:
+        """Today's checkpoint, if any; one from an earlier day is stale."""
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return checkpoint if checkpoint.get("date") == self.today.isoformat() else None
+
+    def save_checkpoint(self, cursor: Optional[str], done: bool = False):
+        checkpoint = {**(self.stats if done else {**self.stats, **self._committed}), "cursor": cursor, "done": done}
+        tmp_path = self.checkpoint_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(checkpoint, f)
+            os.replace(tmp_path, self.checkpoint_path)
+        except OSError as e:
+            print(f"[STREAKS]: could not write checkpoint {self.checkpoint_path}: {e}")
+
+    # ----- database work (runs in threads) -----
+
+    def _read_page(self, cursor: Optional[str]) -> list:
+        query = self.supabase.table("user_profiles").select("user_id, streak")
+        if cursor is not None:
+            query = query.gt("user_id", cursor)
+        return query.order("user_id").limit(self.chunk_size).execute().data
+
+    def _process_chunk(self, rows: list) -> list:
+        """Recomputes the chunk's streaks and bulk-writes the changed ones. Returns the changes."""
+        ids = [row["user_id"] for row in rows]
+        result = self.supabase.table("user_activity").select("*").in_("user_id", ids).execute()
+        activity = {record["user_id"]: ActivityBitmap.from_record(record) for record in result.data}
+
+        by_value: dict[tuple, list] = {}  # (stored streak, new streak) -> user ids
+        for row in rows:
+            bitmap = activity.get(row["user_id"])
+            if bitmap is None:
+                continue  # no recorded completions: nothing to compute a break from
+            streak = bitmap.current_streak(self.today)
+            if streak != (row.get("streak") or 0):
+                by_value.setdefault((row.get("streak"), streak), []).append(row["user_id"])
+
+        changes = []
+        for (stored, streak), user_ids in by_value.items():
+            query = self.supabase.table("user_profiles").update({"streak": streak}).in_("user_id", user_ids)
+            query = query.is_("streak", "null") if stored is None else query.eq("streak", stored)
+            # Only the rows still holding the value we read come back updated
+            for row in query.execute().data:
+                changes.append({"user_id": row["user_id"], "streak": streak, "previous": stored or 0})
+        return changes
+
+    # ----- run -----
+
+    def _claim(self) -> bool:
+        """True if this process now holds today's lease (sql/claim_maintenance_run.sql)."""
+        result = self.supabase.rpc("claim_maintenance_run", {
+            "p_job": "streaks",
+            "p_run_date": self.today.isoformat(),
+            "p_owner": self.owner,
+            "p_lease_seconds": STREAK_LEASE_SECONDS,
+        }).execute()
+        return bool(result.data)
+
+    def _finish(self, done: bool):
+        self.supabase.rpc("finish_maintenance_run", {
+            "p_job": "streaks",
+            "p_run_date": self.today.isoformat(),
+            "p_owner": self.owner,
+            "p_done": done,
+        }).execute()
+
+    async def run(self) -> dict:
+        """Runs (or resumes) today's maintenance pass.
+
+        Skipped if today's pass already finished, or another worker (on any host) is running it.
+
+        Returns:
+            dict: Counts, elapsed_seconds and rows_per_second
+        """
+        if not await asyncio.to_thread(self._claim):
+            print(f"[STREAKS]: {self.today}'s pass is running elsewhere or already done")
+            return {**self.stats, "skipped": True}
+        done = False
+        try:
+            stats = await self._run()
+            done = stats.get("errors", 0) == 0
+            return stats
+        finally:
+            # A failed pass gives the lease up so the next scheduled run retries it
+            try:
+                await asyncio.to_thread(self._finish, done)
+            except Exception as e:
+                print(f"[STREAKS]: could not record the end of {self.today}'s pass: {e}")
+
+    async def _run(self) -> dict:
+        checkpoint = self.load_checkpoint()
+        if checkpoint and checkpoint.get("done"):
+            print(f"[STREAKS]: already ran for {self.today}")
+            return {**checkpoint, "skipped": True}
+        cursor = checkpoint.get("cursor") if checkpoint else None
+        if checkpoint:
+            self._committed.update({k: checkpoint.get(k, 0) for k in self._committed})
+            self.stats.update(self._committed)
+            print(f"[STREAKS]: resuming {self.today} after user_id {cursor!r}")
+
+        started = time.perf_counter()
+        scanned_at_start = self.stats["rows_scanned"]
+        slots = asyncio.Semaphore(self.concurrency)
+        # Chunks finish out of order; the checkpoint only advances over a finished prefix
+        finished: dict[int, tuple] = {}
+        next_to_commit = 0
+        committed = cursor
+        tasks = []
+
+        async def process(index: int, rows: list):
+            nonlocal next_to_commit, committed
+            try:
+                changes = await asyncio.to_thread(self._process_chunk, rows)
+            except Exception as e:
+                # Never marked finished, so the checkpoint stays before this chunk
+                print(f"[STREAKS]: chunk starting at {rows[0]['user_id']!r} failed: {e}")
+                self.stats["errors"] += 1
+                return
+            finally:
+                slots.release()
+            counts = {
+                "chunks": 1,
+                "rows_scanned": len(rows),
+                "rows_updated": len(changes),
+                "streaks_broken": sum(1 for c in changes if c["streak"] < c["previous"]),
+            }
+            for key, value in counts.items():
+                self.stats[key] += value
+            if self.on_update:
+                for change in changes:
+                    self.on_update(change["user_id"], change["streak"])
+            finished[index] = (rows[-1]["user_id"], counts)
+            if next_to_commit in finished:
+                while next_to_commit in finished:
+                    committed, counts = finished.pop(next_to_commit)
+                    for key, value in counts.items():
+                        self._committed[key] += value
+                    next_to_commit += 1
+                self.save_checkpoint(committed)
+
+        with tracer.span("streaks.maintenance", date=self.today.isoformat(), resumed=bool(checkpoint)) as span:
+            index = 0
+            while True:
+                await slots.acquire()
+                try:
+                    rows = await asyncio.to_thread(self._read_page, cursor)
+                except BaseException:
+                    slots.release()
+                    raise
+                if not rows:
+                    slots.release()
+                    break
+                tasks.append(asyncio.create_task(process(index, rows)))
+                index += 1
+                cursor = rows[-1]["user_id"]
+                if len(rows) < self.chunk_size:
+                    break
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - started
+            scanned = self.stats["rows_scanned"] - scanned_at_start
+            self.stats["elapsed_seconds"] = round(elapsed, 3)
+            self.stats["rows_per_second"] = round(scanned / elapsed, 1) if elapsed > 0 else 0.0
+            span.set(**{k: v for k, v in self.stats.items() if isinstance(v, (int, float))})
+
+        # A failed chunk leaves the day open so the next run retries from it
+        self.save_checkpoint(committed, done=self.stats["errors"] == 0)
+        print(f"[STREAKS]: {self.stats}")
+        return dict(self.stats)
+
+def seconds_until_next_run(now: Optional[datetime] = None) -> float:
+    """Seconds until the next STREAK_MAINTENANCE_HOUR:00 UTC."""
+    now = now or datetime.now(timezone.utc)
+    next_run = now.replace(hour=STREAK_MAINTENANCE_HOUR, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
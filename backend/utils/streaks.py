@@ -0,0 +1,103 @@
+# Daily activity bitmaps for streaks and the profile heatmap.
+# Each user gets one Python int used as a bitset: bit i is set when the user
+# completed at least one task on day `origin + i`. Streak and heatmap queries
+# are a handful of shifts/masks on that int instead of a scan of task history.
+from datetime import date, timedelta
+from typing import Optional
+
+HEATMAP_DAYS = 365
+
+class ActivityBitmap:
+    __slots__ = ("origin", "bits", "longest")
+
+    def __init__(self, origin: Optional[int] = None, bits: int = 0, longest: int = 0):
+        self.origin = origin  # date ordinal of bit 0
+        self.bits = bits
+        self.longest = longest
+
+    def copy(self) -> "ActivityBitmap":
+        return ActivityBitmap(self.origin, self.bits, self.longest)
+
+    def _offset(self, day: date) -> int:
+        return day.toordinal() - self.origin
+
+    def is_active(self, day: date) -> bool:
+        if self.origin is None:
+            return False
+        i = self._offset(day)
+        return i >= 0 and bool(self.bits >> i & 1)
+
+    def _run_ending_at(self, i: int) -> int:
+        """Length of the run of set bits ending at bit i (inclusive)."""
+        if i < 0:
+            return 0
+        window = (1 << (i + 1)) - 1
+        gaps = ~self.bits & window
+        return i + 1 if gaps == 0 else i - (gaps.bit_length() - 1)
+
+    def _run_starting_at(self, i: int) -> int:
+        """Length of the run of set bits starting at bit i (inclusive)."""
+        x = self.bits >> i
+        return ((x ^ (x + 1)) >> 1).bit_length()
+
+    def mark(self, day: date) -> bool:
+        """Record activity on `day`. Returns False if it was already recorded."""
+        ordinal = day.toordinal()
+        if self.origin is None:
+            self.origin = ordinal
+        elif ordinal < self.origin:
+            self.bits <<= self.origin - ordinal
+            self.origin = ordinal
+
+        i = ordinal - self.origin
+        if self.bits >> i & 1:
+            return False
+        self.bits |= 1 << i
+
+        # Setting one bit can only join the runs on either side of it.
+        run = self._run_ending_at(i) + self._run_starting_at(i) - 1
+        self.longest = max(self.longest, run)
+        return True
+
+    def current_streak(self, today: date) -> int:
+        """Streak ending today, or yesterday if today has no activity yet."""
+        if self.origin is None:
+            return 0
+        i = self._offset(today)
+        if i >= 0 and self.bits >> i & 1:
+            return self._run_ending_at(i)
+        return self._run_ending_at(i - 1)
+
+    def window(self, end: date, days: int = HEATMAP_DAYS) -> int:
+        """Bits for the `days` days ending at `end`; bit 0 is the oldest day."""
+        if self.origin is None:
+            return 0
+        start = self._offset(end) - days + 1
+        shifted = self.bits >> start if start >= 0 else self.bits << -start
+        return shifted & ((1 << days) - 1)
+
+    def heatmap(self, end: date, days: int = HEATMAP_DAYS) -> dict:
+        bits = self.window(end, days)
+        return {
+            "start": (end - timedelta(days=days - 1)).isoformat(),
+            "end": end.isoformat(),
+            "days": days,
+            "bitmap": format(bits, "x"),
+            "active_days": bits.bit_count(),
+        }
+
+    def to_record(self) -> dict:
+        return {
+            "origin": date.fromordinal(self.origin).isoformat() if self.origin else None,
+            "bitmap": format(self.bits, "x"),
+            "longest_streak": self.longest,
+        }
+
+    @classmethod
+    def from_record(cls, record: dict) -> "ActivityBitmap":
+        origin = record.get("origin")
+        return cls(
+            origin=date.fromisoformat(origin).toordinal() if origin else None,
+            bits=int(record.get("bitmap") or "0", 16),
+            longest=record.get("longest_streak") or 0,
+        )
@@ -1,6 +1,9 @@
 import os
 from supabase import create_client, Client
 from typing import Optional
+from .tracing import tracer
+
+QUERY_VERBS = {"select", "insert", "update", "upsert", "delete", "rpc"}
 
 class SupabaseClient:
     _instance: Optional[Client] = None
@@ -23,5 +26,41 @@ class SupabaseClient:
             
         return cls._instance
 
+class _TracedQuery:
+    """Wraps a postgrest query builder so `.execute()` is recorded as a trace span."""
+
+    def __init__(self, builder, table: str, op: str = ""):
+        self._builder = builder
+        self._table = table
+        self._op = op
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if name == "execute":
+            def execute(*args, **kwargs):
+                with tracer.span("supabase.query", table=self._table, op=self._op) as span:
+                    result = attr(*args, **kwargs)
+                    data = getattr(result, "data", None)
+                    span.set(rows=len(data) if isinstance(data, list) else int(data is not None))
+                    return result
+            return execute
+        if not callable(attr):
+            return attr
+        def chained(*args, **kwargs):
+            built = attr(*args, **kwargs)
+            op = name if name in QUERY_VERBS else self._op
+            return _TracedQuery(built, self._table, op) if hasattr(built, "execute") else built
+        return chained
+
+class _TracedClient:
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name: str):
+        return _TracedQuery(self._client.table(name), name)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
 def get_supabase() -> Client:
-    return SupabaseClient.get_client()
\ No newline at end of file
+    return _TracedClient(SupabaseClient.get_client())
\ No newline at end of file
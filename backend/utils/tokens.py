@@ -0,0 +1,5 @@
+# Token estimates for budgeting prompts without calling a tokenizer.
+# Gemini averages about four characters per token on English text.
+
+def estimate_tokens(text_len: int) -> int:
+    return text_len // 4 + 1
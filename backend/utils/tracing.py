@@ -0,0 +1,242 @@
+# Lightweight tracing for agent turns.
+# Spans nest through a ContextVar (so they follow asyncio tasks and
+# asyncio.to_thread), are kept in memory for a "slowest stages" summary, and
+# are appended to TRACE_FILE as OTLP/JSON lines: one ExportTraceServiceRequest
+# per line, the format the OpenTelemetry collector's otlpjsonfile receiver reads.
+# Ending a span only queues it; a background thread writes the queue every
+# TRACE_FLUSH_SECONDS (sooner once FLUSH_BATCH spans are waiting), so the
+# event loop never blocks on the file.
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Hashable, Optional
+
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") != "0"
+SERVICE_NAME = "agentic-routine"
+RECENT_SPANS = 5000
+FLUSH_BATCH = 200
+TRACE_FLUSH_SECONDS = float(os.getenv("TRACE_FLUSH_SECONDS", "1.0"))
+MAX_OPEN_SPANS = 1000
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: dict):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes)
+        self.error = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent:
+            span["parentSpanId"] = self.parent.span_id
+        return span
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def payload_size(value: Any) -> int:
+    """Approximate size in characters of a tool/model payload."""
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return len(json.dumps(value, default=str))
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+class Tracer:
+    def __init__(self, path: str = TRACE_FILE, enabled: bool = TRACING_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # keeps batches in order in the file
+        self._pending: list = []
+        self._wake = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._recent: deque = deque(maxlen=RECENT_SPANS)
+        self._open: "OrderedDict[Hashable, Span]" = OrderedDict()
+
+    def current(self) -> Optional[Span]:
+        return _current.get()
+
+    def start_span(self, name: str, key: Hashable = None, activate: bool = True, **attributes) -> Span:
+        """Starts a span that (if `activate`) becomes the parent of spans started after it in this context.
+
+        Pass `key` when the span is ended from a different callback (see `end_span`).
+        """
+        span = Span(name, _current.get(), attributes)
+        if activate:
+            _current.set(span)
+        if key is not None:
+            with self._lock:
+                self._open[key] = span
+                while len(self._open) > MAX_OPEN_SPANS:
+                    # A callback pair that never completed (e.g. the tool raised)
+                    self._open.popitem(last=False)
+        return span
+
+    def end_span(self, span_or_key, error: Optional[str] = None, **attributes) -> Optional[Span]:
+        if isinstance(span_or_key, Span):
+            span = span_or_key
+        else:
+            with self._lock:
+                span = self._open.pop(span_or_key, None)
+            if span is None:
+                return None
+        span.attributes.update(attributes)
+        span.error = error or span.error
+        span.end_ns = time.time_ns()
+        # Restore the parent if this span is still current here
+        if _current.get() is span:
+            _current.set(span.parent)
+        self._finish(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        span = Span(name, _current.get(), attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            span.end_ns = time.time_ns()
+            self._finish(span)
+
+    def traced(self, name: str):
+        """Decorator form of `span` for sync functions."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self._recent.append(span)
+            if not self.enabled:
+                return
+            self._pending.append(span)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+                self._writer.start()
+            if len(self._pending) >= FLUSH_BATCH:
+                self._wake.set()
+
+    def _write_loop(self):
+        while True:
+            self._wake.wait(TRACE_FLUSH_SECONDS)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:  # keep the writer alive
+                print(f"[TRACE]: flush failed: {e}")
+
+    def flush(self):
+        """Writes the queued spans now (the writer thread calls this; so does shutdown)."""
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                if os.path.exists(self.path) and os.path.getsize(self.path) > TRACE_FILE_MAX_BYTES:
+                    os.replace(self.path, self.path + ".1")
+                line = json.dumps({"resourceSpans": [{
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                    "scopeSpans": [{"scope": {"name": "utils.tracing"}, "spans": [s.to_otlp() for s in batch]}],
+                }]})
+                with open(self.path, "a") as trace_file:
+                    trace_file.write(line + "\n")
+            except OSError as e:
+                print(f"[TRACE]: could not write {self.path}: {e}")
+
+    def summary(self, limit: int = 10) -> dict:
+        """Slowest stages (by p95) and slowest root spans (turns) among recent spans."""
+        with self._lock:
+            spans = list(self._recent)
+        by_name: dict[str, list] = {}
+        for span in spans:
+            by_name.setdefault(span.name, []).append(span.duration_ms)
+
+        def pct(values, q):
+            return values[min(len(values) - 1, int(q * len(values)))]
+
+        stages = []
+        for name, durations in by_name.items():
+            durations.sort()
+            stages.append({
+                "name": name,
+                "count": len(durations),
+                "total_ms": round(sum(durations), 1),
+                "p50_ms": round(pct(durations, 0.5), 1),
+                "p95_ms": round(pct(durations, 0.95), 1),
+                "max_ms": round(durations[-1], 1),
+            })
+        stages.sort(key=lambda s: s["p95_ms"], reverse=True)
+
+        roots = sorted((s for s in spans if s.parent is None), key=lambda s: s.duration_ms, reverse=True)
+        turns = []
+        for root in roots[:limit]:
+            children = [s for s in spans if s.trace_id == root.trace_id and s is not root]
+            # Rank by self time (minus direct children), so the bottleneck isn't
+            # just the agent span wrapped around it
+            child_ms: dict[str, float] = {}
+            for s in children:
+                if s.parent:
+                    child_ms[s.parent.span_id] = child_ms.get(s.parent.span_id, 0.0) + s.duration_ms
+            slowest = max(children, key=lambda s: s.duration_ms - child_ms.get(s.span_id, 0.0), default=None)
+            turns.append({
+                "trace_id": root.trace_id,
+                "name": root.name,
+                "duration_ms": round(root.duration_ms, 1),
+                "spans": len(children) + 1,
+                "slowest_stage": slowest.name if slowest else None,
+                "slowest_stage_ms": round(slowest.duration_ms, 1) if slowest else None,
+                "attributes": root.attributes,
+            })
+        return {"spans_considered": len(spans), "stages": stages[:limit], "slowest_turns": turns}
+
+tracer = Tracer()
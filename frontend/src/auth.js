@@ -32,4 +32,10 @@ export const isAuthenticated = () => {
     console.error("Failed to decode or validate token", error);
     return false;
   }
-};
\ No newline at end of file
+};
+
+// Headers that authenticate a backend request as the signed-in Google account
+export const authHeaders = () => {
+  const token = localStorage.getItem('googleIdToken');
+  return token ? { Authorization: `Bearer ${token}` } : {};
+};
@@ -3,6 +3,22 @@ import { motion, AnimatePresence } from 'framer-motion';
 import { MessageCircle, Send, X, Upload, FileText, MicOff } from 'lucide-react';
 
 const API_BASE = "http://localhost:8000";
+const PROFILE_UPDATE_TYPES = ['reward', 'purchase', 'level_up'];
+
+/**
+ * Chat line announcing a profile update pushed over the event stream.
+ * @param {object} update - A reward, purchase or level_up message.
+ * @returns {string} Text to show in the chat.
+ */
+function describeProfileUpdate(update) {
+  if (update.type === 'reward') {
+    return `🎉 +${update.xp_earned} XP, +${update.coins_earned} coins`;
+  }
+  if (update.type === 'level_up') {
+    return `⬆️ Level up! You reached level ${update.new_level}`;
+  }
+  return `🛍️ Purchase complete: -${update.coins_spent} coins`;
+}
 
 // --- Audio Playback Utilities ---
 
@@ -75,6 +91,8 @@ const AIChat = ({ isOpen, onClose, isRecording, chatApiRef, onRecordingStatusCha
   const sessionIdRef = useRef(null);
   const currentMessageIdRef = useRef(null);
   const fileInputRef = useRef(null);
+  // Last seen sequence number of each update stream (profile, session)
+  const lastSeqRef = useRef({ profile: null, session: null });
 
   /**
    * Universal sender for text, audio, and control messages.
@@ -125,7 +143,16 @@ const AIChat = ({ isOpen, onClose, isRecording, chatApiRef, onRecordingStatusCha
     
     // NOTE: Set is_audio=true if you want the agent to reply with audio by default.
     // For this implementation, we rely on the agent to decide the response format.
-    const sseUrl = `${API_BASE}/events/${sessionIdRef.current}`; 
+    // EventSource can't send headers, so the ID token (whose calendar the agent uses) goes in the URL.
+    // Profile updates are only streamed for the token's account.
+    const params = new URLSearchParams();
+    const idToken = localStorage.getItem('googleIdToken');
+    if (idToken) params.set('id_token', idToken);
+    // Replays the updates missed while reconnecting
+    if (lastSeqRef.current.profile !== null) params.set('last_seq', lastSeqRef.current.profile);
+    if (lastSeqRef.current.session !== null) params.set('last_session_seq', lastSeqRef.current.session);
+    const query = params.toString();
+    const sseUrl = `${API_BASE}/events/${sessionIdRef.current}` + (query ? `?${query}` : '');
     
     try {
       eventSourceRef.current = new EventSource(sseUrl);
@@ -138,7 +165,43 @@ const AIChat = ({ isOpen, onClose, isRecording, chatApiRef, onRecordingStatusCha
       eventSourceRef.current.onmessage = (event) => {
         const messageFromServer = JSON.parse(event.data);
         console.log('[AGENT TO CLIENT]', messageFromServer);
-        
+
+        // --- 0. Profile Updates ---
+        if (messageFromServer.type === 'subscribed') {
+          // A lower number means the server forgot our history: start counting again
+          const seen = lastSeqRef.current;
+          const restart = (last, server) => (last === null || (server !== null && server < last) ? server : last);
+          lastSeqRef.current = {
+            profile: restart(seen.profile, messageFromServer.last_seq),
+            session: restart(seen.session, messageFromServer.last_session_seq)
+          };
+          return;
+        }
+
+        // Profile and session updates are numbered separately
+        const stream = messageFromServer.stream;
+        let stale = false;
+        if (stream) {
+          const last = lastSeqRef.current[stream];
+          if (last !== null && messageFromServer.seq <= last) {
+            return; // already seen before a reconnect
+          }
+          stale = last !== null && messageFromServer.seq > last + 1;
+          lastSeqRef.current = { ...lastSeqRef.current, [stream]: messageFromServer.seq };
+        }
+
+        if (PROFILE_UPDATE_TYPES.includes(messageFromServer.type)) {
+          // Other components (coins, level, avatar) listen for this; `stale` asks them to re-fetch
+          window.dispatchEvent(new CustomEvent('profile-update', {
+            detail: { ...messageFromServer, stale }
+          }));
+          setMessages(prev => [
+            ...prev,
+            { id: `update-${Date.now()}-${messageFromServer.seq}`, text: describeProfileUpdate(messageFromServer), sender: 'ai' }
+          ]);
+          return;
+        }
+
         // --- 1. Audio Reply Handling ---
         if (messageFromServer.mime_type === "audio/pcm") {
             const audioData = base64ToArrayBuffer(messageFromServer.data);
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { motion } from 'framer-motion';
 import { Calendar, Plus, Check, Trash2 } from 'lucide-react';
+import { authHeaders } from '../auth';
 
 const CalendarWithTodo = () => {
   const [currentMonth, setCurrentMonth] = useState(new Date().getMonth());
@@ -14,7 +15,9 @@ const CalendarWithTodo = () => {
   useEffect(() => {
     const fetchCalendarEvents = async () => {
       try {
-        const response = await fetch('http://localhost:8000/api/calendar/events');
+        const response = await fetch('http://localhost:8000/api/calendar/events', {
+          headers: authHeaders()
+        });
         if (response.ok) {
           const events = await response.json();
           // Convert Google Calendar events to our task format
@@ -78,7 +81,8 @@ const CalendarWithTodo = () => {
   const deleteCalendarEvent = async (eventId) => {
     try {
       const response = await fetch(`http://localhost:8000/api/calendar/events/${eventId}`, {
-        method: 'DELETE'
+        method: 'DELETE',
+        headers: authHeaders()
       });
       
       if (response.ok) {